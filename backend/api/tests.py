@@ -1,3 +1,401 @@
-from django.test import TestCase
+import datetime
+import json
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from auth_app.models import User
+from auth_app.tokens import issue_token
+from backend import responses
+from backend.testing import QueryBudgetMixin, QueryPlanMixin, token_headers
+from boards.access import access_cache
+from boards.models import Boards, Board_Users
+from stickers.models import BoardSnapshot, Stickers
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    """Выборочное профилирование запросов (backend.profiling)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = Path(self.tmp.name)
+        self.user = User.objects.create(username='profiled', password='x')
+        self.board = Boards.objects.create_board(title='Profiled', owner=self.user)
+        self.url = reverse('boards_list_create')
+
+    def profiles(self):
+        return sorted(self.dir.glob('*.prof'))
+
+    def test_unsampled_request_writes_nothing(self):
+        with override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_DIR=self.dir):
+            response = self.client.get(self.url, **token_headers(self.user))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profiles(), [])
+
+    def test_header_opt_in_writes_profile_and_summary(self):
+        with override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_ALLOW_HEADER=True, PROFILING_DIR=self.dir):
+            response = self.client.get(self.url, HTTP_X_PROFILE='1', **token_headers(self.user))
+
+        self.assertEqual(response.status_code, 200)
+        [profile] = self.profiles()
+        self.assertIn('api_boards', profile.name)
+        self.assertRegex(profile.name, r'_\d+ms\.prof$')
+
+        summary = json.loads(profile.with_suffix('.json').read_text())
+        self.assertEqual(summary['status'], 200)
+        self.assertGreaterEqual(summary['db_queries'], 1)
+        for key in ('total_ms', 'db_ms', 'json_ms', 'view_ms'):
+            self.assertGreaterEqual(summary[key], 0)
+
+    def test_json_encoding_time_is_measured(self):
+        Stickers.objects.bulk_create([
+            Stickers(board_id=self.board, content=f'Sticker {i}', color='#FFEB3B', x=i, y=i)
+            for i in range(3000)
+        ])
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+        with override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_ALLOW_HEADER=True, PROFILING_DIR=self.dir):
+            response = self.client.get(url, HTTP_X_PROFILE='1', **token_headers(self.user))
+
+        self.assertEqual(response.status_code, 200)
+        [profile] = self.profiles()
+        summary = json.loads(profile.with_suffix('.json').read_text())
+        self.assertGreater(summary['json_ms'], 0)
+        self.assertLess(summary['json_ms'], summary['total_ms'])
+
+    def test_header_ignored_when_not_allowed(self):
+        with override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_ALLOW_HEADER=False, PROFILING_DIR=self.dir):
+            self.client.get(self.url, HTTP_X_PROFILE='1', **token_headers(self.user))
+
+        self.assertEqual(self.profiles(), [])
+
+    def test_sample_rate_and_rotation(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MAX_FILES=2, PROFILING_DIR=self.dir):
+            for _ in range(4):
+                self.client.get(self.url, **token_headers(self.user))
+
+        self.assertLessEqual(len(self.profiles()), 2)
+        self.assertEqual(len(list(self.dir.glob('*.json'))), len(self.profiles()))
+
+
+def make_stickers(board, count):
+    Stickers.objects.bulk_create([
+        Stickers(
+            board_id=board, content=f'Sticker {i}', color='#FFEB3B',
+            x=i * 10, y=i * 10, width=100, height=100, z_index=i
+        )
+        for i in range(count)
+    ])
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Общая подготовка: пользователь с токеном и доска со стикером"""
+
+    def setUp(self):
+        access_cache.clear()
+        self.user = User.objects.create(username='budget', password=make_password('secret'))
+        self.other = User.objects.create(username='other', password='x')
+        self.board = Boards.objects.create_board(title='Budget', owner=self.user)
+        self.sticker = Stickers.objects.create(
+            board_id=self.board, content='Note', color='#FFEB3B', x=0, y=0, width=100, height=100, z_index=0
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(self.user)}'}
+
+    def get(self, url):
+        return self.client.get(url, **self.auth)
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json', **self.auth)
+
+
+class BoardQueryBudgetTestCase(QueryBudgetTestCase):
+    def grow_boards(self, size):
+        missing = size - Board_Users.objects.filter(user_id=self.user).count()
+        boards = Boards.objects.bulk_create([Boards(title=f'Board {i}') for i in range(missing)])
+        Board_Users.objects.bulk_create([
+            Board_Users(user_id=self.user, board_id=board, role=Board_Users.ROLE_OWNER) for board in boards
+        ])
+
+    def test_board_list_budget(self):
+        with self.assertQueryBudget(1):
+            response = self.get(reverse('boards_list_create'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_board_list_does_not_grow_with_boards(self):
+        self.assertQueriesDoNotGrow(self.grow_boards, lambda: self.get(reverse('boards_list_create')))
+
+    def test_board_detail_budget(self):
+        url = reverse('board_detail_delete', args=[self.board.id])
+        with self.assertQueryBudget(3):
+            response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # Повторная проверка доступа берётся из кеша
+        with self.assertQueryBudget(2):
+            self.get(url)
+
+    def test_board_create_budget(self):
+        with self.assertQueryBudget(4):
+            response = self.send('post', reverse('board_create_new'), {'title': 'New'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_board_update_budget(self):
+        with self.assertQueryBudget(7):
+            response = self.send('post', reverse('board_detail_delete', args=[self.board.id]), {'title': 'Renamed'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_share_budget(self):
+        with self.assertQueryBudget(7):
+            response = self.send('post', reverse('board_share', args=[self.board.id]), {'username': 'other'})
+        self.assertEqual(response.status_code, 200)
+
+
+class StickerQueryBudgetTestCase(QueryBudgetTestCase):
+    def grow_stickers(self, size):
+        make_stickers(self.board, size - Stickers.objects.filter(board_id=self.board).count())
+
+    def test_board_stickers_budget(self):
+        with self.assertQueryBudget(2):
+            response = self.get(reverse('board_stickers_list_create', args=[self.board.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_board_stickers_do_not_grow_with_stickers(self):
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+        self.assertQueriesDoNotGrow(self.grow_stickers, lambda: self.get(url))
+        self.assertQueriesDoNotGrow(self.grow_stickers, lambda: self.get(url + '?format=compact'))
+
+    def test_sticker_create_budget(self):
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+        with self.assertQueryBudget(6):
+            response = self.send('post', url, {'content': 'New', 'color': '#FFFFFF'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_sticker_patch_budget(self):
+        url = reverse('sticker_detail', args=[self.sticker.id])
+        # Плюс одно чтение роли автора на доске
+        with self.assertQueryBudget(7):
+            response = self.send('patch', url, {'content': 'Edited'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(STICKER_GEOMETRY_FLUSH_INTERVAL=60)
+    def test_sticker_drag_budget(self):
+        # Перетаскивание уходит в буфер отложенной записи: чтение стикера
+        # с доской и роли автора (роль кешируется), без записи
+        url = reverse('sticker_detail', args=[self.sticker.id])
+        with self.assertQueryBudget(2):
+            response = self.send('patch', url, {'x': 50, 'y': 60})
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_budget(self):
+        url = reverse('board_stickers_batch', args=[self.board.id])
+        operations = [{'op': 'create', 'data': {'content': f'Batch {i}', 'color': '#FFFFFF'}} for i in range(10)]
+        operations.append({'op': 'patch', 'id': str(self.sticker.id), 'data': {'content': 'Patched'}})
+        # Плюс одно чтение роли автора на доске
+        with self.assertQueryBudget(9):
+            response = self.send('post', url, {'operations': operations})
+        self.assertEqual(response.status_code, 200)
+
+
+class AuthQueryBudgetTestCase(QueryBudgetTestCase):
+    def test_login_budget(self):
+        with self.assertQueryBudget(1):
+            response = self.client.post(
+                reverse('auth_login'), json.dumps({'username': 'budget', 'password': 'secret'}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_register_budget(self):
+        with self.assertQueryBudget(2):
+            response = self.client.post(
+                reverse('auth_register'), json.dumps({'username': f'new-{uuid.uuid4().hex}', 'password': 'secret'}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_profile_with_token_does_not_query(self):
+        with self.assertQueryBudget(0):
+            response = self.get(reverse('user_profile'))
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryPlanTestCase(QueryPlanMixin, QueryBudgetTestCase):
+    """
+    Планы всех запросов вьюх: ни одного полного прохода таблицы и сортировки
+    во временном B-дереве (backend.testing.QueryPlanMixin)
+    """
+
+    def setUp(self):
+        super().setUp()
+        Board_Users.objects.create(user_id=self.other, board_id=self.board)
+        make_stickers(self.board, 20)
+        self.stickers_url = reverse('board_stickers_list_create', args=[self.board.id])
+
+    def assertIndexed(self, request, status=200, allowed_scans=()):
+        responses_ = []
+        self.assertQueriesUseIndexes(lambda: responses_.append(request()), allowed_scans=allowed_scans)
+        response = responses_[0]
+        self.assertEqual(response.status_code, status, getattr(response, 'content', b'')[:200])
+        return response
+
+    def test_board_list(self):
+        Boards.objects.create_board(title='Second', owner=self.user)
+        for sort in ('-updated', 'created', 'title'):
+            response = self.assertIndexed(lambda: self.get(reverse('boards_list_create') + f'?sort={sort}&limit=1'))
+            cursor = response['X-Next-Cursor']
+            self.assertIndexed(
+                lambda: self.get(reverse('boards_list_create') + f'?sort={sort}&limit=1&cursor={cursor}')
+            )
+
+    def test_templates(self):
+        Boards.objects.filter(id=self.board.id).update(is_template=True)
+        self.assertIndexed(lambda: self.get(reverse('templates_list')))
+        self.assertIndexed(
+            lambda: self.send('post', reverse('board_duplicate', args=[self.board.id]), {}), status=201
+        )
+
+    def test_board_detail(self):
+        url = reverse('board_detail_delete', args=[self.board.id])
+        self.assertIndexed(lambda: self.get(url))
+        self.assertIndexed(lambda: self.send('post', url, {'title': 'Renamed'}))
+        self.assertIndexed(lambda: self.send('post', reverse('board_create_new'), {'title': 'New'}), status=201)
+        self.assertIndexed(lambda: self.client.delete(url, **self.auth))
+
+    def test_share(self):
+        other = User.objects.create(username='third', password='x')
+        self.assertIndexed(
+            lambda: self.send('post', reverse('board_share', args=[self.board.id]), {'username': other.username})
+        )
+
+    def test_board_stickers(self):
+        for query in ('', '?format=compact', '?since=0', '?x=0&y=0&width=500&height=500'):
+            self.assertIndexed(lambda: self.get(self.stickers_url + query))
+        response = self.assertIndexed(lambda: self.get(self.stickers_url + '?stream=ndjson'))
+        self.assertQueriesUseIndexes(lambda: b''.join(response.streaming_content))
+
+    def test_sticker_writes(self):
+        sticker_url = reverse('sticker_detail', args=[self.sticker.id])
+        self.assertIndexed(lambda: self.send('post', self.stickers_url, {'content': 'New'}), status=201)
+        self.assertIndexed(lambda: self.send('patch', sticker_url, {'content': 'Edited'}))
+        operations = [
+            {'op': 'create', 'data': {'content': 'Batch'}},
+            {'op': 'patch', 'id': str(self.sticker.id), 'data': {'color': '#FFFFFF'}},
+        ]
+        self.assertIndexed(lambda: self.send(
+            'post', reverse('board_stickers_batch', args=[self.board.id]), {'operations': operations}
+        ))
+        self.assertIndexed(lambda: self.client.delete(sticker_url, **self.auth), status=204)
+
+    def test_sticker_order(self):
+        top = Stickers.objects.filter(board_id=self.board).order_by('-z_index').first()
+        url = reverse('sticker_order', args=[self.sticker.id])
+        self.assertIndexed(lambda: self.send('post', url, {'position': 'front'}))
+        self.assertIndexed(lambda: self.send('post', url, {'position': 'back'}))
+        # z_index make_stickers идут подряд — «под» перенумеровывает доску. Перенумерация
+        # читает все стикеры доски, но по индексу; ordered — подзапрос во FROM
+        self.assertIndexed(
+            lambda: self.send('post', url, {'position': 'below', 'target': str(top.id)}), allowed_scans=('ordered',)
+        )
+        self.assertIndexed(lambda: self.send('post', url, {'position': 'above', 'target': str(top.id)}))
+
+    def test_autosave_and_versions(self):
+        state = {'stickers': [{'id': str(self.sticker.id), 'content': 'Saved'}, {'content': 'Added'}]}
+        self.assertIndexed(lambda: self.send(
+            'post', reverse('board_autosave', args=[self.board.id]), {'boardState': state}
+        ))
+        versions_url = reverse('board_versions', args=[self.board.id])
+        self.assertIndexed(lambda: self.send('post', versions_url, {}), status=201)
+        self.assertIndexed(lambda: self.get(versions_url))
+        version = BoardSnapshot.objects.filter(board_id=self.board).first()
+        self.assertIndexed(lambda: self.send(
+            'post', reverse('board_version_restore', args=[self.board.id, version.id]), {}
+        ))
+
+    def test_export_and_import(self):
+        response = self.assertIndexed(lambda: self.get(reverse('board_export', args=[self.board.id])))
+        body = []
+        self.assertQueriesUseIndexes(lambda: body.append(b''.join(response.streaming_content)))
+        self.assertIndexed(lambda: self.client.post(
+            reverse('board_import'), body[0], content_type='application/x-ndjson', **self.auth
+        ), status=201)
+
+    def test_search(self):
+        self.assertIndexed(lambda: self.get(reverse('search') + '?q=Sticker'))
+
+    def test_auth(self):
+        self.assertIndexed(lambda: self.client.post(
+            reverse('auth_login'), json.dumps({'username': 'budget', 'password': 'secret'}),
+            content_type='application/json'
+        ))
+        self.assertIndexed(lambda: self.client.post(
+            reverse('auth_register'), json.dumps({'username': 'planned', 'password': 'secret'}),
+            content_type='application/json'
+        ), status=201)
+
+
+class JsonResponseTestCase(TestCase):
+    """Единый JSON-ответ (backend.responses)"""
+
+    def payload(self):
+        board = Boards.objects.create(title='Доска')
+        sticker = Stickers.objects.create(board_id=board, content='Привет "мир"', color='#FFFFFF', x=-5)
+        return {
+            'board': board,
+            'id': sticker.id,
+            'stickers': Stickers.objects.filter(board_id=board).values('id', 'content', 'x'),
+            'ids': Stickers.objects.values_list('id', flat=True),
+            'at': datetime.datetime(2024, 1, 2, 3, 4, 5, 600000, tzinfo=datetime.timezone.utc),
+            'nested': [{'n': None, 'ok': True, 'ratio': 0.5, 'big': 2 ** 40}],
+        }
+
+    def test_stdlib_output(self):
+        body = json.loads(responses.dumps_stdlib(self.payload()))
+        self.assertEqual(body['board']['title'], 'Доска')
+        self.assertEqual(body['stickers'][0]['id'], body['id'])
+        self.assertEqual(body['ids'], [body['id']])
+        self.assertEqual(body['at'], '2024-01-02T03:04:05.600Z')
+        self.assertIsInstance(uuid.UUID(body['id']), uuid.UUID)
+
+    @unittest.skipIf(responses.orjson is None, 'orjson is not installed')
+    def test_backends_produce_identical_bytes(self):
+        payload = self.payload()
+        self.assertEqual(responses.dumps_orjson(payload), responses.dumps_stdlib(payload))
+
+    def test_dates_match_django_encoder(self):
+        moscow = datetime.timezone(datetime.timedelta(hours=3))
+        values = [
+            datetime.datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=moscow),
+            datetime.datetime(2024, 1, 2, 3, 4, 5, 678901),
+            datetime.date(2024, 1, 2),
+            datetime.time(3, 4, 5, 678901),
+            datetime.timedelta(days=1, seconds=5),
+        ]
+        expected = json.loads(json.dumps(values, cls=DjangoJSONEncoder))
+        self.assertEqual(expected[0], '2024-01-02T03:04:05.678Z')
+        self.assertEqual(json.loads(responses.dumps_stdlib(values)), expected)
+        self.assertEqual(json.loads(responses.dumps(values)), expected)
+
+    def test_safe_rejects_non_dict(self):
+        with self.assertRaises(TypeError):
+            responses.JsonResponse([1, 2])
+        response = responses.JsonResponse([1, 2], safe=False, status=201)
+        self.assertEqual((response.status_code, response['Content-Type'], response.content),
+                         (201, 'application/json', b'[1,2]'))
+
+    def test_register_returns_uuid_as_string(self):
+        response = self.client.post(
+            reverse('auth_register'), json.dumps({'username': 'json-user', 'password': 'secret'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        user_id = response.json()['user']['id']
+        self.assertEqual(user_id, str(User.objects.get(username='json-user').id))
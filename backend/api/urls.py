@@ -9,14 +9,35 @@ urlpatterns = [
     # User profile endpoint
     path('user/profile', views.get_user_profile, name='user_profile'),
 
+    # Metrics endpoints
+    path('metrics/access-cache', views.access_cache_stats, name='access_cache_stats'),
+    path('metrics/document-cache', views.document_cache_stats, name='document_cache_stats'),
+
     # Boards endpoints
     path('boards', views.boards_list_create, name='boards_list_create'),
     path('boards/new', views.board_create_new, name='board_create_new'),
+    path('boards/import', views.board_import, name='board_import'),
     path('boards/<str:board_id>', views.board_detail_delete, name='board_detail_delete'),
     path('boards/<str:board_id>/share', views.board_share, name='board_share'),
     path('boards/<str:board_id>/autosave', views.board_autosave, name='board_autosave'),
+    path('boards/<str:board_id>/versions', views.board_versions, name='board_versions'),
+    path('boards/<str:board_id>/export', views.board_export, name='board_export'),
+    path('boards/<str:board_id>/duplicate', views.board_duplicate, name='board_duplicate'),
+    path(
+        'boards/<str:board_id>/versions/<int:version_id>/restore',
+        views.board_version_restore,
+        name='board_version_restore'
+    ),
+
+    # Templates endpoints
+    path('templates', views.templates_list, name='templates_list'),
 
     # Stickers endpoints
     path('boards/<str:board_id>/stickers', views.board_stickers_list_create, name='board_stickers_list_create'),
+    path('boards/<str:board_id>/stickers/batch', views.board_stickers_batch, name='board_stickers_batch'),
     path('stickers/<str:sticker_id>', views.sticker_detail, name='sticker_detail'),
+    path('stickers/<str:sticker_id>/order', views.sticker_order, name='sticker_order'),
+
+    # Search endpoints
+    path('search', views.search, name='search'),
 ]
@@ -1,4 +1,3 @@
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
@@ -6,6 +5,8 @@ from django.contrib.auth.hashers import check_password
 from django.conf import settings
 import json
 
+from backend.responses import JsonResponse
+
 # Import views from various apps
 from auth_app.views import register as auth_register_view
 from auth_app.views import login as auth_login_view
@@ -13,12 +14,21 @@ from boards.views import board_list as boards_list_create_view
 from boards.views import board_detail as board_detail_delete_view
 from boards.views import share_board as board_share_view
 from boards.views import autosave_board as board_autosave_view
+from boards.views import board_versions as board_versions_view
+from boards.views import restore_board_version as board_version_restore_view
+from boards.views import board_duplicate as board_duplicate_view
+from boards.views import template_list as template_list_view
 from boards.views import get_user_id_from_request
 from stickers.views import board_stickers as board_stickers_list_create_view
+from stickers.views import board_stickers_batch as board_stickers_batch_view
 from stickers.views import sticker_detail as sticker_detail_view
+from stickers.views import sticker_order as sticker_order_view
+from stickers.views import sticker_search as sticker_search_view
+from stickers.views import board_export as board_export_view
+from stickers.views import board_import as board_import_view
 from auth_app.models import User
-
-from boards.tests import create_board
+from boards.access import access_cache
+from stickers.documents import document_cache
 
 
 def get_user_profile(request):
@@ -30,6 +40,15 @@ def get_user_profile(request):
         if not user_id:
             return JsonResponse({'error': 'Invalid token: no user ID'}, status=401)
 
+        # A verified token already carries the profile
+        token_user = getattr(request, 'token_user', None)
+        if token_user is not None:
+            return JsonResponse({
+                'id': str(token_user.id),
+                'username': token_user.username,
+                'name': token_user.username
+            })
+
         # Get the user from database
         try:
             user = User.objects.get(id=user_id)
@@ -47,6 +66,20 @@ def get_user_profile(request):
         return JsonResponse({'error': str(e)}, status=401)
 
 
+def access_cache_stats(request):
+    """Handle GET /api/metrics/access-cache (только при DEBUG)"""
+    if not settings.DEBUG:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return JsonResponse(access_cache.stats())
+
+
+def document_cache_stats(request):
+    """Handle GET /api/metrics/document-cache (только при DEBUG)"""
+    if not settings.DEBUG:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return JsonResponse(document_cache.stats())
+
+
 @csrf_exempt
 def auth_register(request):
     """Handle auth register"""
@@ -95,12 +128,52 @@ def board_autosave(request, board_id):
     return board_autosave_view(request, board_id)
 
 
+@csrf_exempt
+def board_versions(request, board_id):
+    """Handle board versions list (GET) and manual snapshot (POST)"""
+    return board_versions_view(request, board_id)
+
+
+@csrf_exempt
+def board_version_restore(request, board_id, version_id):
+    """Handle board version restore (POST)"""
+    return board_version_restore_view(request, board_id, version_id)
+
+
+@csrf_exempt
+def board_duplicate(request, board_id):
+    """Handle board duplication (POST)"""
+    return board_duplicate_view(request, board_id)
+
+
+def templates_list(request):
+    """Handle board templates list (GET)"""
+    return template_list_view(request)
+
+
+def board_export(request, board_id):
+    """Handle board NDJSON export (GET)"""
+    return board_export_view(request, board_id)
+
+
+@csrf_exempt
+def board_import(request):
+    """Handle board NDJSON import (POST)"""
+    return board_import_view(request)
+
+
 @csrf_exempt
 def board_stickers_list_create(request, board_id):
     """Handle board stickers list (GET) and create (POST)"""
     return board_stickers_list_create_view(request, board_id)
 
 
+@csrf_exempt
+def board_stickers_batch(request, board_id):
+    """Handle board stickers batch create/patch/delete (POST)"""
+    return board_stickers_batch_view(request, board_id)
+
+
 @csrf_exempt
 def sticker_detail(request, sticker_id):
     """
@@ -108,3 +181,14 @@ def sticker_detail(request, sticker_id):
     Maps to stickers/{stickerId} endpoint
     """
     return sticker_detail_view(request, sticker_id)
+
+
+@csrf_exempt
+def sticker_order(request, sticker_id):
+    """Handle sticker z-order change (POST)"""
+    return sticker_order_view(request, sticker_id)
+
+
+def search(request):
+    """Handle sticker full-text search (GET)"""
+    return sticker_search_view(request)
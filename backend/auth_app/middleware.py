@@ -0,0 +1,29 @@
+
+from backend.responses import JsonResponse
+from .tokens import InvalidToken, verify_token
+
+# Эндпоинты входа и регистрации принимают запросы со старым или просроченным токеном
+AUTH_EXEMPT_PREFIXES = ('/api/auth/', '/auth/')
+
+
+class TokenAuthMiddleware:
+    """
+    Проверяет заголовок Authorization: Bearer <token> и кладёт
+    пользователя из токена в request.token_user (или None).
+    Неверный или просроченный токен — 401.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.token_user = None
+
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer ') and not request.path.startswith(AUTH_EXEMPT_PREFIXES):
+            try:
+                request.token_user = verify_token(header[len('Bearer '):].strip())
+            except InvalidToken as e:
+                return JsonResponse({'error': str(e)}, status=401)
+
+        return self.get_response(request)
@@ -1,3 +1,87 @@
-from django.test import TestCase
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from .models import User
+from .tokens import issue_token
+from boards.models import Boards
+
+
+class TokenAuthTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        response = self.client.post(
+            reverse('auth_register'),
+            json.dumps({'username': 'alice', 'password': 'secret123'}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username='alice')
+        self.token = response.json()['token']
+
+    def auth(self, token=None):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token or self.token}'}
+
+    def test_login_issues_signed_token(self):
+        response = self.client.post(
+            reverse('auth_login'),
+            json.dumps({'username': 'alice', 'password': 'secret123'}),
+            content_type='application/json'
+        )
+
+        token = response.json()['token']
+        self.assertNotEqual(token, 'fake_jwt_token_here')
+        profile = self.client.get(reverse('user_profile'), **self.auth(token)).json()
+        self.assertEqual(profile['id'], str(self.user.id))
+
+    def test_profile_needs_no_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user_profile'), **self.auth())
+
+        self.assertEqual(response.json()['username'], 'alice')
+
+    def test_board_list_skips_user_lookup(self):
+        Boards.objects.create_board(title='Board', owner=self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('boards_list_create'), **self.auth())
+
+        self.assertEqual(len(response.json()), 1)
+
+    def test_token_overrides_user_id_header(self):
+        other = User.objects.create(username='mallory', password='x')
+        Boards.objects.create_board(title='Private', owner=other)
+
+        response = self.client.get(
+            reverse('boards_list_create'), HTTP_X_USER_ID=str(other.id), **self.auth()
+        )
+
+        self.assertEqual(response.json(), [])
+
+    def test_user_id_header_without_token_is_ignored(self):
+        Boards.objects.create_board(title='Board', owner=self.user)
+        url = reverse('boards_list_create')
+
+        response = self.client.get(url, HTTP_X_USER_ID=str(self.user.id))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url + f'?userId={self.user.id}')
+        self.assertEqual(response.status_code, 400)
+
+        with override_settings(AUTH_ALLOW_USER_ID_FALLBACK=True):
+            response = self.client.get(url, HTTP_X_USER_ID=str(self.user.id))
+        self.assertEqual(len(response.json()), 1)
+
+    def test_tampered_token_rejected(self):
+        response = self.client.get(reverse('user_profile'), **self.auth(self.token[:-2] + 'xx'))
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(AUTH_TOKEN_MAX_AGE=60)
+    def test_expired_token_rejected(self):
+        token = issue_token(self.user)
+        with mock.patch('time.time', return_value=time.time() + 120):
+            response = self.client.get(reverse('user_profile'), **self.auth(token))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['error'], 'Token expired')
@@ -0,0 +1,48 @@
+"""
+Подписанные токены авторизации.
+
+Токен — django.core.signing с HMAC на SECRET_KEY: внутри id и username
+пользователя и время выдачи. Проверка идёт только в памяти, без запросов к БД.
+"""
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core import signing
+
+TOKEN_SALT = 'auth_app.tokens'
+
+
+class InvalidToken(Exception):
+    """Токен повреждён, подделан или просрочен"""
+
+
+@dataclass(frozen=True)
+class TokenUser:
+    """Пользователь, восстановленный из токена"""
+    id: uuid.UUID
+    username: str
+
+    def as_user(self):
+        """Экземпляр User без загрузки из БД — для присваивания в ForeignKey"""
+        from .models import User
+        return User(id=self.id, username=self.username)
+
+
+def issue_token(user):
+    return signing.dumps(
+        {'uid': str(user.id), 'name': user.username},
+        salt=TOKEN_SALT,
+        compress=True,
+    )
+
+
+def verify_token(token):
+    """Проверить подпись и срок действия; вернуть TokenUser или бросить InvalidToken"""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.AUTH_TOKEN_MAX_AGE)
+        return TokenUser(id=uuid.UUID(payload['uid']), username=payload['name'])
+    except signing.SignatureExpired:
+        raise InvalidToken('Token expired')
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken('Invalid token')
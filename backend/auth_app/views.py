@@ -1,10 +1,11 @@
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.hashers import make_password, check_password
 import json
 
+from backend.responses import JsonResponse
 from .models import User
+from .tokens import issue_token
 
 
 @csrf_exempt
@@ -37,7 +38,7 @@ def register(request):
 
         # Возвращаем токен и данные пользователя для автоматического входа
         response_data = {
-            "token": "fake_jwt_token_here",
+            "token": issue_token(user),
             "user": {
                 "id": user.id,
                 "username": user.username
@@ -79,9 +80,8 @@ def login(request):
         if not check_password(password, user.password):
             return JsonResponse({"error": "Invalid login or password"}, status=401)
 
-        # TODO: Здесь позже можно вставить JWT
         response_data = {
-            "token": "fake_jwt_token_here",
+            "token": issue_token(user),
             "user": {
                 "id": user.id,
                 "username": user.username
@@ -2,6 +2,9 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django, WebSocket connections to /ws/boards/{boardId} are served
+by boards.consumers. Run with a WebSocket-capable server, e.g.
+``uvicorn backend.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +16,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после инициализации Django: обработчику нужны модели
+from boards.consumers import board_socket, match_board_socket  # noqa: E402
+from stickers.writebehind import geometry_buffer  # noqa: E402
+
+# Фоновый сброс отложенной геометрии стикеров (stickers.writebehind)
+geometry_buffer.start()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        board_id = match_board_socket(scope['path'])
+        if board_id is None:
+            await receive()
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+        await board_socket(scope, receive, send, board_id)
+        return
+
+    await django_application(scope, receive, send)
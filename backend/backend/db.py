@@ -0,0 +1,66 @@
+"""
+Транзакции с повтором при блокировке SQLite.
+
+SQLite допускает одного писателя; при конкурентной записи остальные
+получают OperationalError "database is locked". atomic_retry повторяет
+транзакцию целиком с экспоненциальной задержкой и джиттером, а после
+исчерпания попыток бросает DatabaseBusy — вьюхи отвечают на неё 503.
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from .responses import JsonResponse
+
+LOCK_ERROR_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+class DatabaseBusy(OperationalError):
+    """База занята другими писателями дольше, чем допускают повторы"""
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return any(text in message for text in LOCK_ERROR_MESSAGES)
+
+
+def atomic_retry(func):
+    """
+    Выполнить функцию в transaction.atomic(), повторяя при блокировке БД.
+    Внутри уже открытой транзакции повторять нельзя — функция просто
+    выполняется во вложенном atomic, а ошибка уходит во внешний блок.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+
+        attempts = settings.DATABASE_LOCK_RETRIES
+        delay = settings.DATABASE_LOCK_RETRY_DELAY
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                if attempt == attempts - 1:
+                    raise DatabaseBusy(str(e)) from e
+                time.sleep(delay * (2 ** attempt) * (0.5 + random.random()))
+
+    return wrapper
+
+
+def run_atomic(func, *args, **kwargs):
+    """Вызвать func(*args, **kwargs) через atomic_retry"""
+    return atomic_retry(func)(*args, **kwargs)
+
+
+def busy_response():
+    response = JsonResponse({'error': 'Database is busy, please retry'}, status=503)
+    response['Retry-After'] = '1'
+    return response
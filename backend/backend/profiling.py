@@ -0,0 +1,154 @@
+"""
+Выборочное профилирование запросов через cProfile.
+
+ProfilingMiddleware профилирует долю запросов PROFILING_SAMPLE_RATE
+и любой запрос с заголовком PROFILING_HEADER (если он разрешён).
+Для каждого такого запроса в PROFILING_DIR пишутся два файла:
+    <время>_<маршрут>_<длительность>ms.prof  — для pstats / snakeviz
+    <время>_<маршрут>_<длительность>ms.json  — разбивка времени:
+        db_ms (SQL), json_ms (кодирование JSON), view_ms (остальное)
+Каталог ротируется: хранятся последние PROFILING_MAX_FILES профилей.
+
+Непрофилируемый запрос стоит одного random() и поиска заголовка.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# В Python 3.12+ одновременно может работать только один cProfile в процессе
+_profile_lock = threading.Lock()
+
+# Функции, время которых считается кодированием JSON (cumulative).
+# Ответы кодирует backend.responses (orjson или json); у встроенных
+# функций вместо файла '~'.
+JSON_ENCODE_FUNCTIONS = (
+    ('backend/responses.py', 'dumps_orjson'),
+    ('backend/responses.py', 'dumps_stdlib'),
+    ('~', '<orjson.dumps>'),
+    ('json/encoder.py', 'encode'),
+)
+
+
+class QueryTimer:
+    """execute_wrapper: суммарное время и количество SQL-запросов"""
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+def route_name(request):
+    """Маршрут запроса для имени файла: шаблон URL без параметров"""
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match is not None and match.route else request.path
+    route = re.sub(r'<[^>]*>', 'id', route)
+    return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+
+
+def is_json_encode(function):
+    filename, _, name = function
+    return any(filename.endswith(suffix) and name == func for suffix, func in JSON_ENCODE_FUNCTIONS)
+
+
+def json_encode_time(stats):
+    # Функции из списка вызывают друг друга (dumps_orjson -> orjson.dumps):
+    # считается только время вызовов не из другой такой функции
+    total = 0.0
+    for function, (_, _, _, cumulative, callers) in stats.stats.items():
+        if not is_json_encode(function):
+            continue
+        if not callers:
+            total += cumulative
+            continue
+        for caller, (_, _, _, caller_cumulative) in callers.items():
+            if not is_json_encode(caller):
+                total += caller_cumulative
+    return total
+
+
+def rotate(directory, keep):
+    profiles = sorted(directory.glob('*.prof'))
+    for path in profiles[:max(0, len(profiles) - keep)]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.json').unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return True
+        return settings.PROFILING_ALLOW_HEADER and settings.PROFILING_HEADER in request.headers
+
+    def __call__(self, request):
+        if not self.should_profile(request) or not _profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            timer = QueryTimer()
+            started = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            elapsed = time.perf_counter() - started
+        finally:
+            _profile_lock.release()
+
+        try:
+            self.save(request, response, profiler, timer, elapsed)
+        except Exception:
+            logger.exception('Failed to save request profile')
+        return response
+
+    def save(self, request, response, profiler, timer, elapsed):
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        stats = pstats.Stats(profiler)
+        json_time = json_encode_time(stats)
+        view_time = max(0.0, elapsed - timer.elapsed - json_time)
+
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}_{os.getpid()}_{route_name(request)}_{round(elapsed * 1000)}ms'
+        profiler.dump_stats(directory / f'{name}.prof')
+        summary = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(elapsed * 1000, 2),
+            'db_ms': round(timer.elapsed * 1000, 2),
+            'db_queries': timer.count,
+            'json_ms': round(json_time * 1000, 2),
+            'view_ms': round(view_time * 1000, 2),
+        }
+        with open(directory / f'{name}.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+
+        rotate(directory, settings.PROFILING_MAX_FILES)
+        logger.info('Profiled %s %s: %s', request.method, request.path, summary)
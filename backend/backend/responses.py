@@ -0,0 +1,98 @@
+"""
+Единый JSON-ответ для всех вьюх.
+
+JsonResponse здесь — замена django.http.JsonResponse с тем же
+интерфейсом. Кодирует через orjson, если он установлен, иначе через
+стандартный json; оба варианта дают одинаковые байты. UUID, даты, Decimal,
+строки моделей и queryset'ы сериализуются напрямую, без ручного str() во вьюхах.
+
+Отличия от django.http.JsonResponse: разделители без пробелов и UTF-8
+вместо экранирования \\uXXXX (значения те же, меняется только запись). Даты, время и
+интервалы записываются как в DjangoJSONEncoder (миллисекунды, Z для UTC),
+чтобы клиенты, сравнивающие метки времени строками, не заметили разницы.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from django.db.models import Model
+from django.http import HttpResponse
+from django.utils.duration import duration_iso_string
+from django.utils.functional import Promise
+from django.utils.timezone import is_aware
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+
+def default(obj):
+    """Типы, которых нет в JSON: общий обработчик для orjson и json"""
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        # Формат DjangoJSONEncoder: микросекунды усекаются до миллисекунд, UTC — Z
+        text = obj.isoformat()
+        if obj.microsecond:
+            text = text[:23] + text[26:]
+        if text.endswith('+00:00'):
+            text = text.removesuffix('+00:00') + 'Z'
+        return text
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, datetime.time):
+        if is_aware(obj):
+            raise ValueError("JSON can't represent timezone-aware times.")
+        text = obj.isoformat()
+        return text[:12] if obj.microsecond else text
+    if isinstance(obj, datetime.timedelta):
+        return duration_iso_string(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, Model):
+        return {field.attname: getattr(obj, field.attname) for field in obj._meta.concrete_fields}
+    if isinstance(obj, bytes):
+        return obj.decode()
+    # queryset'ы (в т.ч. values/values_list), множества, генераторы
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps_stdlib(data):
+    return json.dumps(
+        data, default=default, ensure_ascii=False, separators=(',', ':'), allow_nan=False
+    ).encode()
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps_orjson(data):
+        return orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+
+    dumps = dumps_orjson
+    BACKEND = 'orjson'
+else:
+    dumps_orjson = None
+    dumps = dumps_stdlib
+    BACKEND = 'json'
+
+
+class JsonResponse(HttpResponse):
+    """
+    Аналог django.http.JsonResponse на быстром кодировщике.
+    safe=True разрешает на верхнем уровне только dict, как и в Django.
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
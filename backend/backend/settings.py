@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,12 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы профиль покрывал весь стек middleware
+    'backend.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'auth_app.middleware.TokenAuthMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,17 +84,55 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Профиль хранилища выбирается переменной окружения DATABASE_PROFILE:
+#   development — как раньше: журнал по умолчанию, новое соединение на запрос;
+#   production  — WAL, synchronous=NORMAL, mmap и большой кеш страниц,
+#                 постоянные соединения и BEGIN IMMEDIATE для записей.
+# Повторы при блокировке SQLite — backend.db.atomic_retry.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+
+SQLITE_PROFILES = {
+    'development': {
+        'CONN_MAX_AGE': 0,
         'OPTIONS': {
             'timeout': 20,
             'init_command': 'PRAGMA foreign_keys = ON;',
-        }
+        },
+    },
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Короткое ожидание блокировки: дальше повторяет atomic_retry с backoff
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA foreign_keys = ON;'
+                'PRAGMA journal_mode = WAL;'
+                'PRAGMA synchronous = NORMAL;'
+                'PRAGMA mmap_size = 268435456;'
+                'PRAGMA cache_size = -65536;'
+                'PRAGMA temp_store = MEMORY;'
+            ),
+        },
+    },
+}
+
+if DATABASE_PROFILE not in SQLITE_PROFILES:
+    raise ImproperlyConfigured(f'Unknown DATABASE_PROFILE: {DATABASE_PROFILE}')
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        **SQLITE_PROFILES[DATABASE_PROFILE],
     }
 }
 
+# Повторы транзакций при "database is locked": число попыток и начальная задержка в секундах
+DATABASE_LOCK_RETRIES = 5
+DATABASE_LOCK_RETRY_DELAY = 0.05
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -155,4 +199,67 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'x-user-id',
+    'if-none-match',
+    'x-profile',
 ]
+
+# Заголовки ответа, доступные фронтенду
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'link',
+    'x-next-cursor',
+]
+
+# Сколько дней хранить надгробия удалённых стикеров для ?since= синхронизации
+STICKER_TOMBSTONE_RETENTION_DAYS = 30
+
+# Кеш проверок доступа к доскам (boards.access): число записей и TTL в секундах
+BOARD_ACCESS_CACHE_SIZE = 10000
+BOARD_ACCESS_CACHE_TTL = 60
+
+# Срок действия токенов авторизации (auth_app.tokens), в секундах
+AUTH_TOKEN_MAX_AGE = 60 * 60 * 24
+
+# Пользователь без токена: X-User-Id, ?userId= или userId в теле. Им может
+# представиться кто угодно, поэтому по умолчанию выключено — только для
+# локальной отладки старых клиентов
+AUTH_ALLOW_USER_ID_FALLBACK = os.environ.get('AUTH_ALLOW_USER_ID_FALLBACK') == '1'
+
+# Интервал сброса отложенных PATCH координат/размеров стикеров (stickers.writebehind),
+# в секундах; 0 — писать сразу
+STICKER_GEOMETRY_FLUSH_INTERVAL = 0.25
+
+# Список досок (boards.pagination): размер страницы по умолчанию и максимальный ?limit=
+BOARD_LIST_PAGE_SIZE = 50
+BOARD_LIST_MAX_PAGE_SIZE = 200
+
+# Размер пачки стикеров при потоковой выдаче (?stream=json|ndjson)
+STICKER_STREAM_CHUNK_SIZE = 2000
+
+# Импорт досок из NDJSON (stickers.transfer): стикеров в одной транзакции
+BOARD_IMPORT_BATCH_SIZE = 10000
+
+# Полнотекстовый поиск по стикерам (stickers.search): результатов по умолчанию и максимум ?limit=
+STICKER_SEARCH_LIMIT = 20
+STICKER_SEARCH_MAX_LIMIT = 100
+
+# Кеш готовых JSON-ответов со стикерами доски (stickers.documents), в байтах
+BOARD_DOCUMENT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Версии досок (stickers.snapshots): версия пишется каждые BOARD_SNAPSHOT_EVERY
+# изменений (0 — только при автосохранении и восстановлении), каждая
+# BOARD_SNAPSHOT_FULL_EVERY-я версия полная, остальные — дельты.
+# BOARD_SNAPSHOT_READS — отдавать полную доску из последней версии и хвоста изменений
+BOARD_SNAPSHOT_EVERY = 100
+BOARD_SNAPSHOT_FULL_EVERY = 10
+BOARD_SNAPSHOT_READS = False
+# Версии старше этого срока удаляет prune_sticker_tombstones (stickers.snapshots.prune_snapshots)
+BOARD_SNAPSHOT_RETENTION_DAYS = 30
+
+# Выборочное профилирование запросов (backend.profiling): доля профилируемых
+# запросов, заголовок для профилирования по запросу и каталог с профилями
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_HEADER = 'X-Profile'
+PROFILING_ALLOW_HEADER = DEBUG
+PROFILING_DIR = os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles')
+PROFILING_MAX_FILES = 200
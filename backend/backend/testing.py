@@ -0,0 +1,141 @@
+"""
+Бюджеты SQL-запросов для тестов вьюх.
+
+QueryBudgetMixin подмешивается к django.test.TestCase:
+
+    with self.assertQueryBudget(2):
+        self.client.get(url)
+
+    self.assertQueriesDoNotGrow(
+        lambda size: make_boards(user, size),   # довести данные до size
+        lambda: self.client.get(url),
+        sizes=(10, 1000),
+    )
+
+При нарушении сообщение об ошибке содержит все выполненные запросы.
+
+token_headers(user) — заголовок Authorization с токеном пользователя
+для self.client.get(url, **token_headers(user)).
+
+QueryPlanMixin проверяет планы выполнения (SQLite, EXPLAIN QUERY PLAN):
+
+    self.assertQueriesUseIndexes(lambda: self.client.get(url))
+
+Каждый SELECT, UPDATE и DELETE блока должен читать таблицы по индексу —
+без полного прохода (SCAN таблицы) и без сортировки во временном B-дереве.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from auth_app.tokens import issue_token
+
+
+# Длинные INSERT из bulk_create обрезаются, чтобы сообщение оставалось читаемым
+MAX_SQL_LENGTH = 500
+
+# Запросы, у которых есть план чтения (INSERT ... VALUES читать нечего)
+PLANNED_SQL_RE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|WITH|INSERT\b.*\bSELECT\b)', re.IGNORECASE | re.DOTALL)
+# Полный проход таблицы или индекса; подзапросы, CTE и FTS5 (VIRTUAL TABLE) — не таблицы
+FULL_SCAN_RE = re.compile(r'^SCAN (?!\(|CONSTANT ROW)(?P<table>\S+)(?=\s|$)(?! VIRTUAL TABLE)')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def token_headers(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {issue_token(user)}'}
+
+
+def format_queries(queries):
+    lines = []
+    for index, query in enumerate(queries, start=1):
+        sql = query['sql']
+        if len(sql) > MAX_SQL_LENGTH:
+            sql = f'{sql[:MAX_SQL_LENGTH]}... ({len(sql)} chars)'
+        lines.append(f'{index}. {sql}')
+    return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        """Блок должен выполнить не больше budget SQL-запросов"""
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            self.fail(
+                f'{len(context)} queries executed, budget is {budget}:\n'
+                f'{format_queries(context.captured_queries)}'
+            )
+
+    def captureQueries(self, func, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            func()
+        return context.captured_queries
+
+    def assertQueriesDoNotGrow(self, grow, request, sizes=(10, 1000), warmup=True, using=DEFAULT_DB_ALIAS):
+        """
+        Число запросов request() не должно зависеть от объёма данных.
+        grow(size) доводит данные до size (размеры идут по возрастанию).
+        warmup: перед замером вызвать request() один раз, чтобы прогреть
+        кеши процесса (например, boards.access) и сравнивать установившийся режим.
+        """
+        measured = {}
+        for size in sizes:
+            grow(size)
+            if warmup:
+                request()
+            measured[size] = self.captureQueries(request, using=using)
+
+        smallest, largest = min(sizes), max(sizes)
+        if len(measured[largest]) > len(measured[smallest]):
+            self.fail(
+                f'Query count grows with data size: {len(measured[smallest])} queries '
+                f'at {smallest}, {len(measured[largest])} at {largest}.\n'
+                f'At {smallest}:\n{format_queries(measured[smallest])}\n'
+                f'At {largest}:\n{format_queries(measured[largest])}'
+            )
+        return {size: len(queries) for size, queries in measured.items()}
+
+
+def query_plan(sql, using=DEFAULT_DB_ALIAS):
+    """Строки EXPLAIN QUERY PLAN запроса (только detail)"""
+    with connections[using].cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, allowed_scans=()):
+    """Полные проходы таблиц и сортировки во временном B-дереве в плане"""
+    problems = []
+    for detail in plan:
+        match = FULL_SCAN_RE.match(detail)
+        if match and match.group('table') not in allowed_scans:
+            problems.append(detail)
+        elif TEMP_SORT in detail:
+            problems.append(detail)
+    return problems
+
+
+class QueryPlanMixin:
+    def assertQueriesUseIndexes(self, func, allowed_scans=(), using=DEFAULT_DB_ALIAS):
+        """
+        Все запросы func() должны обходиться индексами.
+        allowed_scans — таблицы, полный проход которых допустим (например, CTE).
+        Возвращает захваченные запросы.
+        """
+        with CaptureQueriesContext(connections[using]) as context:
+            func()
+
+        failures = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not PLANNED_SQL_RE.match(sql):
+                continue
+            problems = plan_problems(query_plan(sql, using=using), allowed_scans)
+            if problems:
+                failures.append(f'{format_queries([query])[3:]}\n   -> {"; ".join(problems)}')
+        if failures:
+            self.fail('Queries without a usable index:\n' + '\n'.join(failures))
+        return context.captured_queries
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Фоновый сброс отложенной геометрии стикеров (stickers.writebehind)
+from stickers.writebehind import geometry_buffer  # noqa: E402
+
+geometry_buffer.start()
@@ -0,0 +1,71 @@
+"""
+Кодирование больших ответов со стикерами: django.http.JsonResponse
+(DjangoJSONEncoder) против backend.responses (orjson и запасной json).
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_json_responses [--sizes 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.core.serializers.json import DjangoJSONEncoder  # noqa: E402
+
+from backend import responses  # noqa: E402
+from benchmarks.bench_sticker_formats import make_stickers, measure  # noqa: E402
+from stickers.views import COMPACT_COLUMNS, rows_to_columns, sticker_to_element  # noqa: E402
+
+
+def django_dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def payloads(count):
+    stickers = make_stickers(count)
+    fields = [field for _, field in COMPACT_COLUMNS]
+    rows = [tuple(getattr(sticker, field) for field in fields) for sticker in stickers]
+    return {
+        'full': {'board': {'elements': [sticker_to_element(sticker) for sticker in stickers]}},
+        'compact': {'board': {'format': 'compact', 'stickers': rows_to_columns(rows)}},
+        # Сырые UUID без str(): так их отдаёт auth_app и values()
+        'rows': {'stickers': [dict(zip(fields, row)) for row in rows]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    encoders = [('django', django_dumps), ('json', responses.dumps_stdlib)]
+    if responses.dumps_orjson is not None:
+        encoders.append(('orjson', responses.dumps_orjson))
+    else:
+        print('orjson is not installed, comparing stdlib encoders only')
+
+    print(f'{"stickers":>9} {"payload":>8} {"encoder":>8} {"time ms":>9} {"bytes":>11} {"speedup":>8}')
+    for size in args.sizes:
+        for name, payload in payloads(size).items():
+            baseline = None
+            outputs = set()
+            for encoder_name, encode in encoders:
+                elapsed, length = measure(encode, payload, args.repeat)
+                baseline = baseline or elapsed
+                if encoder_name != 'django':
+                    outputs.add(encode(payload))
+                print(
+                    f'{size:>9} {name:>8} {encoder_name:>8} {elapsed * 1000:>9.1f} '
+                    f'{length:>11} {baseline / elapsed:>7.2f}x'
+                )
+            if len(outputs) > 1:
+                print(f'WARNING: encoders disagree on {name} payload')
+
+
+if __name__ == '__main__':
+    main()
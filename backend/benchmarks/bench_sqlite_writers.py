@@ -0,0 +1,144 @@
+"""
+Конкурентная запись в SQLite: профили DATABASE_PROFILE development и
+production при 8–32 потоках-писателях.
+
+Каждый прогон идёт в отдельном процессе на свежей временной базе
+(DATABASE_PATH). Писатели создают и двигают стикеры через
+stickers.services, как это делают вьюхи; после каждой операции
+вызывается close_old_connections(), как по завершении запроса, так что
+постоянные соединения (CONN_MAX_AGE) тоже учитываются.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_sqlite_writers [--writers 8 16 32] [--duration 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = ('development', 'production')
+
+
+def run_child(writers, duration, boards):
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import close_old_connections, connection
+
+    from backend.db import DatabaseBusy
+    from boards.models import Boards
+    from stickers.services import create_sticker, update_sticker
+
+    call_command('migrate', verbosity=0)
+    board_ids = [Boards.objects.create(title=f'Bench {i}').id for i in range(boards)]
+    connection.close()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    totals = {'ops': 0, 'busy': 0, 'errors': 0}
+    latencies = []
+
+    def writer(index):
+        board = Boards.objects.get(id=board_ids[index % len(board_ids)])
+        sticker = None
+        ops = busy = errors = 0
+        local_latencies = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                if sticker is None or ops % 4 == 0:
+                    sticker = create_sticker(board, {
+                        'content': f'Writer {index}', 'color': '#FFEB3B',
+                        'x': ops, 'y': index, 'width': 200, 'height': 150, 'z_index': 0,
+                    })
+                else:
+                    update_sticker(sticker, {'x': sticker.x + 1, 'y': sticker.y + 1})
+                ops += 1
+                local_latencies.append(time.perf_counter() - started)
+            except DatabaseBusy:
+                busy += 1
+            except Exception:
+                errors += 1
+            finally:
+                close_old_connections()
+        connection.close()
+        with lock:
+            totals['ops'] += ops
+            totals['busy'] += busy
+            totals['errors'] += errors
+            latencies.extend(local_latencies)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+    print(json.dumps({
+        'ops': totals['ops'],
+        'ops_per_sec': round(totals['ops'] / elapsed, 1),
+        'busy': totals['busy'],
+        'errors': totals['errors'],
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+    }))
+
+
+def run_profile(profile, writers, duration, boards):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_PROFILE=profile,
+            DATABASE_PATH=os.path.join(tmp, 'bench.sqlite3'),
+        )
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_sqlite_writers', '--child',
+             '--writers', str(writers), '--duration', str(duration), '--boards', str(boards)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--boards', type=int, default=4, help='сколько досок делят писатели')
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.writers[0], args.duration, args.boards)
+        return
+
+    print(f'{"profile":>12} {"writers":>8} {"ops/s":>10} {"p50 ms":>8} {"p99 ms":>8} {"busy":>6} {"errors":>7}')
+    for writers in args.writers:
+        for profile in args.profiles:
+            result = run_profile(profile, writers, args.duration, args.boards)
+            print(
+                f'{profile:>12} {writers:>8} {result["ops_per_sec"]:>10} '
+                f'{result["p50_ms"]!s:>8} {result["p99_ms"]!s:>8} {result["busy"]:>6} {result["errors"]:>7}'
+            )
+
+
+if __name__ == '__main__':
+    main()
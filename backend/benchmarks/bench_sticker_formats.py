@@ -0,0 +1,83 @@
+"""
+Сравнение полного и компактного формата GET /boards/{boardId}/stickers:
+время кодирования и размер ответа для синтетических досок.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_sticker_formats [--sizes 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.core.serializers.json import DjangoJSONEncoder  # noqa: E402
+
+from stickers.models import Stickers  # noqa: E402
+from stickers.views import COMPACT_COLUMNS, rows_to_columns, sticker_to_element  # noqa: E402
+
+
+def make_stickers(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        Stickers(
+            id=uuid.uuid4(),
+            content=f'Sticker {i}',
+            color=f'#{rng.randrange(0x1000000):06X}',
+            x=rng.randint(-20000, 20000),
+            y=rng.randint(-20000, 20000),
+            width=rng.choice([100, 150, 200]),
+            height=rng.choice([100, 150, 200]),
+            z_index=i,
+        )
+        for i in range(count)
+    ]
+
+
+def encode_full(stickers):
+    elements = [sticker_to_element(sticker) for sticker in stickers]
+    return json.dumps({'board': {'elements': elements}}, cls=DjangoJSONEncoder).encode()
+
+
+def encode_compact(rows):
+    columns = rows_to_columns(rows)
+    return json.dumps({'board': {'format': 'compact', 'stickers': columns}}, cls=DjangoJSONEncoder).encode()
+
+
+def measure(encode, payload, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode(payload)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'stickers':>10} {'format':>8} {'encode ms':>10} {'bytes':>12}")
+    for size in args.sizes:
+        stickers = make_stickers(size)
+        # Компактный формат читает кортежи из values_list — эмулируем их
+        rows = [
+            tuple(getattr(sticker, field) for _, field in COMPACT_COLUMNS)
+            for sticker in stickers
+        ]
+        for name, encode, payload in (('full', encode_full, stickers), ('compact', encode_compact, rows)):
+            seconds, size_bytes = measure(encode, payload, args.repeat)
+            print(f'{size:>10} {name:>8} {seconds * 1000:>10.1f} {size_bytes:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Генератор нагрузки для HTTP API досок (/api/...).
+
+Работает против запущенного сервера и не импортирует Django:
+    python manage.py runserver          # или uvicorn backend.asgi:application
+    python -m benchmarks.loadgen --url http://localhost:8000 --duration 30
+
+Сначала через API заводятся синтетические пользователи, доски и стикеры
+(--users, --boards-per-user, --stickers-per-board), затем --concurrency
+потоков воспроизводят сценарии в пропорциях --mix:
+    open    — открыть доску: GET доски и GET её стикеров
+    drag    — перетащить стикер: серия PATCH {x, y}
+    churn   — создать стикер и удалить его
+    list    — список досок пользователя
+    share   — поделиться доской с другим пользователем
+По каждому эндпоинту (метод + шаблон пути) в JSON выводятся количество
+запросов, пропускная способность, p50/p95/p99 и коды ответов.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+DEFAULT_MIX = 'open=40,drag=30,churn=15,list=10,share=5'
+DRAG_STEPS = 5
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'unknown scenario: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p * (len(sorted_values) - 1))))
+    return round(sorted_values[index] * 1000, 2)
+
+
+class Stats:
+    """Задержки и коды ответов по эндпоинтам, общие для всех потоков"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._statuses = {}
+
+    def record(self, endpoint, status, elapsed):
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(elapsed)
+            statuses = self._statuses.setdefault(endpoint, {})
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        total = 0
+        with self._lock:
+            for endpoint, latencies in sorted(self._latencies.items()):
+                latencies = sorted(latencies)
+                total += len(latencies)
+                statuses = self._statuses[endpoint]
+                endpoints[endpoint] = {
+                    'requests': len(latencies),
+                    'rps': round(len(latencies) / elapsed, 1),
+                    'p50_ms': percentile(latencies, 0.50),
+                    'p95_ms': percentile(latencies, 0.95),
+                    'p99_ms': percentile(latencies, 0.99),
+                    'max_ms': round(latencies[-1] * 1000, 2),
+                    'errors': sum(count for status, count in statuses.items() if status == 'error' or status >= 500),
+                    'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+                }
+        return {'requests': total, 'rps': round(total / elapsed, 1), 'endpoints': endpoints}
+
+
+class Client:
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+
+    def request(self, method, path, endpoint, token=None, body=None):
+        """
+        Выполнить запрос и записать его в статистику под именем endpoint.
+        Возвращает (status, json или None); status='error' при сетевой ошибке.
+        """
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+        if token:
+            request.add_header('Authorization', f'Bearer {token}')
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        except (urllib.error.URLError, OSError):
+            status, payload = 'error', b''
+        self.stats.record(f'{method} {endpoint}', status, time.perf_counter() - started)
+
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+
+class Session:
+    """Синтетический пользователь: токен, его доски и стикеры на них"""
+
+    def __init__(self, user_id, username, token):
+        self.user_id = user_id
+        self.username = username
+        self.token = token
+        self.boards = {}
+
+
+def seed(client, args, rng):
+    """Завести пользователей, доски и стикеры через API"""
+    run = uuid.uuid4().hex[:8]
+    sessions = []
+    for i in range(args.users):
+        username = f'load-{run}-{i}'
+        status, data = client.request(
+            'POST', '/api/auth/register', '/api/auth/register',
+            body={'username': username, 'password': 'load-password'}
+        )
+        if status != 201:
+            raise SystemExit(f'Failed to register {username}: {status} {data}')
+        sessions.append(Session(data['user']['id'], username, data['token']))
+
+    for session in sessions:
+        for b in range(args.boards_per_user):
+            status, data = client.request(
+                'POST', '/api/boards/new', '/api/boards/new', token=session.token,
+                body={'title': f'Load board {b}', 'description': 'loadgen'}
+            )
+            if status != 201:
+                raise SystemExit(f'Failed to create board: {status} {data}')
+            board_id = data['board']['id']
+            session.boards[board_id] = []
+
+            for offset in range(0, args.stickers_per_board, args.seed_batch):
+                count = min(args.seed_batch, args.stickers_per_board - offset)
+                operations = [
+                    {'op': 'create', 'data': {
+                        'content': f'Sticker {offset + n}',
+                        'color': '#FFEB3B',
+                        'x': rng.randint(0, 5000),
+                        'y': rng.randint(0, 5000),
+                    }}
+                    for n in range(count)
+                ]
+                status, data = client.request(
+                    'POST', f'/api/boards/{board_id}/stickers/batch', '/api/boards/{id}/stickers/batch',
+                    token=session.token, body={'operations': operations}
+                )
+                if status != 200:
+                    raise SystemExit(f'Failed to seed stickers: {status} {data}')
+                session.boards[board_id].extend(result['sticker']['id'] for result in data['results'])
+    return sessions
+
+
+def scenario_open(client, session, sessions, rng):
+    board_id = rng.choice(list(session.boards))
+    client.request('GET', f'/api/boards/{board_id}', '/api/boards/{id}', token=session.token)
+    client.request('GET', f'/api/boards/{board_id}/stickers', '/api/boards/{id}/stickers', token=session.token)
+
+
+def scenario_drag(client, session, sessions, rng):
+    stickers = session.boards[rng.choice(list(session.boards))]
+    if not stickers:
+        return
+    sticker_id = rng.choice(stickers)
+    x, y = rng.randint(0, 5000), rng.randint(0, 5000)
+    for _ in range(DRAG_STEPS):
+        x += rng.randint(-20, 20)
+        y += rng.randint(-20, 20)
+        client.request(
+            'PATCH', f'/api/stickers/{sticker_id}', '/api/stickers/{id}',
+            token=session.token, body={'x': x, 'y': y}
+        )
+
+
+def scenario_churn(client, session, sessions, rng):
+    board_id = rng.choice(list(session.boards))
+    status, data = client.request(
+        'POST', f'/api/boards/{board_id}/stickers', '/api/boards/{id}/stickers', token=session.token,
+        body={'content': 'Churn', 'color': '#4CAF50', 'x': rng.randint(0, 5000), 'y': rng.randint(0, 5000)}
+    )
+    if status == 201:
+        client.request('DELETE', f'/api/stickers/{data["id"]}', '/api/stickers/{id}', token=session.token)
+
+
+def scenario_list(client, session, sessions, rng):
+    client.request('GET', '/api/boards', '/api/boards', token=session.token)
+
+
+def scenario_share(client, session, sessions, rng):
+    if len(sessions) < 2:
+        return
+    target = rng.choice([other for other in sessions if other is not session])
+    board_id = rng.choice(list(session.boards))
+    # Повторный шаринг отвечает 409 — это ожидаемо и тоже нагрузка
+    client.request(
+        'POST', f'/api/boards/{board_id}/share', '/api/boards/{id}/share',
+        token=session.token, body={'username': target.username}
+    )
+
+
+SCENARIOS = {
+    'open': scenario_open,
+    'drag': scenario_drag,
+    'churn': scenario_churn,
+    'list': scenario_list,
+    'share': scenario_share,
+}
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    seed_stats = Stats()
+    seeded_at = time.perf_counter()
+    sessions = seed(Client(args.url, seed_stats, args.timeout), args, rng)
+    seed_elapsed = time.perf_counter() - seeded_at
+
+    stats = Stats()
+    client = Client(args.url, stats, args.timeout)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    deadline = time.perf_counter() + args.duration
+    scenario_counts = {name: 0 for name in names}
+    counts_lock = threading.Lock()
+
+    def worker(index):
+        worker_rng = random.Random(args.seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            name = worker_rng.choices(names, weights)[0]
+            SCENARIOS[name](client, worker_rng.choice(sessions), sessions, worker_rng)
+            with counts_lock:
+                scenario_counts[name] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'url': args.url,
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {
+            'users': args.users,
+            'boards_per_user': args.boards_per_user,
+            'stickers_per_board': args.stickers_per_board,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'mix': args.mix,
+            'seed': args.seed,
+        },
+        'seed': {'elapsed_s': round(seed_elapsed, 2), **seed_stats.report(seed_elapsed)},
+        'elapsed_s': round(elapsed, 2),
+        'scenarios': scenario_counts,
+        **stats.report(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--boards-per-user', type=int, default=2)
+    parser.add_argument('--stickers-per-board', type=int, default=200)
+    parser.add_argument('--seed-batch', type=int, default=200, help='стикеров в одном batch-запросе при заполнении')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--output', help='записать JSON-отчёт в файл вместо stdout')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+        print(f'Report written to {args.output}', file=sys.stderr)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Проверка доступа к доскам с кешем ролей (user, board) -> role.
+
+Кеш живёт в памяти процесса, ограничен по размеру (LRU) и по времени (TTL).
+Локальные изменения участников сбрасывают записи через сигналы
+(boards.signals); изменения, сделанные другими процессами, видны не
+позже чем через BOARD_ACCESS_CACHE_TTL секунд.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Board_Users
+
+_MISSING = object()
+
+
+class AccessCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return _MISSING
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_matching(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': self.hits / requests if requests else 0.0,
+            }
+
+
+access_cache = AccessCache(
+    maxsize=getattr(settings, 'BOARD_ACCESS_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'BOARD_ACCESS_CACHE_TTL', 60),
+)
+
+
+def get_board_role(user_id, board_id):
+    """Роль пользователя на доске (owner/member) или None, если доступа нет"""
+    key = (str(user_id), str(board_id))
+    role = access_cache.get(key)
+    if role is _MISSING:
+        role = Board_Users.objects.filter(
+            user_id=user_id,
+            board_id=board_id
+        ).values_list('role', flat=True).first()
+        access_cache.set(key, role)
+    return role
+
+
+def invalidate_membership(user_id, board_id):
+    access_cache.discard((str(user_id), str(board_id)))
+
+
+def invalidate_board(board_id):
+    board_id = str(board_id)
+    access_cache.discard_matching(lambda key: key[1] == board_id)
+
+
+def invalidate_user(user_id):
+    user_id = str(user_id)
+    access_cache.discard_matching(lambda key: key[0] == user_id)
@@ -11,6 +11,6 @@ class BoardsAdmin(admin.ModelAdmin):
 
 @admin.register(Board_Users)
 class Board_UsersAdmin(admin.ModelAdmin):
-    list_display = ('user_id', 'board_id')
+    list_display = ('user_id', 'board_id', 'role')
     search_fields = ('user_id__username', 'board_id__title')
-    list_filter = ('board_id',)
+    list_filter = ('board_id', 'role')
@@ -0,0 +1,113 @@
+"""
+Внутрипроцессный pub/sub для событий досок.
+
+Синхронные вьюхи публикуют события после коммита транзакции, подписчики —
+WebSocket-соединения в event loop ASGI-сервера. Брокер живёт в памяти
+процесса, поэтому события видят только клиенты, подключённые к тому же
+воркеру.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# Событие, которое получает отставший подписчик вместо потерянных событий
+RESYNC_EVENT = json.dumps({'type': 'board.resync'})
+# Последнее сообщение подписки, у которой отозван доступ к доске
+SUBSCRIPTION_CLOSED = object()
+
+
+class Subscription:
+    def __init__(self, board_id, loop, user_id=None):
+        self.board_id = board_id
+        self.loop = loop
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, message):
+        """Положить сообщение в очередь; вызывается в event loop подписчика"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Клиент не успевает — выбрасываем очередь и просим перечитать доску
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    def close(self):
+        """Отбросить очередь и закончить её SUBSCRIPTION_CLOSED; вызывается в event loop подписчика"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(SUBSCRIPTION_CLOSED)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class BoardBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, board_id, user_id=None):
+        """Подписаться на события доски; вызывать из работающего event loop"""
+        subscription = Subscription(str(board_id), asyncio.get_running_loop(), user_id)
+        with self._lock:
+            self._subscribers[subscription.board_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.board_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.board_id]
+
+    def subscriber_count(self, board_id):
+        with self._lock:
+            return len(self._subscribers.get(str(board_id), ()))
+
+    def publish(self, board_id, event):
+        """Разослать событие всем подписчикам доски; можно вызывать из любого потока"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(board_id), ()))
+        if not subscribers:
+            return
+
+        # Кодируем один раз на всех подписчиков
+        message = json.dumps(event)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # Event loop подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+    def publish_on_commit(self, board_id, event):
+        """Опубликовать событие после коммита текущей транзакции"""
+        transaction.on_commit(lambda: self.publish(board_id, event))
+
+    def disconnect(self, board_id, user_id):
+        """Закрыть подписки пользователя на доску; можно вызывать из любого потока"""
+        with self._lock:
+            subscribers = [
+                subscription for subscription in self._subscribers.get(str(board_id), ())
+                if subscription.user_id == user_id
+            ]
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.close)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def disconnect_on_commit(self, board_id, user_id):
+        """Закрыть подписки пользователя на доску после коммита текущей транзакции"""
+        transaction.on_commit(lambda: self.disconnect(board_id, user_id))
+
+
+broker = BoardBroker()
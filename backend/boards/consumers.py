@@ -0,0 +1,136 @@
+"""
+WebSocket-обработчик событий доски: /ws/boards/{boardId}?token=...
+
+Браузер не может передать заголовок Authorization при подключении, поэтому
+токен (auth_app.tokens) передаётся в ?token= или подпротоколом:
+new WebSocket(url, ['bearer', token]) — тогда сервер отвечает подпротоколом bearer.
+userId без токена принимается только при AUTH_ALLOW_USER_ID_FALLBACK.
+
+Обработчик написан на чистом ASGI и подключается в backend/asgi.py.
+После подключения клиент получает JSON-сообщения:
+    sticker.created, sticker.updated, sticker.deleted — запись одного стикера;
+    stickers.batch — пакет операций (stickers.services.apply_sticker_operations);
+    stickers.moved — сброс отложенной геометрии (stickers.writebehind);
+    stickers.renumbered — перенумерация z_index доски (stickers.ordering);
+    board.resync — клиент не успевал читать события, доску нужно перечитать.
+
+Доступ проверяется при подключении. Когда участие пользователя удаляется
+(в том числе вместе с доской), сигнал boards.signals закрывает его сокеты
+доски кодом 4403. Брокер живёт в памяти процесса, поэтому закрываются
+сокеты на воркере, удалившем участие, — тех же, что получают события
+его записей.
+"""
+import asyncio
+import re
+import uuid
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from auth_app.tokens import InvalidToken, verify_token
+from .access import get_board_role
+from .broker import SUBSCRIPTION_CLOSED, broker
+
+BOARD_SOCKET_PATH = re.compile(r'^/ws/boards/(?P<board_id>[^/]+)/?$')
+TOKEN_SUBPROTOCOL = 'bearer'
+
+
+def match_board_socket(path):
+    """Вернуть board_id, если путь — WebSocket доски"""
+    match = BOARD_SOCKET_PATH.match(path)
+    return match.group('board_id') if match else None
+
+
+def get_socket_token(scope):
+    """Токен из ?token= или из подпротоколов ['bearer', token]; второй элемент — признак подпротокола"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    token = (query.get('token') or [None])[0]
+    if token:
+        return token, False
+    subprotocols = list(scope.get('subprotocols') or [])
+    if TOKEN_SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(TOKEN_SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], True
+    return None, False
+
+
+def get_socket_user_id(scope):
+    """
+    Пользователь сокета: из токена; без токена — из userId/X-User-Id,
+    если включён AUTH_ALLOW_USER_ID_FALLBACK. Бросает InvalidToken.
+    """
+    token, _ = get_socket_token(scope)
+    if token:
+        return verify_token(token).id
+    if not settings.AUTH_ALLOW_USER_ID_FALLBACK:
+        return None
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    user_id = (query.get('userId') or query.get('user_id') or [None])[0]
+    if not user_id:
+        for name, value in scope.get('headers', []):
+            if name == b'x-user-id':
+                user_id = value.decode()
+    try:
+        return uuid.UUID(user_id) if user_id else None
+    except ValueError:
+        return None
+
+
+@sync_to_async
+def has_board_access(user_id, board_id):
+    return get_board_role(user_id, board_id) is not None
+
+
+async def board_socket(scope, receive, send, board_id):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    try:
+        board_uuid = uuid.UUID(board_id)
+    except ValueError:
+        await send({'type': 'websocket.close', 'code': 4400})
+        return
+
+    try:
+        user_id = get_socket_user_id(scope)
+    except InvalidToken:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    if not user_id or not await has_board_access(user_id, board_uuid):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    subscription = broker.subscribe(board_uuid, user_id)
+    accept = {'type': 'websocket.accept'}
+    if get_socket_token(scope)[1]:
+        accept['subprotocol'] = TOKEN_SUBPROTOCOL
+    await send(accept)
+
+    receive_task = asyncio.ensure_future(receive())
+    event_task = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {receive_task, event_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receive_task in done:
+                message = receive_task.result()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                # Сообщения от клиента не обрабатываются, ждём следующее
+                receive_task = asyncio.ensure_future(receive())
+            if event_task in done:
+                message = event_task.result()
+                if message is SUBSCRIPTION_CLOSED:
+                    await send({'type': 'websocket.close', 'code': 4403})
+                    break
+                await send({'type': 'websocket.send', 'text': message})
+                event_task = asyncio.ensure_future(subscription.get())
+    finally:
+        broker.unsubscribe(subscription)
+        for task in (receive_task, event_task):
+            task.cancel()
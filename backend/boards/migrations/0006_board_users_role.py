@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_owner_role(apps, schema_editor):
+    """Владелец доски — первая запись Board_Users по id"""
+    Board_Users = apps.get_model('boards', 'Board_Users')
+    first_ids = Board_Users.objects.values('board_id').annotate(first_id=Min('id')).values('first_id')
+    Board_Users.objects.filter(id__in=first_ids).update(role='owner')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_alter_board_users_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board_users',
+            name='role',
+            field=models.CharField(choices=[('owner', 'Owner'), ('member', 'Member')], default='member', max_length=10),
+        ),
+        migrations.RunPython(backfill_owner_role, migrations.RunPython.noop),
+    ]
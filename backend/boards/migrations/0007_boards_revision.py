@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0006_board_users_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boards',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
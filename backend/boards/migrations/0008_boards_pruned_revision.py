@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0007_boards_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boards',
+            name='pruned_revision',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
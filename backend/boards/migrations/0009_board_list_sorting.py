@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Поля сортировки участий копируются из доски: при вставке участия
+# и при изменении названия или времени доски. SQLite удаляет триггеры
+# при пересоздании таблицы (AlterField и т.п.) — такие миграции должны
+# создавать их заново.
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER board_users_copy_board AFTER INSERT ON boards_board_users
+    BEGIN
+        UPDATE boards_board_users
+        SET board_title = b.title, board_created_at = b.created_at, board_updated_at = b.updated_at
+        FROM boards_boards AS b
+        WHERE boards_board_users.id = NEW.id AND b.id = NEW.board_id_id;
+    END
+    """,
+    """
+    CREATE TRIGGER boards_sync_board_users AFTER UPDATE OF title, created_at, updated_at ON boards_boards
+    BEGIN
+        UPDATE boards_board_users
+        SET board_title = NEW.title, board_created_at = NEW.created_at, board_updated_at = NEW.updated_at
+        WHERE board_id_id = NEW.id;
+    END
+    """,
+]
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS board_users_copy_board',
+    'DROP TRIGGER IF EXISTS boards_sync_board_users',
+]
+
+BACKFILL = """
+UPDATE boards_board_users
+SET board_title = b.title, board_created_at = b.created_at, board_updated_at = b.updated_at
+FROM boards_boards AS b
+WHERE b.id = boards_board_users.board_id_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0002_rename_users_user'),
+        ('boards', '0008_boards_pruned_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board_users',
+            name='board_created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='board_users',
+            name='board_title',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='board_users',
+            name='board_updated_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='boards',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='boards',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='board_users',
+            index=models.Index(fields=['user_id', 'board_updated_at', 'board_id'], name='board_users_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='board_users',
+            index=models.Index(fields=['user_id', 'board_created_at', 'board_id'], name='board_users_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='board_users',
+            index=models.Index(fields=['user_id', 'board_title', 'board_id'], name='board_users_title_idx'),
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
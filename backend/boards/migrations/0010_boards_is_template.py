@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+# Триггеры сортировки участий из миграции 0009: триггер участий ссылается
+# на boards_boards, поэтому пересоздать таблицу досок с ними нельзя
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER board_users_copy_board AFTER INSERT ON boards_board_users
+    BEGIN
+        UPDATE boards_board_users
+        SET board_title = b.title, board_created_at = b.created_at, board_updated_at = b.updated_at
+        FROM boards_boards AS b
+        WHERE boards_board_users.id = NEW.id AND b.id = NEW.board_id_id;
+    END
+    """,
+    """
+    CREATE TRIGGER boards_sync_board_users AFTER UPDATE OF title, created_at, updated_at ON boards_boards
+    BEGIN
+        UPDATE boards_board_users
+        SET board_title = NEW.title, board_created_at = NEW.created_at, board_updated_at = NEW.updated_at
+        WHERE board_id_id = NEW.id;
+    END
+    """,
+]
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS board_users_copy_board',
+    'DROP TRIGGER IF EXISTS boards_sync_board_users',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0009_board_list_sorting'),
+    ]
+
+    operations = [
+        # AddField пересоздаёт boards_boards — триггеры сортировки снимаются на это время
+        migrations.RunSQL(DROP_TRIGGERS, CREATE_TRIGGERS),
+        migrations.AddField(
+            model_name='boards',
+            name='is_template',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0002_rename_users_user'),
+        ('boards', '0010_boards_is_template'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='board_users',
+            index=models.Index(fields=['board_id', 'role'], name='board_users_board_role_idx'),
+        ),
+    ]
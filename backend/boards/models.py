@@ -1,27 +1,48 @@
 import uuid
 
 from django.db import models, IntegrityError
+from django.db.models import F
+from django.utils import timezone
 from auth_app.models import User
 
 
 class BoardsManager(models.Manager):
-    def create_board(self, title, owner, description=''):
+    def create_board(self, title, owner, description='', source=None, is_template=False):
+        """
+        Создать доску с владельцем owner.
+        source — доска, стикеры которой копируются в новую одним INSERT ... SELECT
+        (stickers.services.copy_board_stickers); вызывать внутри транзакции.
+        """
         board_id = uuid.uuid4()
         try:
             board = self.create(
                 id=board_id,
                 title=title,
-                description=description
+                description=description,
+                is_template=is_template,
+                # Скопированные стикеры получают первую ревизию новой доски
+                revision=0 if source is None else 1
             )
 
             Board_Users.objects.create(
                 user_id=owner,
-                board_id=board
+                board_id=board,
+                role=Board_Users.ROLE_OWNER
             )
+
+            if source is not None:
+                from stickers.services import copy_board_stickers
+                copy_board_stickers(source.id, board.id, board.revision)
             return board
         except IntegrityError:
             raise IntegrityError("Board creation failed")
 
+    def bump_revision(self, board_id):
+        """Увеличить ревизию доски, обновить время изменения и вернуть новую ревизию"""
+        # Время из Python, а не Now(): курсоры списка досок сравнивают его точно
+        self.filter(id=board_id).update(revision=F('revision') + 1, updated_at=timezone.now())
+        return self.filter(id=board_id).values_list('revision', flat=True).first()
+
 
 class Boards(models.Model):
     id = models.UUIDField(
@@ -30,6 +51,15 @@ class Boards(models.Model):
         unique=True)
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True, default='')
+    # Растёт при каждом изменении доски или её стикеров, используется как ETag
+    revision = models.PositiveBigIntegerField(default=0)
+    # До этой ревизии надгробия удалённых стикеров уже вычищены
+    pruned_revision = models.PositiveBigIntegerField(default=0)
+    # Шаблон: доска, с копии которой начинают новые доски
+    is_template = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Обновляется вместе с ревизией (bump_revision)
+    updated_at = models.DateTimeField(default=timezone.now)
 
     objects = BoardsManager()
 
@@ -38,6 +68,15 @@ class Boards(models.Model):
 
 
 class Board_Users(models.Model):
+    ROLE_OWNER = 'owner'
+    ROLE_MEMBER = 'member'
+    ROLE_CHOICES = [
+        (ROLE_OWNER, 'Owner'),
+        (ROLE_MEMBER, 'Member'),
+    ]
+    # Роли, которым можно менять стикеры доски
+    EDITOR_ROLES = (ROLE_OWNER, ROLE_MEMBER)
+
     user_id = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -46,9 +85,29 @@ class Board_Users(models.Model):
         Boards,
         on_delete=models.CASCADE
     )
+    role = models.CharField(
+        max_length=10,
+        choices=ROLE_CHOICES,
+        default=ROLE_MEMBER
+    )
+    # Копии полей доски для сортировки списка досок пользователя
+    # (boards.pagination): индекс (user_id, поле, board_id) отдаёт любую
+    # страницу без сортировки всех досок пользователя. Заполняются
+    # триггерами SQLite из миграции 0009 — при вставке участия и при
+    # изменении доски, поэтому в коде их не присваивают.
+    board_title = models.CharField(max_length=100, default='')
+    board_created_at = models.DateTimeField(null=True)
+    board_updated_at = models.DateTimeField(null=True)
 
     class Meta:
         unique_together = [['user_id', 'board_id']]
+        indexes = [
+            models.Index(fields=['user_id', 'board_updated_at', 'board_id'], name='board_users_updated_idx'),
+            models.Index(fields=['user_id', 'board_created_at', 'board_id'], name='board_users_created_idx'),
+            models.Index(fields=['user_id', 'board_title', 'board_id'], name='board_users_title_idx'),
+            # Владелец доски (board_detail): участники доски с ролью по порядку id
+            models.Index(fields=['board_id', 'role'], name='board_users_board_role_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_id.username} - {self.board_id.title}"
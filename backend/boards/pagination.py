@@ -0,0 +1,98 @@
+"""
+Постраничный список досок пользователя: курсоры (keyset) вместо OFFSET.
+
+Страница — первые limit досок после курсора в порядке (поле сортировки, id).
+Сортируются участия Board_Users по копиям полей доски: индекс
+(user_id, поле, board_id) отдаёт страницу поиском по курсору, не сортируя
+все доски пользователя и не пропуская уже показанные строки, поэтому
+любая страница стоит как первая.
+
+Сортировки: created, updated, title; минус перед именем — по убыванию.
+"""
+import base64
+import binascii
+import datetime
+import json
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+
+# Сортировка -> поле Board_Users (копия поля доски)
+BOARD_SORT_FIELDS = {
+    'created': 'board_created_at',
+    'updated': 'board_updated_at',
+    'title': 'board_title',
+}
+DEFAULT_BOARD_SORT = '-updated'
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def parse_sort(value):
+    sort = value or DEFAULT_BOARD_SORT
+    if sort.lstrip('-') not in BOARD_SORT_FIELDS:
+        raise PaginationError(f'sort must be one of: {", ".join(BOARD_SORT_FIELDS)} (optionally prefixed with -)')
+    return sort
+
+
+def parse_limit(value):
+    if value is None:
+        return settings.BOARD_LIST_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if not 1 <= limit <= settings.BOARD_LIST_MAX_PAGE_SIZE:
+        raise PaginationError(f'limit must be between 1 and {settings.BOARD_LIST_MAX_PAGE_SIZE}')
+    return limit
+
+
+def encode_cursor(sort, membership):
+    value = getattr(membership, BOARD_SORT_FIELDS[sort.lstrip('-')])
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, str(membership.board_id_id)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, sort):
+    """Значение поля и id доски из курсора; курсор другой сортировки не подходит"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, board_id = json.loads(payload)
+        board_id = uuid.UUID(board_id)
+        if BOARD_SORT_FIELDS[sort.lstrip('-')].endswith('_at'):
+            value = datetime.datetime.fromisoformat(value)
+    except (binascii.Error, ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if cursor_sort != sort:
+        raise PaginationError('Cursor does not match sort')
+    return value, board_id
+
+
+def paginate_memberships(memberships, sort, cursor=None, limit=None):
+    """
+    Страница участий Board_Users одного пользователя и курсор следующей
+    страницы (None на последней).
+    """
+    limit = limit or settings.BOARD_LIST_PAGE_SIZE
+    field = BOARD_SORT_FIELDS[sort.lstrip('-')]
+    descending = sort.startswith('-')
+
+    if cursor is not None:
+        value, board_id = decode_cursor(cursor, sort)
+        after = 'lt' if descending else 'gt'
+        memberships = memberships.filter(
+            Q(**{f'{field}__{after}': value})
+            | Q(**{field: value, f'board_id__{after}': board_id})
+        )
+
+    prefix = '-' if descending else ''
+    page = list(memberships.order_by(prefix + field, prefix + 'board_id')[:limit + 1])
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(sort, page[-1])
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from auth_app.models import User
+from .access import invalidate_board, invalidate_membership, invalidate_user
+from .broker import broker
+from .models import Boards, Board_Users
+
+
+@receiver(post_save, sender=Board_Users)
+@receiver(post_delete, sender=Board_Users)
+def membership_changed(sender, instance, **kwargs):
+    invalidate_membership(instance.user_id_id, instance.board_id_id)
+
+
+@receiver(post_delete, sender=Board_Users)
+def membership_deleted(sender, instance, **kwargs):
+    # Удалённый участник перестаёт получать события доски
+    broker.disconnect_on_commit(instance.board_id_id, instance.user_id_id)
+
+
+@receiver(post_delete, sender=Boards)
+def board_deleted(sender, instance, **kwargs):
+    invalidate_board(instance.id)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user(instance.id)
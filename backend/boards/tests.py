@@ -1,13 +1,504 @@
+import asyncio
+import json
+import uuid
+from unittest import mock
 
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
+from backend.testing import token_headers
 
-def create_board():
-    board = Boards.objects.create(title = 'Board 1')
-    user = Users.objects.create_secure_user("nia", "123")
-    bU = Board_Users.objects.create(board=board.get(id),user=user.get(id))
-    print("bu: ", bu)
+from .access import AccessCache, access_cache, get_board_role
+from .broker import broker
+from .consumers import board_socket
+from .models import Boards, Board_Users
+from auth_app.models import User
+from auth_app.tokens import issue_token
+from stickers.models import Stickers
 
 
+def create_board(owner, title='Board 1'):
+    """Создать доску с владельцем через кастомный менеджер"""
+    return Boards.objects.create_board(title=title, owner=owner)
 
-# Create your tests here.
+
+class BoardListTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', password='x')
+        self.member = User.objects.create(username='member', password='x')
+        self.client = Client()
+
+    def get_boards(self, user):
+        return self.client.get(reverse('boards_list_create'), **token_headers(user))
+
+    def test_owner_and_shared_flags(self):
+        """Владелец видит ownerId, участник — shared"""
+        board = create_board(self.owner)
+        Board_Users.objects.create(user_id=self.member, board_id=board)
+
+        owner_boards = self.get_boards(self.owner).json()
+        self.assertEqual(owner_boards[0]['ownerId'], str(self.owner.id))
+        self.assertFalse(owner_boards[0]['shared'])
+
+        member_boards = self.get_boards(self.member).json()
+        self.assertIsNone(member_boards[0]['ownerId'])
+        self.assertTrue(member_boards[0]['shared'])
+
+    def test_query_count_does_not_grow_with_boards(self):
+        """Количество запросов не зависит от количества досок"""
+        create_board(self.owner)
+        with CaptureQueriesContext(connection) as small:
+            self.get_boards(self.owner)
+
+        for i in range(20):
+            create_board(self.owner, title=f'Board {i}')
+        with CaptureQueriesContext(connection) as large:
+            response = self.get_boards(self.owner)
+
+        self.assertEqual(len(response.json()), 21)
+        self.assertEqual(len(small), len(large))
+
+    def test_only_owner_can_delete(self):
+        """Удалить доску может только владелец"""
+        board = create_board(self.owner)
+        Board_Users.objects.create(user_id=self.member, board_id=board)
+        url = reverse('board_detail_delete', args=[board.id])
+
+        response = self.client.delete(url, **token_headers(self.member))
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.delete(url, **token_headers(self.owner))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Boards.objects.filter(id=board.id).exists())
+
+
+class BoardListPaginationTestCase(TestCase):
+    """Курсорная пагинация и сортировки списка досок (boards.pagination)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='pages', password='x')
+        self.boards = [create_board(self.user, title=f'Board {i:02d}') for i in range(12)]
+
+    def get_boards(self, **params):
+        return self.client.get(reverse('boards_list_create'), params, **token_headers(self.user))
+
+    def collect(self, **params):
+        ids, pages, cursor = [], 0, None
+        while True:
+            response = self.get_boards(**params, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200)
+            ids += [board['id'] for board in response.json()]
+            pages += 1
+            cursor = response.get('X-Next-Cursor')
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_cover_all_boards_once(self):
+        ids, pages = self.collect(limit=5)
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(ids), sorted(str(board.id) for board in self.boards))
+
+    def test_link_header_points_to_next_page(self):
+        response = self.get_boards(limit=5, sort='title')
+        self.assertIn('cursor=' + response['X-Next-Cursor'], response['Link'])
+        self.assertIn('sort=title', response['Link'])
+        self.assertNotIn('X-Next-Cursor', self.get_boards(limit=50))
+
+    def test_title_sort(self):
+        ids, _ = self.collect(limit=5, sort='-title')
+        titles = [Boards.objects.get(id=board_id).title for board_id in ids]
+        self.assertEqual(titles, sorted(titles, reverse=True))
+
+    def test_ties_are_broken_by_id(self):
+        Boards.objects.update(title='Same')
+        ids, _ = self.collect(limit=5, sort='title')
+        self.assertEqual(ids, sorted(str(board.id) for board in self.boards))
+
+    def test_recently_changed_board_comes_first(self):
+        board = self.boards[3]
+        self.client.post(
+            reverse('board_detail_delete', args=[board.id]), json.dumps({'title': 'Renamed'}),
+            content_type='application/json', **token_headers(self.user)
+        )
+        first = self.get_boards(limit=1).json()[0]
+        self.assertEqual(first['id'], str(board.id))
+        self.assertEqual(first['title'], 'Renamed')
+        self.assertEqual(first['updatedAt'], Boards.objects.get(id=board.id).updated_at.isoformat())
+
+    def test_shared_board_gets_sort_fields(self):
+        other = User.objects.create(username='other', password='x')
+        Board_Users.objects.create(user_id=other, board_id=self.boards[0])
+        membership = Board_Users.objects.get(user_id=other)
+        self.assertEqual(membership.board_title, 'Board 00')
+        self.assertEqual(membership.board_updated_at, self.boards[0].updated_at)
+
+    def test_page_is_an_index_range_scan(self):
+        cursor = self.get_boards(limit=5)['X-Next-Cursor']
+        with CaptureQueriesContext(connection) as queries:
+            self.get_boards(limit=5, cursor=cursor)
+        with connection.cursor() as db:
+            [sql] = [query['sql'] for query in queries if 'boards_board_users' in query['sql']]
+            db.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(row[-1] for row in db.fetchall())
+        self.assertIn('board_users_updated_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get_boards(sort='owner').status_code, 400)
+        self.assertEqual(self.get_boards(limit=0).status_code, 400)
+        self.assertEqual(self.get_boards(limit='many').status_code, 400)
+        self.assertEqual(self.get_boards(cursor='???').status_code, 400)
+        cursor = self.get_boards(limit=5)['X-Next-Cursor']
+        self.assertEqual(self.get_boards(cursor=cursor, sort='title').status_code, 400)
+
+
+class BoardDuplicateTestCase(TestCase):
+    """Копирование доски одним INSERT ... SELECT и шаблоны"""
+
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', password='x')
+        self.other = User.objects.create(username='other', password='x')
+        self.board = create_board(self.owner, title='Source')
+        self.stickers = [
+            Stickers.objects.create(board_id=self.board, content=f'план {i}', x=i, y=i * 2, z_index=i)
+            for i in range(5)
+        ]
+
+    def duplicate(self, user, board=None, **data):
+        board = board or self.board
+        return self.client.post(
+            reverse('board_duplicate', args=[board.id]), json.dumps(data),
+            content_type='application/json', **token_headers(user)
+        )
+
+    def test_copy_has_same_stickers_with_new_ids(self):
+        response = self.duplicate(self.owner)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['board']
+        self.assertEqual(data['title'], 'Source (копия)')
+        self.assertFalse(data['isTemplate'])
+
+        copy = Boards.objects.get(id=data['id'])
+        self.assertEqual(Board_Users.objects.get(board_id=copy).role, Board_Users.ROLE_OWNER)
+        copied = list(Stickers.objects.filter(board_id=copy).order_by('z_index'))
+        self.assertEqual(
+            [(s.content, s.x, s.y, s.z_index) for s in copied],
+            [(s.content, s.x, s.y, s.z_index) for s in self.stickers],
+        )
+        self.assertTrue(all(s.revision == copy.revision for s in copied))
+        self.assertFalse({s.id for s in copied} & {s.id for s in self.stickers})
+        self.assertEqual(len({s.id for s in copied}), len(copied))
+        self.assertTrue(all(s.id.version == 4 for s in copied))
+
+    def test_stickers_are_copied_by_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.duplicate(self.owner)
+        inserts = [q['sql'] for q in queries if q['sql'].lstrip().startswith('INSERT INTO "stickers_stickers"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('SELECT', inserts[0])
+
+    def test_copy_is_searchable(self):
+        board_id = self.duplicate(self.owner).json()['board']['id']
+        results = self.client.get(reverse('search'), {'q': 'план'}, **token_headers(self.owner)).json()
+        boards = [sticker['boardId'] for sticker in results['results']]
+        self.assertEqual(boards.count(board_id), 5)
+
+    def test_missing_or_malformed_board_is_not_found(self):
+        for board_id in ('not-a-uuid', str(uuid.uuid4())):
+            response = self.client.post(
+                reverse('board_duplicate', args=[board_id]), '{}',
+                content_type='application/json', **token_headers(self.owner)
+            )
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {'error': 'Board not found'})
+
+    def test_only_members_can_duplicate(self):
+        self.assertEqual(self.duplicate(self.other).status_code, 403)
+        self.assertEqual(Boards.objects.count(), 1)
+
+    def test_template_list_and_board_from_template(self):
+        template_id = self.duplicate(self.owner, title='Ретро', template=True).json()['board']['id']
+        template = Boards.objects.get(id=template_id)
+        self.assertTrue(template.is_template)
+
+        templates = self.client.get(reverse('templates_list'), **token_headers(self.owner)).json()
+        self.assertEqual([t['id'] for t in templates], [template_id])
+        self.assertTrue(templates[0]['isTemplate'])
+
+        board = self.duplicate(self.owner, board=template, title='Спринт 1').json()['board']
+        self.assertFalse(board['isTemplate'])
+        self.assertEqual(Stickers.objects.filter(board_id=board['id']).count(), 5)
+
+
+class AutosaveTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', password='x')
+        self.board = create_board(self.owner)
+        self.client = Client()
+
+    def autosave(self, stickers):
+        return self.client.post(
+            reverse('board_autosave', args=[self.board.id]),
+            json.dumps({'boardState': {'stickers': stickers}}),
+            content_type='application/json',
+            **token_headers(self.owner)
+        )
+
+    def make_stickers(self, count):
+        return [
+            Stickers.objects.create(content=f's{i}', color='#FFFF99', x=i, y=i,
+                                    width=100, height=100, board_id=self.board)
+            for i in range(count)
+        ]
+
+    def post_empty_state(self, **headers):
+        return self.client.post(
+            reverse('board_autosave', args=[self.board.id]),
+            json.dumps({'boardState': {'stickers': []}}),
+            content_type='application/json',
+            **headers
+        )
+
+    def test_anonymous_cannot_wipe_board(self):
+        self.make_stickers(2)
+        response = self.post_empty_state()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Stickers.objects.filter(board_id=self.board).count(), 2)
+
+    def test_non_member_cannot_wipe_board(self):
+        self.make_stickers(2)
+        stranger = User.objects.create(username='stranger', password='x')
+        response = self.post_empty_state(**token_headers(stranger))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Stickers.objects.filter(board_id=self.board).count(), 2)
+
+    def test_diff_is_applied(self):
+        """Создание, изменение и удаление применяются по разнице"""
+        kept, moved, removed = self.make_stickers(3)
+
+        response = self.autosave([
+            {'id': str(kept.id), 'content': kept.content},
+            {'id': str(moved.id), 'data': {'x': 500, 'y': 600, 'zIndex': 3}},
+            {'content': 'new', 'color': '#00FF00'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            (body['created'], body['updated'], body['deleted'], body['unchanged']),
+            (1, 1, 1, 1)
+        )
+
+        moved.refresh_from_db()
+        self.assertEqual((moved.x, moved.y, moved.z_index), (500, 600, 3))
+        self.assertFalse(Stickers.objects.filter(id=removed.id).exists())
+        self.assertTrue(Stickers.objects.filter(board_id=self.board, content='new').exists())
+
+    def test_invalid_sticker_rolls_back(self):
+        """Ошибка валидации не оставляет частичных изменений"""
+        sticker, = self.make_stickers(1)
+
+        response = self.autosave([
+            {'id': str(sticker.id), 'x': 999},
+            {'content': 'bad', 'color': 'red'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        sticker.refresh_from_db()
+        self.assertEqual(sticker.x, 0)
+
+    def test_sticker_id_from_another_board_is_not_reused(self):
+        other = Stickers.objects.create(content='other', color='#FFFF99', board_id=create_board(self.owner))
+
+        response = self.autosave([{'id': str(other.id), 'content': 'copy', 'color': '#00FF00'}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        copy = Stickers.objects.get(board_id=self.board)
+        self.assertNotEqual(copy.id, other.id)
+        self.assertEqual(copy.content, 'copy')
+        other.refresh_from_db()
+        self.assertEqual(other.content, 'other')
+
+    def test_query_count_stays_bounded(self):
+        """
+        Запросы растут только с числом пакетов bulk-операций
+        (лимит параметров SQLite), а не с числом стикеров
+        """
+        def save_all_moved(stickers, offset):
+            state = [{'id': str(s.id), 'x': s.x + offset} for s in stickers]
+            state += [{'content': 'new'} for _ in stickers]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.autosave(state)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        small = save_all_moved(self.make_stickers(5), 10)
+        Stickers.objects.all().delete()
+        large = save_all_moved(self.make_stickers(200), 10)
+
+        self.assertLessEqual(large - small, 10)
+
+
+class BoardSocketTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', password='x')
+        self.stranger = User.objects.create(username='stranger', password='x')
+        self.board = create_board(self.owner)
+
+    def run_socket(self, user, publish_events=(), query=None, subprotocols=(), revoke=False):
+        """
+        Подключиться к сокету доски, опубликовать события и собрать отправленные сообщения.
+        revoke — затем закрыть подписки пользователя, как при удалении участия.
+        """
+        if query is None:
+            query = '' if subprotocols else f'token={issue_token(user)}'
+
+        async def scenario():
+            inbound = asyncio.Queue()
+            outbound = asyncio.Queue()
+            scope = {
+                'type': 'websocket',
+                'path': f'/ws/boards/{self.board.id}',
+                'query_string': query.encode(),
+                'headers': [],
+                'subprotocols': list(subprotocols),
+            }
+            await inbound.put({'type': 'websocket.connect'})
+            task = asyncio.ensure_future(
+                board_socket(scope, inbound.get, outbound.put, str(self.board.id))
+            )
+
+            sent = [await asyncio.wait_for(outbound.get(), 1)]
+            if sent[0]['type'] == 'websocket.accept':
+                for event in publish_events:
+                    broker.publish(self.board.id, event)
+                    sent.append(await asyncio.wait_for(outbound.get(), 1))
+                if revoke:
+                    broker.disconnect(self.board.id, user.id)
+                    sent.append(await asyncio.wait_for(outbound.get(), 1))
+                await inbound.put({'type': 'websocket.disconnect'})
+            await asyncio.wait_for(task, 1)
+            return sent
+
+        return async_to_sync(scenario)()
+
+    def test_member_receives_events(self):
+        sent = self.run_socket(self.owner, [{'type': 'sticker.deleted', 'id': '1'}])
+
+        self.assertEqual(sent[0]['type'], 'websocket.accept')
+        self.assertEqual(json.loads(sent[1]['text']), {'type': 'sticker.deleted', 'id': '1'})
+        self.assertEqual(broker.subscriber_count(self.board.id), 0)
+
+    def test_removed_member_is_disconnected(self):
+        sent = self.run_socket(self.owner, [{'type': 'stickers.moved'}], revoke=True)
+
+        self.assertEqual(sent[-1], {'type': 'websocket.close', 'code': 4403})
+        self.assertEqual(broker.subscriber_count(self.board.id), 0)
+
+    def test_membership_delete_disconnects_after_commit(self):
+        member = User.objects.create(username='member', password='x')
+        membership = Board_Users.objects.create(user_id=member, board_id=self.board)
+
+        with mock.patch.object(broker, 'disconnect') as disconnect:
+            with self.captureOnCommitCallbacks(execute=True):
+                membership.delete()
+                disconnect.assert_not_called()
+
+        disconnect.assert_called_once_with(self.board.id, member.id)
+
+    def test_non_member_is_rejected(self):
+        sent = self.run_socket(self.stranger)
+
+        self.assertEqual(sent, [{'type': 'websocket.close', 'code': 4403}])
+
+    def test_token_in_subprotocol(self):
+        sent = self.run_socket(self.owner, subprotocols=['bearer', issue_token(self.owner)])
+
+        self.assertEqual(sent, [{'type': 'websocket.accept', 'subprotocol': 'bearer'}])
+
+    def test_user_id_without_token_is_rejected(self):
+        sent = self.run_socket(self.owner, query=f'userId={self.owner.id}')
+        self.assertEqual(sent, [{'type': 'websocket.close', 'code': 4403}])
+
+        with override_settings(AUTH_ALLOW_USER_ID_FALLBACK=True):
+            sent = self.run_socket(self.owner, query=f'userId={self.owner.id}')
+        self.assertEqual(sent[0]['type'], 'websocket.accept')
+
+    def test_invalid_token_is_rejected(self):
+        sent = self.run_socket(self.owner, query='token=forged')
+        self.assertEqual(sent, [{'type': 'websocket.close', 'code': 4401}])
+
+    def test_sticker_writes_publish_after_commit(self):
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+        with mock.patch.object(broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = Client().post(url, json.dumps({'content': 'hi'}), content_type='application/json')
+
+        board_id, event = publish.call_args.args
+        self.assertEqual(board_id, str(self.board.id))
+        self.assertEqual(event['type'], 'sticker.created')
+        self.assertEqual(event['sticker']['id'], response.json()['id'])
+
+
+class BoardAccessCacheTestCase(TestCase):
+    def setUp(self):
+        access_cache.clear()
+        self.owner = User.objects.create(username='owner', password='x')
+        self.guest = User.objects.create(username='guest', password='x')
+        self.board = create_board(self.owner)
+        self.client = Client()
+
+    def get_board(self, user):
+        return self.client.get(
+            reverse('board_detail_delete', args=[self.board.id]),
+            **token_headers(user)
+        )
+
+    def test_repeated_checks_hit_cache(self):
+        with CaptureQueriesContext(connection) as first:
+            self.get_board(self.owner)
+        with CaptureQueriesContext(connection) as second:
+            self.get_board(self.owner)
+
+        self.assertEqual(len(second), len(first) - 1)
+        stats = access_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_share_invalidates_cached_denial(self):
+        self.assertEqual(self.get_board(self.guest).status_code, 403)
+
+        response = self.client.post(
+            reverse('board_share', args=[self.board.id]),
+            json.dumps({'username': 'guest'}),
+            content_type='application/json',
+            **token_headers(self.owner)
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_board(self.guest).status_code, 200)
+
+    def test_board_and_user_delete_invalidate(self):
+        self.assertEqual(get_board_role(self.owner.id, self.board.id), Board_Users.ROLE_OWNER)
+        self.board.delete()
+        self.assertIsNone(get_board_role(self.owner.id, self.board.id))
+
+        board = create_board(self.guest)
+        self.assertEqual(get_board_role(self.guest.id, board.id), Board_Users.ROLE_OWNER)
+        guest_id = self.guest.id
+        self.guest.delete()
+        self.assertIsNone(get_board_role(guest_id, board.id))
+
+    def test_lru_eviction(self):
+        cache = AccessCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 2)
@@ -1,17 +1,38 @@
-from django.http import JsonResponse
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from django.db import IntegrityError
 import json
 import uuid
 
+from backend.db import DatabaseBusy, busy_response, run_atomic
+from backend.responses import JsonResponse
+from .access import get_board_role
 from .models import Boards, Board_Users
+from .pagination import PaginationError, paginate_memberships, parse_limit, parse_sort
 from auth_app.models import User
+from stickers.documents import document_cache
+from stickers.models import BoardSnapshot
+from stickers.services import apply_board_state, duplicate_board
+from stickers.snapshots import list_snapshots, restore_snapshot, snapshot_to_dict, take_snapshot
+from stickers.validation import StickerValidationError
 
 
-def get_user_id_from_request(request):
-    """Получить user_id из заголовка, query параметров или тела запроса"""
-    # Сначала проверяем заголовок
+def get_user_id_from_request(request, read_body=True):
+    """
+    Получить user_id из проверенного токена (auth_app.middleware).
+    Заголовок, query параметры и тело запроса читаются, только если
+    включён AUTH_ALLOW_USER_ID_FALLBACK.
+    read_body=False — не читать тело (потоковая загрузка)
+    """
+    token_user = getattr(request, 'token_user', None)
+    if token_user is not None:
+        return token_user.id
+
+    if not settings.AUTH_ALLOW_USER_ID_FALLBACK:
+        return None
+
+    # Затем проверяем заголовок
     user_id = request.headers.get('X-User-Id')
     if user_id:
         try:
@@ -28,7 +49,7 @@ def get_user_id_from_request(request):
             pass
 
     # Если нет в заголовке и query, проверяем тело запроса (для POST/PUT/PATCH)
-    if request.body:
+    if read_body and request.body:
         try:
             data = json.loads(request.body)
             user_id_str = data.get('userId') or data.get('user_id')
@@ -40,11 +61,84 @@ def get_user_id_from_request(request):
     return None
 
 
+def get_request_user(request, user_id):
+    """
+    Пользователь запроса: из проверенного токена без обращения к БД,
+    иначе загружается по user_id. Бросает User.DoesNotExist.
+    """
+    token_user = getattr(request, 'token_user', None)
+    if token_user is not None and token_user.id == user_id:
+        return token_user.as_user()
+    return User.objects.get(id=user_id)
+
+
+def board_access_error(user_id, board, roles=None, message='Access denied'):
+    """
+    Проверить роль пользователя на доске через кеш доступа (boards.access).
+    Возвращает JsonResponse с ошибкой или None, если доступ есть.
+    roles — допустимые роли; по умолчанию подходит любая.
+    """
+    role = get_board_role(user_id, board.id)
+    if role is not None and (roles is None or role in roles):
+        return None
+    # Пользователя проверяем только при отказе, чтобы вернуть 404 вместо 403
+    if role is None and not User.objects.filter(id=user_id).exists():
+        return JsonResponse({'error': 'User not found'}, status=404)
+    return JsonResponse({'error': message}, status=403)
+
+
+def membership_to_dict(board_user, user):
+    """Доска из списка досок пользователя (участие Board_Users с select_related('board_id'))"""
+    board = board_user.board_id
+    is_owner = board_user.role == Board_Users.ROLE_OWNER
+    return {
+        'id': str(board.id),
+        'title': board.title,
+        'description': board.description,
+        'ownerId': str(user.id) if is_owner else None,
+        'shared': not is_owner,
+        'isTemplate': board.is_template,
+        'createdAt': board.created_at.isoformat(),
+        'updatedAt': board.updated_at.isoformat(),
+    }
+
+
+def paginated_boards_response(request, memberships, user, default_sort=None):
+    """Страница досок (boards.pagination): массив в теле, курсор следующей страницы в заголовках"""
+    try:
+        sort = parse_sort(request.GET.get('sort') or default_sort)
+        page, next_cursor = paginate_memberships(
+            memberships.select_related('board_id'),
+            sort,
+            cursor=request.GET.get('cursor'),
+            limit=parse_limit(request.GET.get('limit')),
+        )
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = JsonResponse([membership_to_dict(board_user, user) for board_user in page], safe=False, status=200)
+    if next_cursor is not None:
+        # Тело остаётся массивом; следующая страница — в заголовках
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        response['X-Next-Cursor'] = next_cursor
+        response['Link'] = f'<{request.path}?{query.urlencode()}>; rel="next"'
+    return response
+
+
+def save_board_fields(board):
+    """Сохранить название и описание доски и увеличить её ревизию"""
+    board.save(update_fields=['title', 'description'])
+    Boards.objects.bump_revision(board.id)
+
+
 @csrf_exempt
 def board_list(request):
     """
     Обрабатывает GET и POST запросы для /boards
-    GET: Получить список всех доступных досок пользователя
+    GET: Получить страницу досок пользователя
+         ?sort=created|updated|title (минус — по убыванию, по умолчанию -updated)
+         ?limit= — размер страницы, ?cursor= — курсор из X-Next-Cursor
     POST: Создать новую доску
     """
     if request.method == 'GET':
@@ -54,30 +148,12 @@ def board_list(request):
                 return JsonResponse({'error': 'User ID required'}, status=400)
 
             try:
-                user = User.objects.get(id=user_id)
+                user = get_request_user(request, user_id)
             except User.DoesNotExist:
                 return JsonResponse({'error': 'User not found'}, status=404)
 
-            # Получаем все доски пользователя через Board_Users
-            board_users = Board_Users.objects.filter(user_id=user)
-            boards = []
-
-            for board_user in board_users:
-                board = board_user.board_id
-                # Определяем, является ли пользователь владельцем (первым в списке)
-                is_owner = Board_Users.objects.filter(
-                    board_id=board
-                ).order_by('id').first().user_id == user
-
-                boards.append({
-                    'id': str(board.id),
-                    'title': board.title,
-                    'description': board.description,
-                    'ownerId': str(user.id) if is_owner else None,
-                    'shared': not is_owner
-                })
-
-            return JsonResponse(boards, safe=False, status=200)
+            # Страница досок пользователя через Board_Users одним запросом
+            return paginated_boards_response(request, Board_Users.objects.filter(user_id=user), user)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
@@ -95,12 +171,12 @@ def board_list(request):
                 return JsonResponse({'error': 'User ID required'}, status=400)
 
             try:
-                user = User.objects.get(id=user_id)
+                user = get_request_user(request, user_id)
             except User.DoesNotExist:
                 return JsonResponse({'error': 'User not found'}, status=404)
 
             # Используем кастомный менеджер для создания доски
-            board = Boards.objects.create_board(title=title, owner=user, description=description)
+            board = run_atomic(Boards.objects.create_board, title=title, owner=user, description=description)
 
             return JsonResponse({
                 'board': {
@@ -114,6 +190,8 @@ def board_list(request):
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except IntegrityError:
             return JsonResponse({'error': 'Board creation failed'}, status=400)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
@@ -138,23 +216,17 @@ def board_detail(request, board_id):
 
             # Проверяем доступ пользователя к доске
             if user_id:
-                try:
-                    user = User.objects.get(id=user_id)
-                    has_access = Board_Users.objects.filter(
-                        user_id=user,
-                        board_id=board
-                    ).exists()
-                    if not has_access:
-                        return JsonResponse({'error': 'Access denied'}, status=403)
-                except User.DoesNotExist:
-                    return JsonResponse({'error': 'User not found'}, status=404)
+                error = board_access_error(user_id, board)
+                if error:
+                    return error
 
-            # Определяем владельца (первый пользователь в Board_Users)
-            first_board_user = Board_Users.objects.filter(
-                board_id=board
-            ).order_by('id').first()
+            # Определяем владельца доски
+            owner_user_id = Board_Users.objects.filter(
+                board_id=board,
+                role=Board_Users.ROLE_OWNER
+            ).values_list('user_id', flat=True).first()
 
-            owner_id = str(first_board_user.user_id.id) if first_board_user else None
+            owner_id = str(owner_user_id) if owner_user_id else None
 
             board_data = {
                 'id': str(board.id),
@@ -176,22 +248,21 @@ def board_detail(request, board_id):
             if not user_id:
                 return JsonResponse({'error': 'User ID required'}, status=400)
 
-            try:
-                user = User.objects.get(id=user_id)
-            except User.DoesNotExist:
-                return JsonResponse({'error': 'User not found'}, status=404)
-
             # Проверяем, является ли пользователь владельцем
-            first_board_user = Board_Users.objects.filter(
-                board_id=board
-            ).order_by('id').first()
-
-            if not first_board_user or first_board_user.user_id != user:
-                return JsonResponse({'error': 'Only owner can delete board'}, status=403)
+            error = board_access_error(
+                user_id, board,
+                roles=[Board_Users.ROLE_OWNER],
+                message='Only owner can delete board'
+            )
+            if error:
+                return error
 
-            board.delete()  # CASCADE удалит все связанные Board_Users
+            run_atomic(board.delete)  # CASCADE удалит все связанные Board_Users
+            document_cache.invalidate_board(board_uuid)
 
             return JsonResponse({'message': 'Board deleted successfully'}, status=200)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
@@ -203,18 +274,10 @@ def board_detail(request, board_id):
             if not user_id:
                 return JsonResponse({'error': 'User ID required'}, status=400)
 
-            try:
-                user = User.objects.get(id=user_id)
-            except User.DoesNotExist:
-                return JsonResponse({'error': 'User not found'}, status=404)
-
             # Проверяем доступ пользователя к доске
-            has_access = Board_Users.objects.filter(
-                user_id=user,
-                board_id=board
-            ).exists()
-            if not has_access:
-                return JsonResponse({'error': 'Access denied'}, status=403)
+            error = board_access_error(user_id, board)
+            if error:
+                return error
 
             # Получаем данные для обновления
             data = json.loads(request.body)
@@ -227,7 +290,8 @@ def board_detail(request, board_id):
             if description is not None:
                 board.description = description
 
-            board.save()
+            run_atomic(save_board_fields, board)
+            document_cache.invalidate_board(board.id)
 
             return JsonResponse({
                 'id': str(board.id),
@@ -237,6 +301,8 @@ def board_detail(request, board_id):
             }, status=200)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
@@ -272,18 +338,10 @@ def share_board(request, board_id):
             if not current_user_id:
                 return JsonResponse({'error': 'User ID required'}, status=400)
 
-            try:
-                current_user = User.objects.get(id=current_user_id)
-            except User.DoesNotExist:
-                return JsonResponse({'error': 'User not found'}, status=404)
-
             # Проверяем доступ текущего пользователя к доске
-            has_access = Board_Users.objects.filter(
-                user_id=current_user,
-                board_id=board
-            ).exists()
-            if not has_access:
-                return JsonResponse({'error': 'Access denied'}, status=403)
+            error = board_access_error(current_user_id, board)
+            if error:
+                return error
 
             # Ищем пользователя для шаринга (по username, так как email нет в модели)
             if username:
@@ -299,13 +357,15 @@ def share_board(request, board_id):
                     return JsonResponse({'error': 'User not found'}, status=404)
 
             # Проверяем, не добавлен ли уже пользователь
-            if Board_Users.objects.filter(user_id=target_user, board_id=board).exists():
+            if get_board_role(target_user.id, board.id) is not None:
                 return JsonResponse({'error': 'User already has access to this board'}, status=409)
 
             # Добавляем пользователя к доске
-            Board_Users.objects.create(
+            run_atomic(
+                Board_Users.objects.create,
                 user_id=target_user,
-                board_id=board
+                board_id=board,
+                role=Board_Users.ROLE_MEMBER
             )
 
             return JsonResponse({'message': 'Board shared successfully'}, status=200)
@@ -313,6 +373,8 @@ def share_board(request, board_id):
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except IntegrityError:
             return JsonResponse({'error': 'Failed to share board'}, status=400)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
@@ -323,8 +385,10 @@ def autosave_board(request, board_id):
     Автоматическое сохранение состояния доски
     POST /boards/{boardId}/autosave
     {
-        "boardState": {...}  # Contains stickers array
+        "boardState": {"stickers": [...]}  # Полное состояние стикеров доски
     }
+    Стикеры без id создаются, с известным id — обновляются,
+    отсутствующие в массиве — удаляются.
     """
     if request.method == 'POST':
         try:
@@ -342,26 +406,194 @@ def autosave_board(request, board_id):
             # Получаем доску
             board = get_object_or_404(Boards, id=board_uuid)
 
-            # Проверяем доступ пользователя
+            # Автосохранение удаляет стикеры, которых нет в состоянии, —
+            # только для участников доски
             user_id = get_user_id_from_request(request)
-            if user_id:
-                try:
-                    user = User.objects.get(id=user_id)
-                    has_access = Board_Users.objects.filter(
-                        user_id=user,
-                        board_id=board
-                    ).exists()
-                    if not has_access:
-                        return JsonResponse({'error': 'Access denied'}, status=403)
-                except User.DoesNotExist:
-                    return JsonResponse({'error': 'User not found'}, status=404)
+            if not user_id:
+                return JsonResponse({'error': 'User ID required'}, status=400)
+            error = board_access_error(user_id, board)
+            if error:
+                return error
 
-            # TODO: Реализовать сохранение состояния доски
-            # Это будет связано с моделями стикеров (stickers app)
-            # Пока просто возвращаем успешный ответ
+            # Состояние доски: массив стикеров либо объект с ключом stickers/elements
+            if isinstance(board_state, dict):
+                stickers = board_state.get('stickers', board_state.get('elements'))
+            else:
+                stickers = board_state
 
-            return JsonResponse({'message': 'Board state saved successfully'}, status=200)
+            try:
+                counts = apply_board_state(board, stickers)
+            except StickerValidationError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+            # Каждое автосохранение фиксирует версию доски (stickers.snapshots)
+            version = take_snapshot(board, reason='autosave')
+            counts['version'] = version.id if version is not None else None
+
+            return JsonResponse({'message': 'Board state saved successfully', **counts}, status=200)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
+
+
+@csrf_exempt
+def board_versions(request, board_id):
+    """
+    Версии доски (stickers.snapshots)
+    GET /boards/{boardId}/versions — список версий от новых к старым
+    POST /boards/{boardId}/versions — записать версию на текущей ревизии
+    """
+    try:
+        board_uuid = uuid.UUID(board_id)
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid board ID format'}, status=400)
+
+    if request.method not in ('GET', 'POST'):
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        board = get_object_or_404(Boards, id=board_uuid)
+        user_id = get_user_id_from_request(request)
+
+        if not user_id:
+            return JsonResponse({'error': 'User ID required'}, status=400)
+
+        error = board_access_error(user_id, board)
+        if error:
+            return error
+
+        if request.method == 'POST':
+            version = take_snapshot(board, reason='manual')
+            return JsonResponse(snapshot_to_dict(list_snapshots(board.id).get(id=version.id)), status=201)
+
+        versions = [snapshot_to_dict(snapshot) for snapshot in list_snapshots(board.id)]
+        return JsonResponse({'boardId': str(board.id), 'versions': versions}, status=200)
+    except DatabaseBusy:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@csrf_exempt
+def restore_board_version(request, board_id, version_id):
+    """
+    Восстановить доску из версии
+    POST /boards/{boardId}/versions/{versionId}/restore
+    Стикеры приводятся к состоянию версии, восстановление само становится новой версией.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        board_uuid = uuid.UUID(board_id)
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid board ID format'}, status=400)
+
+    try:
+        board = get_object_or_404(Boards, id=board_uuid)
+        user_id = get_user_id_from_request(request)
+
+        if not user_id:
+            return JsonResponse({'error': 'User ID required'}, status=400)
+
+        error = board_access_error(user_id, board)
+        if error:
+            return error
+
+        try:
+            snapshot = BoardSnapshot.objects.get(id=version_id, board_id=board)
+        except (BoardSnapshot.DoesNotExist, ValueError):
+            return JsonResponse({'error': 'Version not found'}, status=404)
+
+        counts = restore_snapshot(board, snapshot)
+
+        return JsonResponse({
+            'message': 'Board restored successfully',
+            'restoredFrom': snapshot.id,
+            **counts
+        }, status=200)
+    except DatabaseBusy:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@csrf_exempt
+def board_duplicate(request, board_id):
+    """
+    Обрабатывает POST запрос для /boards/{boardId}/duplicate
+    Создаёт копию доски со всеми стикерами; автор запроса — владелец копии.
+    Тело (необязательно): {"title": ..., "description": ..., "template": true}
+    template — сохранить копию как шаблон
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body) if request.body else {}
+        user_id = get_user_id_from_request(request)
+        if not user_id:
+            return JsonResponse({'error': 'User ID required'}, status=400)
+
+        # Некорректный id — такой доски нет
+        try:
+            source = Boards.objects.get(id=uuid.UUID(board_id))
+        except (ValueError, Boards.DoesNotExist):
+            return JsonResponse({'error': 'Board not found'}, status=404)
+        error = board_access_error(user_id, source)
+        if error is not None:
+            return error
+
+        try:
+            user = get_request_user(request, user_id)
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'User not found'}, status=404)
+
+        title = data.get('title') or f'{source.title} (копия)'[:Boards._meta.get_field('title').max_length]
+        description = data.get('description', source.description)
+        board = duplicate_board(source, user, title, description, is_template=bool(data.get('template')))
+
+        return JsonResponse({
+            'board': {
+                'id': str(board.id),
+                'title': board.title,
+                'description': board.description,
+                'isTemplate': board.is_template,
+                'sourceId': str(source.id),
+            },
+            'message': 'Board duplicated successfully'
+        }, status=201)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except DatabaseBusy:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def template_list(request):
+    """
+    Обрабатывает GET запрос для /templates
+    Шаблоны, доступные пользователю, по названию; пагинация как у списка досок.
+    Доска из шаблона создаётся через POST /boards/{templateId}/duplicate
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        user_id = get_user_id_from_request(request)
+        if not user_id:
+            return JsonResponse({'error': 'User ID required'}, status=400)
+
+        try:
+            user = get_request_user(request, user_id)
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'User not found'}, status=404)
+
+        memberships = Board_Users.objects.filter(user_id=user, board_id__is_template=True)
+        return paginated_boards_response(request, memberships, user, default_sort='title')
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
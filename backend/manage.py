@@ -3,8 +3,6 @@
 import os
 import sys
 
-from boards.tests import create_board
-
 
 def main():
     """Run administrative tasks."""
@@ -0,0 +1,99 @@
+"""
+Кеш готовых ответов GET /boards/{boardId}/stickers.
+
+Полный список стикеров доски (без ?since= и вьюпорта) кодируется в JSON
+один раз на ревизию и формат; следующие запросы получают готовые байты
+без запроса стикеров и построения словарей. Ключ — (доска, ревизия,
+формат), поэтому запись в доску делает старую запись недостижимой, а
+явная инвалидация после коммита (stickers.services, boards.views)
+освобождает память сразу.
+
+Кеш живёт в памяти процесса, ограничен суммарным размером ответов
+BOARD_DOCUMENT_CACHE_BYTES и вытесняет давно не читанные доски (LRU).
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+
+class DocumentCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, board_id, revision, fmt):
+        key = (str(board_id), revision, fmt)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, board_id, revision, fmt, body):
+        # Документ больше всего кеша не сохраняем, чтобы не вытеснить всё остальное
+        if len(body) > self.max_bytes:
+            return
+        board_id = str(board_id)
+        key = (board_id, revision, fmt)
+        with self._lock:
+            board_keys = [k for k in self._entries if k[0] == board_id]
+            # Медленный запрос принёс документ старой ревизии — более новый уже в кеше
+            if any(k[1] > revision for k in board_keys):
+                return
+            # Документы прошлых ревизий этой доски больше не понадобятся
+            for stale in [k for k in board_keys if k[1] < revision]:
+                self.size -= len(self._entries.pop(stale))
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def invalidate_board(self, board_id):
+        board_id = str(board_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == board_id]:
+                self.size -= len(self._entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': self.hits / requests if requests else 0.0,
+            }
+
+
+document_cache = DocumentCache(
+    max_bytes=getattr(settings, 'BOARD_DOCUMENT_CACHE_BYTES', 64 * 1024 * 1024),
+)
+
+
+def invalidate_board_document(board_id):
+    """Сбросить готовые ответы доски после коммита текущей транзакции"""
+    transaction.on_commit(lambda: document_cache.invalidate_board(board_id))
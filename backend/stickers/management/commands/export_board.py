@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.models import Boards
+from stickers.transfer import export_board
+
+
+class Command(BaseCommand):
+    help = 'Выгрузить доску, участников и стикеры в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_id', help='id доски')
+        parser.add_argument('-o', '--output', help='Файл выгрузки (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            board = Boards.objects.get(id=options['board_id'])
+        except (Boards.DoesNotExist, ValueError):
+            raise CommandError(f'Board {options["board_id"]} not found')
+
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in export_board(board):
+                    output.write(chunk)
+            self.stderr.write(f'Exported board {board.id} to {options["output"]}')
+        else:
+            output = getattr(self.stdout, 'buffer', None) or sys.stdout.buffer
+            for chunk in export_board(board):
+                output.write(chunk)
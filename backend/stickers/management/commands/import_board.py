@@ -0,0 +1,51 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from auth_app.models import User
+from stickers.transfer import BoardImportError, import_board
+
+
+class Command(BaseCommand):
+    help = 'Создать доску из NDJSON-выгрузки (export_board)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл выгрузки или - для stdin')
+        parser.add_argument('--owner', help='username владельца (по умолчанию владелец из выгрузки)')
+        parser.add_argument('--keep-ids', action='store_true', help='Сохранить id доски и стикеров')
+        parser.add_argument('--no-members', action='store_true', help='Не восстанавливать участников')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.BOARD_IMPORT_BATCH_SIZE,
+            help='Стикеров в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            try:
+                owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f'User {options["owner"]} not found')
+
+        source = sys.stdin.buffer if options['input'] == '-' else open(options['input'], 'rb')
+        try:
+            board, report = import_board(
+                source,
+                owner=owner,
+                keep_ids=options['keep_ids'],
+                members=not options['no_members'],
+                batch_size=options['batch_size'],
+            )
+        except BoardImportError as e:
+            raise CommandError(str(e))
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+
+        self.stdout.write(
+            f'Imported board {board.id}: {report["stickers"]} stickers, {report["members"]} members '
+            f'in {report["seconds"]}s ({report["rowsPerSecond"]} rows/s)'
+        )
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stickers.services import prune_tombstones
+from stickers.snapshots import prune_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Удалить надгробия удалённых стикеров и версии досок старше окна хранения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.STICKER_TOMBSTONE_RETENTION_DAYS,
+            help='Окно хранения надгробий в днях',
+        )
+        parser.add_argument(
+            '--snapshot-days',
+            type=int,
+            default=settings.BOARD_SNAPSHOT_RETENTION_DAYS,
+            help='Окно хранения версий досок в днях',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['days'])
+        deleted = prune_tombstones(older_than)
+        self.stdout.write(f'Pruned {deleted} sticker tombstones')
+
+        older_than = timezone.now() - timedelta(days=options['snapshot_days'])
+        deleted = prune_snapshots(older_than)
+        self.stdout.write(f'Pruned {deleted} board snapshots')
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+TILE_SIZE = 256
+MAX_LEVEL = 12
+
+
+def backfill_spatial_bucket(apps, schema_editor):
+    """Заполнить ячейки индекса для существующих стикеров (см. stickers.spatial)"""
+    Stickers = apps.get_model('stickers', 'Stickers')
+    batch = []
+    for sticker in Stickers.objects.only('id', 'x', 'y', 'width', 'height').iterator(chunk_size=2000):
+        size = max(sticker.width, sticker.height, 1)
+        level = min(((size - 1) // TILE_SIZE).bit_length(), MAX_LEVEL)
+        tile = TILE_SIZE << level
+        sticker.spatial_level = level
+        sticker.tile_x = sticker.x // tile
+        sticker.tile_y = sticker.y // tile
+        batch.append(sticker)
+        if len(batch) >= 2000:
+            Stickers.objects.bulk_update(batch, ['spatial_level', 'tile_x', 'tile_y'])
+            batch = []
+    if batch:
+        Stickers.objects.bulk_update(batch, ['spatial_level', 'tile_x', 'tile_y'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0006_board_users_role'),
+        ('stickers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stickers',
+            name='spatial_level',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stickers',
+            name='tile_x',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stickers',
+            name='tile_y',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_spatial_bucket, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='stickers',
+            index=models.Index(fields=['board_id', 'spatial_level', 'tile_x', 'tile_y'], name='stickers_spatial_idx'),
+        ),
+    ]
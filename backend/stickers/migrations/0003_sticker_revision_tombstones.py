@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_boards_pruned_revision'),
+        ('stickers', '0002_stickers_spatial_bucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StickerTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sticker_id', models.UUIDField()),
+                ('revision', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='stickers',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='stickers',
+            index=models.Index(fields=['board_id', 'revision'], name='stickers_board_revision_idx'),
+        ),
+        migrations.AddField(
+            model_name='stickertombstone',
+            name='board_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='boards.boards'),
+        ),
+        migrations.AddIndex(
+            model_name='stickertombstone',
+            index=models.Index(fields=['board_id', 'revision'], name='tombstones_board_revision_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stickertombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstones_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_boards_pruned_revision'),
+        ('stickers', '0003_sticker_revision_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveBigIntegerField()),
+                ('kind', models.CharField(choices=[('full', 'Full'), ('delta', 'Delta')], max_length=5)),
+                ('chain', models.PositiveIntegerField(default=0)),
+                ('reason', models.CharField(max_length=20)),
+                ('sticker_count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('board_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='boards.boards')),
+            ],
+            options={
+                'unique_together': {('board_id', 'revision')},
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+
+
+# Полнотекстовый индекс по тексту стикеров (stickers.search).
+# stickers_search — таблица FTS5 с текстом и доской стикера. Доска
+# индексируется как слово, чтобы отбор по доскам пользователя выполнял
+# сам индекс, а не проверка каждого совпадения. rowid индекса берётся
+# из stickers_search_ids, потому что у стикеров UUID-ключ, а неявный
+# rowid stickers_stickers может поменяться при VACUUM.
+# Триггеры держат индекс в актуальном состоянии при любой записи стикеров,
+# включая bulk_create и отложенную геометрию; изменение одних координат
+# индекс не трогает. SQLite удаляет триггеры при пересоздании таблицы
+# стикеров (AlterField и т.п.) — такие миграции должны создавать их заново.
+CREATE_SEARCH = [
+    """
+    CREATE TABLE stickers_search_ids (
+        id INTEGER PRIMARY KEY,
+        sticker_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE stickers_search USING fts5(
+        content,
+        board_id,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO stickers_search_ids (sticker_id) SELECT id FROM stickers_stickers
+    """,
+    """
+    INSERT INTO stickers_search (rowid, content, board_id)
+    SELECT i.id, s.content, s.board_id_id
+    FROM stickers_stickers AS s JOIN stickers_search_ids AS i ON i.sticker_id = s.id
+    """,
+    """
+    CREATE TRIGGER stickers_search_insert AFTER INSERT ON stickers_stickers
+    BEGIN
+        INSERT INTO stickers_search_ids (sticker_id) VALUES (NEW.id);
+        INSERT INTO stickers_search (rowid, content, board_id)
+        VALUES ((SELECT id FROM stickers_search_ids WHERE sticker_id = NEW.id), NEW.content, NEW.board_id_id);
+    END
+    """,
+    """
+    CREATE TRIGGER stickers_search_update AFTER UPDATE OF content, board_id_id ON stickers_stickers
+    WHEN OLD.content IS NOT NEW.content OR OLD.board_id_id IS NOT NEW.board_id_id
+    BEGIN
+        UPDATE stickers_search SET content = NEW.content, board_id = NEW.board_id_id
+        WHERE rowid = (SELECT id FROM stickers_search_ids WHERE sticker_id = OLD.id);
+    END
+    """,
+    """
+    CREATE TRIGGER stickers_search_delete AFTER DELETE ON stickers_stickers
+    BEGIN
+        DELETE FROM stickers_search
+        WHERE rowid = (SELECT id FROM stickers_search_ids WHERE sticker_id = OLD.id);
+        DELETE FROM stickers_search_ids WHERE sticker_id = OLD.id;
+    END
+    """,
+]
+
+DROP_SEARCH = [
+    'DROP TRIGGER IF EXISTS stickers_search_delete',
+    'DROP TRIGGER IF EXISTS stickers_search_update',
+    'DROP TRIGGER IF EXISTS stickers_search_insert',
+    'DROP TABLE IF EXISTS stickers_search',
+    'DROP TABLE IF EXISTS stickers_search_ids',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stickers', '0004_board_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEARCH, DROP_SEARCH),
+    ]
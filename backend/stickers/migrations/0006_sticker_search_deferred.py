@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+# Отложенная индексация для массовой вставки (stickers.search.deferred_indexing):
+# пока доска записана в stickers_search_deferred, триггер вставки не индексирует
+# её стикеры по одному — доска индексируется одним INSERT ... SELECT в конце.
+CREATE_DEFERRED = [
+    """
+    CREATE TABLE stickers_search_deferred (
+        board_id char(32) NOT NULL PRIMARY KEY
+    )
+    """,
+    'DROP TRIGGER stickers_search_insert',
+    """
+    CREATE TRIGGER stickers_search_insert AFTER INSERT ON stickers_stickers
+    WHEN NEW.board_id_id NOT IN (SELECT board_id FROM stickers_search_deferred)
+    BEGIN
+        INSERT INTO stickers_search_ids (sticker_id) VALUES (NEW.id);
+        INSERT INTO stickers_search (rowid, content, board_id)
+        VALUES ((SELECT id FROM stickers_search_ids WHERE sticker_id = NEW.id), NEW.content, NEW.board_id_id);
+    END
+    """,
+]
+
+DROP_DEFERRED = [
+    'DROP TRIGGER stickers_search_insert',
+    """
+    CREATE TRIGGER stickers_search_insert AFTER INSERT ON stickers_stickers
+    BEGIN
+        INSERT INTO stickers_search_ids (sticker_id) VALUES (NEW.id);
+        INSERT INTO stickers_search (rowid, content, board_id)
+        VALUES ((SELECT id FROM stickers_search_ids WHERE sticker_id = NEW.id), NEW.content, NEW.board_id_id);
+    END
+    """,
+    'DROP TABLE stickers_search_deferred',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stickers', '0005_sticker_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_DEFERRED, DROP_DEFERRED),
+    ]
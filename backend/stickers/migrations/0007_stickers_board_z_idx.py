@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0010_boards_is_template'),
+        ('stickers', '0006_sticker_search_deferred'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stickers',
+            index=models.Index(fields=['board_id', 'z_index'], name='stickers_board_z_idx'),
+        ),
+    ]
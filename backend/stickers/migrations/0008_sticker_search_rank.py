@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+# Ранжирование поиска (stickers.search): rank индекса — bm25 только по тексту
+# (вес колонки board_id 0). С настроенным rank запрос сортирует ORDER BY rank,
+# и сортировку выполняет сам FTS5, а не временное B-дерево SQLite.
+SET_RANK = "INSERT INTO stickers_search (stickers_search, rank) VALUES ('rank', 'bm25(1.0, 0.0)')"
+RESET_RANK = "INSERT INTO stickers_search (stickers_search, rank) VALUES ('rank', 'bm25()')"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stickers', '0007_stickers_board_z_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SET_RANK, RESET_RANK),
+    ]
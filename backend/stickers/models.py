@@ -2,6 +2,7 @@ import uuid
 
 from django.db import models
 from boards.models import Boards
+from .spatial import bucket_for
 
 class Stickers(models.Model):
     id = models.UUIDField(
@@ -16,7 +17,97 @@ class Stickers(models.Model):
     height = models.IntegerField(default=0)
     z_index = models.IntegerField(default=0)
 
+    # Ячейка пространственного индекса, см. stickers.spatial
+    spatial_level = models.SmallIntegerField(default=0)
+    tile_x = models.IntegerField(default=0)
+    tile_y = models.IntegerField(default=0)
+
+    # Ревизия доски, на которой стикер последний раз создан или изменён
+    revision = models.PositiveBigIntegerField(default=0)
+
     board_id = models.ForeignKey(
         Boards,
         on_delete=models.CASCADE  # Обязательный параметр
     )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['board_id', 'spatial_level', 'tile_x', 'tile_y'],
+                name='stickers_spatial_idx'
+            ),
+            models.Index(
+                fields=['board_id', 'revision'],
+                name='stickers_board_revision_idx'
+            ),
+            # Крайние стикеры и соседи по оси z, см. stickers.ordering
+            models.Index(
+                fields=['board_id', 'z_index'],
+                name='stickers_board_z_idx'
+            ),
+        ]
+
+    def update_spatial_bucket(self):
+        """Пересчитать ячейку индекса по x, y, width, height"""
+        self.spatial_level, self.tile_x, self.tile_y = bucket_for(
+            self.x, self.y, self.width, self.height
+        )
+
+    def save(self, *args, **kwargs):
+        self.update_spatial_bucket()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'spatial_level', 'tile_x', 'tile_y'}
+        super().save(*args, **kwargs)
+
+
+class StickerTombstone(models.Model):
+    """Запись об удалённом стикере для дельта-синхронизации (?since=)"""
+    board_id = models.ForeignKey(
+        Boards,
+        on_delete=models.CASCADE
+    )
+    sticker_id = models.UUIDField()
+    revision = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['board_id', 'revision'],
+                name='tombstones_board_revision_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='tombstones_deleted_at_idx'
+            ),
+        ]
+
+
+class BoardSnapshot(models.Model):
+    """
+    Версия доски: сжатое состояние стикеров на ревизии revision (см. stickers.snapshots).
+    full — все стикеры доски, delta — изменения относительно предыдущей версии.
+    """
+    KIND_FULL = 'full'
+    KIND_DELTA = 'delta'
+    KIND_CHOICES = [
+        (KIND_FULL, 'Full'),
+        (KIND_DELTA, 'Delta'),
+    ]
+
+    board_id = models.ForeignKey(
+        Boards,
+        on_delete=models.CASCADE
+    )
+    revision = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    # Сколько дельт отделяет версию от ближайшей полной (0 для full)
+    chain = models.PositiveIntegerField(default=0)
+    reason = models.CharField(max_length=20)
+    sticker_count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('board_id', 'revision')
@@ -0,0 +1,159 @@
+"""
+Порядок стикеров по оси z: z_index с промежутками.
+
+Порядок доски — z_index по индексу stickers_board_z_idx (board_id, z_index).
+Операции двигают один стикер и переписывают только его строку:
+    front / back — крайний z_index доски (один шаг по индексу) плюс/минус Z_INDEX_GAP;
+    above / below — середина промежутка между стикером target и его соседом.
+Когда промежуток кончился (соседи с z_index подряд, одинаковые z_index или
+выход за 32-битный z-index CSS), доска перенумеровывается одним UPDATE
+с шагом Z_INDEX_GAP, и операция повторяется. После перенумерации до следующей
+нужно около log2(Z_INDEX_GAP) вставок в одно и то же место.
+"""
+from django.db import connection
+
+from backend.db import atomic_retry
+from boards.broker import broker
+from boards.models import Boards
+from .models import Stickers
+from .services import board_changed, parse_sticker_id, publish_sticker_event
+from .validation import StickerValidationError
+from .writebehind import geometry_buffer
+
+Z_INDEX_GAP = 1024
+# Пределы z-index в CSS
+Z_INDEX_MIN = -2 ** 31
+Z_INDEX_MAX = 2 ** 31 - 1
+
+ORDER_POSITIONS = ('front', 'back', 'above', 'below')
+
+
+def renumber_sql():
+    """
+    Новые z_index всех стикеров доски: GAP, 2 * GAP, ... в прежнем порядке.
+    Равные z_index упорядочиваются по rowid — в порядке индекса, без сортировки.
+    Параметры: шаг, ревизия, доска.
+    """
+    quote = connection.ops.quote_name
+    opts = Stickers._meta
+    table = quote(opts.db_table)
+    pk = quote(opts.pk.column)
+    z_index = quote(opts.get_field('z_index').column)
+    return (
+        f'UPDATE {table} '
+        f'SET {z_index} = ordered.position * %s, {quote(opts.get_field("revision").column)} = %s '
+        f'FROM ('
+        f'SELECT {pk}, row_number() OVER (ORDER BY {z_index}, rowid) AS position '
+        f'FROM {table} WHERE {quote(opts.get_field("board_id").column)} = %s'
+        f') AS ordered '
+        f'WHERE {table}.{pk} = ordered.{pk}'
+    )
+
+
+def parse_order(data):
+    """Тело запроса {"position": ..., "target": id} -> (position, target_id или None)"""
+    position = data.get('position')
+    if position not in ORDER_POSITIONS:
+        raise StickerValidationError('position must be one of front, back, above, below')
+    if position in ('front', 'back'):
+        return position, None
+    if data.get('target') is None:
+        raise StickerValidationError(f'target is required for position {position}')
+    return position, parse_sticker_id(data.get('target'))
+
+
+def move_sticker(sticker, position, target_id=None):
+    """
+    Переместить стикер по оси z (см. ORDER_POSITIONS).
+    Возвращает стикер с новым z_index; если он уже на месте, ничего не пишет.
+    Бросает Stickers.DoesNotExist, если target не найден на доске стикера.
+    """
+    return _write_move(sticker.id, position, target_id)
+
+
+@atomic_retry
+def _write_move(sticker_id, position, target_id):
+    sticker = Stickers.objects.get(id=sticker_id)
+    board_id = sticker.board_id_id
+    target = None
+    if target_id is not None:
+        if target_id == sticker.id:
+            raise StickerValidationError('Sticker cannot be placed relative to itself')
+        target = Stickers.objects.get(board_id=board_id, id=target_id)
+
+    z_index = new_z_index(sticker, position, target)
+    if z_index == sticker.z_index:
+        _apply_pending_geometry(sticker)
+        return sticker
+
+    revision = Boards.objects.bump_revision(board_id)
+    if z_index is None:
+        renumber_board(board_id, revision)
+        sticker.refresh_from_db(fields=['z_index'])
+        if target is not None:
+            target.refresh_from_db(fields=['z_index'])
+        z_index = new_z_index(sticker, position, target)
+        broker.publish_on_commit(str(board_id), {
+            'type': 'stickers.renumbered', 'boardId': str(board_id), 'revision': revision,
+        })
+
+    Stickers.objects.filter(id=sticker.id).update(z_index=z_index, revision=revision)
+    sticker.z_index = z_index
+    sticker.revision = revision
+    _apply_pending_geometry(sticker)
+    publish_sticker_event('sticker.updated', sticker, revision)
+    board_changed(board_id, revision)
+    return sticker
+
+
+def new_z_index(sticker, position, target=None):
+    """
+    z_index стикера после перемещения: текущий, если стикер уже на месте,
+    None, если свободного значения нет и доску нужно перенумеровать
+    """
+    others = Stickers.objects.filter(board_id=sticker.board_id_id).exclude(id=sticker.id)
+    if position == 'front':
+        top = others.order_by('-z_index').values_list('z_index', flat=True).first()
+        if top is None or sticker.z_index > top:
+            return sticker.z_index
+        return top + Z_INDEX_GAP if top + Z_INDEX_GAP <= Z_INDEX_MAX else None
+    if position == 'back':
+        bottom = others.order_by('z_index').values_list('z_index', flat=True).first()
+        if bottom is None or sticker.z_index < bottom:
+            return sticker.z_index
+        return bottom - Z_INDEX_GAP if bottom - Z_INDEX_GAP >= Z_INDEX_MIN else None
+
+    # Стикеры с тем же z_index, что у target, делают «над» и «под» неоднозначными
+    if others.filter(z_index=target.z_index).exclude(id=target.id).exists():
+        return None
+    if position == 'above':
+        low = target.z_index
+        high = others.filter(z_index__gt=low).order_by('z_index').values_list('z_index', flat=True).first()
+        if high is None:
+            high = min(low + 2 * Z_INDEX_GAP, Z_INDEX_MAX + 1)
+    else:
+        high = target.z_index
+        low = others.filter(z_index__lt=high).order_by('-z_index').values_list('z_index', flat=True).first()
+        if low is None:
+            low = max(high - 2 * Z_INDEX_GAP, Z_INDEX_MIN - 1)
+
+    if low < sticker.z_index < high:
+        return sticker.z_index
+    if high - low < 2:
+        return None
+    return (low + high) // 2
+
+
+def renumber_board(board_id, revision):
+    """Переписать z_index всех стикеров доски с шагом Z_INDEX_GAP одним запросом"""
+    with connection.cursor() as cursor:
+        cursor.execute(renumber_sql(), [
+            Z_INDEX_GAP, revision, Stickers._meta.get_field('board_id').get_db_prep_save(board_id, connection),
+        ])
+        return cursor.rowcount
+
+
+def _apply_pending_geometry(sticker):
+    pending = geometry_buffer.get(sticker.id)
+    if pending is not None:
+        pending.apply_to(sticker)
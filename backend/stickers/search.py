@@ -0,0 +1,144 @@
+"""
+Полнотекстовый поиск по тексту стикеров (FTS5).
+
+Индекс stickers_search и триггеры, которые его обновляют, создаёт миграция
+0005_sticker_search. Поиск идёт только по доскам, где пользователь состоит
+в Board_Users: совпадения FTS5 отбираются условием IN по доске стикера.
+Доски не подставляются в сам запрос MATCH, поэтому его длина не растёт
+с числом досок пользователя. Результаты упорядочены по bm25 текста.
+
+Текст запроса не передаётся в FTS5 как есть: из него берутся слова, и
+каждое ищется как префикс ("сти" найдёт "стикер"), все слова обязательны.
+
+Ранжирующая функция индекса (rank) настроена миграцией 0008 на bm25 по
+одному тексту, поэтому ORDER BY rank сортирует сам FTS5, без временного
+B-дерева поверх найденного.
+"""
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from boards.models import Boards, Board_Users
+from .models import Stickers
+from .writebehind import geometry_buffer
+
+MAX_QUERY_TERMS = 10
+
+# Таблицы индекса из миграций 0005 и 0006 (моделей у них нет)
+SEARCH_TABLE = 'stickers_search'
+SEARCH_IDS_TABLE = 'stickers_search_ids'
+SEARCH_DEFERRED_TABLE = 'stickers_search_deferred'
+
+
+def search_sql():
+    """
+    Поиск по тексту с отбором по доскам пользователя.
+    Параметры: запрос MATCH, id пользователя, лимит.
+    """
+    quote = connection.ops.quote_name
+    stickers, boards, members = Stickers._meta, Boards._meta, Board_Users._meta
+    search = quote(SEARCH_TABLE)
+    sticker_board = quote(stickers.get_field('board_id').column)
+    return (
+        f'SELECT s.*, b.{quote(boards.get_field("title").column)} AS board_title, {search}.rank AS score '
+        f'FROM {search} '
+        f'JOIN {quote(SEARCH_IDS_TABLE)} AS i ON i.id = {search}.rowid '
+        f'JOIN {quote(stickers.db_table)} AS s ON s.{quote(stickers.pk.column)} = i.sticker_id '
+        f'JOIN {quote(boards.db_table)} AS b ON b.{quote(boards.pk.column)} = s.{sticker_board} '
+        f'WHERE {search} MATCH %s AND s.{sticker_board} IN ('
+        f'SELECT {quote(members.get_field("board_id").column)} FROM {quote(members.db_table)} '
+        f'WHERE {quote(members.get_field("user_id").column)} = %s'
+        f') '
+        f'ORDER BY {search}.rank '
+        f'LIMIT %s'
+    )
+
+
+def index_board_sql():
+    """
+    Индексация отложенной доски целиком (см. deferred_indexing).
+    Параметр каждого запроса — id доски.
+    """
+    quote = connection.ops.quote_name
+    stickers = Stickers._meta
+    search, ids = quote(SEARCH_TABLE), quote(SEARCH_IDS_TABLE)
+    table, pk = quote(stickers.db_table), quote(stickers.pk.column)
+    board = quote(stickers.get_field('board_id').column)
+    content = quote(stickers.get_field('content').column)
+    return [
+        f'INSERT OR IGNORE INTO {ids} (sticker_id) SELECT {pk} FROM {table} WHERE {board} = %s',
+        f'INSERT INTO {search} (rowid, content, board_id) '
+        f'SELECT i.id, s.{content}, s.{board} '
+        f'FROM {table} AS s JOIN {ids} AS i ON i.sticker_id = s.{pk} '
+        f'WHERE s.{board} = %s '
+        f'AND NOT EXISTS (SELECT 1 FROM {search} WHERE {search}.rowid = i.id)',
+        f'DELETE FROM {quote(SEARCH_DEFERRED_TABLE)} WHERE board_id = %s',
+    ]
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+def match_query(text):
+    """Запрос FTS5 из пользовательского текста: слова в кавычках с префиксным поиском"""
+    terms = re.findall(r'\w+', text or '')[:MAX_QUERY_TERMS]
+    if not terms:
+        raise SearchQueryError('Query is required')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def parse_limit(value):
+    if value is None:
+        return settings.STICKER_SEARCH_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise SearchQueryError('limit must be an integer')
+    if not 1 <= limit <= settings.STICKER_SEARCH_MAX_LIMIT:
+        raise SearchQueryError(f'limit must be between 1 and {settings.STICKER_SEARCH_MAX_LIMIT}')
+    return limit
+
+
+def search_stickers(user_id, text, limit=None):
+    """
+    Стикеры с досок пользователя, подходящие под text, от лучших к худшим.
+    У каждого стикера есть board_title и score (bm25, меньше — лучше);
+    отложенная геометрия (stickers.writebehind) накладывается поверх.
+    """
+    limit = limit or settings.STICKER_SEARCH_LIMIT
+    match = f'content : ({match_query(text)})'
+    stickers = list(Stickers.objects.raw(search_sql(), [match, user_id.hex, limit]))
+    for sticker in stickers:
+        pending = geometry_buffer.get(sticker.id)
+        if pending is not None:
+            pending.apply_to(sticker)
+    return stickers
+
+
+@contextmanager
+def deferred_indexing(board_id):
+    """
+    Массовая вставка стикеров доски без построчной индексации: внутри блока
+    триггер не индексирует новые стикеры доски, после блока они индексируются
+    одним INSERT ... SELECT. Для новой доски, в которую больше никто не пишет
+    (импорт); при ошибке доска просто снимается с отложенной индексации.
+    """
+    board_id = board_id.hex
+    statements = index_board_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR IGNORE INTO {connection.ops.quote_name(SEARCH_DEFERRED_TABLE)} (board_id) VALUES (%s)',
+            [board_id],
+        )
+    try:
+        yield
+    except BaseException:
+        with connection.cursor() as cursor:
+            cursor.execute(statements[-1], [board_id])
+        raise
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql, [board_id])
@@ -0,0 +1,447 @@
+import uuid
+
+from django.db import connection
+from django.db.models import Max
+
+from backend.db import atomic_retry, run_atomic
+from boards.broker import broker
+from boards.models import Boards
+from .models import Stickers, StickerTombstone
+from .documents import invalidate_board_document
+from .search import deferred_indexing
+from .snapshots import snapshot_after_commit
+from .validation import StickerValidationError, clean_new_sticker, clean_sticker_patch
+from .writebehind import GEOMETRY_FIELDS, geometry_buffer
+
+# Колонки, которые пишет bulk_update (включая ячейку пространственного индекса)
+BULK_UPDATE_FIELDS = (
+    'content', 'color', 'x', 'y', 'width', 'height', 'z_index',
+    'spatial_level', 'tile_x', 'tile_y', 'revision',
+)
+BULK_BATCH_SIZE = 500
+
+# Колонки, которые копия стикера берёт из исходного (copy_board_stickers)
+COPY_FIELDS = (
+    'content', 'color', 'x', 'y', 'width', 'height', 'z_index',
+    'spatial_level', 'tile_x', 'tile_y',
+)
+
+# UUID версии 4 в формате UUIDField для SQLite (32 hex-символа без дефисов);
+# для запросов с параметрами, поэтому остаток от деления записан как %%
+SQLITE_UUID4 = (
+    "lower(hex(randomblob(6))) || '4' || substr(lower(hex(randomblob(2))), 2)"
+    " || substr('89ab', 1 + (abs(random()) %% 4), 1) || substr(lower(hex(randomblob(8))), 2)"
+)
+
+
+def sticker_to_dict(sticker):
+    """Стикер в формате ответов POST/PATCH"""
+    return {
+        'id': str(sticker.id),
+        'content': sticker.content,
+        'color': sticker.color,
+        'x': sticker.x,
+        'y': sticker.y,
+        'width': sticker.width,
+        'height': sticker.height,
+        'z_index': sticker.z_index
+    }
+
+
+def publish_sticker_event(event_type, sticker, revision):
+    """
+    Разослать подписчикам доски событие по одному стикеру после коммита.
+    event_type: sticker.created, sticker.updated или sticker.deleted
+    """
+    board_id = str(sticker.board_id_id)
+    event = {'type': event_type, 'boardId': board_id, 'revision': revision}
+    if event_type == 'sticker.deleted':
+        event['id'] = str(sticker.id)
+    else:
+        event['sticker'] = sticker_to_dict(sticker)
+    broker.publish_on_commit(board_id, event)
+
+
+def publish_batch_event(board, revision, created, updated, deleted):
+    """Разослать одно событие stickers.batch на весь пакет изменений"""
+    board_id = str(board.id)
+    broker.publish_on_commit(board_id, {
+        'type': 'stickers.batch',
+        'boardId': board_id,
+        'revision': revision,
+        'created': [sticker_to_dict(sticker) for sticker in created],
+        'updated': [sticker_to_dict(sticker) for sticker in updated],
+        'deleted': [str(sticker_id) for sticker_id in deleted],
+    })
+
+
+def board_changed(board_id, revision):
+    """
+    После коммита записи в доску: сбросить готовые ответы (stickers.documents)
+    и при необходимости записать версию (stickers.snapshots)
+    """
+    invalidate_board_document(board_id)
+    snapshot_after_commit(board_id, revision)
+
+
+@atomic_retry
+def create_sticker(board, fields):
+    """Создать стикер, увеличить ревизию доски и оповестить подписчиков"""
+    revision = Boards.objects.bump_revision(board.id)
+    sticker = Stickers.objects.create(board_id=board, revision=revision, **fields)
+    publish_sticker_event('sticker.created', sticker, revision)
+    board_changed(board.id, revision)
+    return sticker
+
+
+@atomic_retry
+def update_sticker(sticker, fields):
+    """Применить проверенные поля к стикеру и сохранить"""
+    for name, value in fields.items():
+        setattr(sticker, name, value)
+    sticker.revision = Boards.objects.bump_revision(sticker.board_id_id)
+    sticker.save()
+    publish_sticker_event('sticker.updated', sticker, sticker.revision)
+    board_changed(sticker.board_id_id, sticker.revision)
+    return sticker
+
+
+def buffer_sticker_geometry(sticker, fields):
+    """
+    Отложить изменение координат и размеров стикера (см. stickers.writebehind).
+    Повторные PATCH одного стикера сливаются в памяти, в БД ничего не пишется.
+    Возвращает стикер с отложенной геометрией.
+    """
+    pending = geometry_buffer.get(sticker.id)
+    if pending is not None:
+        pending.apply_to(sticker)
+    for name, value in fields.items():
+        setattr(sticker, name, value)
+
+    geometry_buffer.add(sticker.id, sticker.board_id_id, {name: getattr(sticker, name) for name in GEOMETRY_FIELDS})
+    geometry_buffer.flush_due()
+    return sticker
+
+
+def delete_sticker(sticker):
+    """Удалить стикер, оставив надгробие для дельта-синхронизации"""
+    geometry_buffer.discard(sticker.id)
+    _delete_sticker_row(sticker)
+
+
+@atomic_retry
+def _delete_sticker_row(sticker):
+    revision = Boards.objects.bump_revision(sticker.board_id_id)
+    StickerTombstone.objects.create(
+        board_id_id=sticker.board_id_id,
+        sticker_id=sticker.id,
+        revision=revision
+    )
+    publish_sticker_event('sticker.deleted', sticker, revision)
+    board_changed(sticker.board_id_id, revision)
+    Stickers.objects.filter(id=sticker.id).delete()
+
+
+def commit_sticker_changes(board, to_create, to_update, to_delete):
+    """
+    Записать пакет изменений стикеров доски: одна новая ревизия на весь пакет,
+    bulk_create, bulk_update, один DELETE и надгробия для удалённых.
+    Вызывается внутри transaction.atomic().
+    """
+    if not (to_create or to_update or to_delete):
+        return None
+
+    revision = Boards.objects.bump_revision(board.id)
+    for sticker in to_create:
+        sticker.revision = revision
+    for sticker in to_update:
+        sticker.revision = revision
+
+    if to_create:
+        Stickers.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    if to_update:
+        Stickers.objects.bulk_update(to_update, BULK_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+    if to_delete:
+        Stickers.objects.filter(board_id=board, id__in=to_delete).delete()
+        StickerTombstone.objects.bulk_create(
+            [
+                StickerTombstone(board_id=board, sticker_id=sticker_id, revision=revision)
+                for sticker_id in to_delete
+            ],
+            batch_size=BULK_BATCH_SIZE
+        )
+
+    publish_batch_event(board, revision, to_create, to_update, to_delete)
+    board_changed(board.id, revision)
+    return revision
+
+
+def normalize_sticker_item(item):
+    """
+    Привести стикер из состояния доски к плоскому виду.
+    Принимает как плоский формат POST/PATCH, так и элемент фронтенда
+    с вложенным 'data' (zIndex вместо z_index).
+    """
+    if not isinstance(item, dict):
+        raise StickerValidationError('Each sticker must be an object')
+
+    flat = {key: value for key, value in item.items() if key not in ('data', 'style')}
+    data = item.get('data')
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.setdefault('z_index' if key == 'zIndex' else key, value)
+    return flat
+
+
+def parse_sticker_id(value):
+    try:
+        return uuid.UUID(str(value))
+    except (ValueError, TypeError):
+        raise StickerValidationError('Invalid sticker ID format')
+
+
+def apply_board_state(board, items):
+    """
+    Сохранить полное состояние стикеров доски.
+    Сравнивает присланный массив с хранимым и применяет разницу в одной
+    транзакции: bulk_create для новых, bulk_update для изменённых и один
+    DELETE для исчезнувших стикеров.
+    Стикер с id, занятым на другой доске, создаётся с новым id.
+    Возвращает словарь со счётчиками created/updated/deleted/unchanged.
+    """
+    if not isinstance(items, list):
+        raise StickerValidationError('boardState must contain a stickers array')
+
+    # Отложенная геометрия должна попасть в БД до сравнения состояний
+    geometry_buffer.flush(board_id=board.id)
+
+    new_stickers = []
+    patches = {}
+    for item in items:
+        item = normalize_sticker_item(item)
+        sticker_id = item.get('id')
+        if sticker_id is None:
+            new_stickers.append((None, item))
+            continue
+        sticker_id = parse_sticker_id(sticker_id)
+        if sticker_id in patches:
+            raise StickerValidationError('Duplicate sticker ID in boardState')
+        patches[sticker_id] = item
+
+    return _write_board_state(board, new_stickers, patches)
+
+
+@atomic_retry
+def _write_board_state(board, new_stickers, patches):
+    # При повторе после блокировки список новых стикеров не должен расти
+    new_stickers = list(new_stickers)
+    stored = {
+        sticker.id: sticker
+        for sticker in Stickers.objects.filter(board_id=board).select_for_update()
+    }
+
+    to_update = []
+    unchanged = 0
+    for sticker_id, item in patches.items():
+        sticker = stored.get(sticker_id)
+        if sticker is None:
+            # Стикер создан на клиенте с собственным UUID
+            new_stickers.append((sticker_id, item))
+            continue
+
+        fields = clean_sticker_patch(item)
+        changed = False
+        for name, value in fields.items():
+            if getattr(sticker, name) != value:
+                setattr(sticker, name, value)
+                changed = True
+        if changed:
+            sticker.update_spatial_bucket()
+            to_update.append(sticker)
+        else:
+            unchanged += 1
+
+    # UUID стикера другой доски не переносим: новый стикер получит свой id,
+    # а ответ не выдаёт, что такой id где-то существует
+    taken = set(Stickers.objects.filter(
+        id__in=[sticker_id for sticker_id, _ in new_stickers if sticker_id is not None]
+    ).values_list('id', flat=True))
+
+    to_create = []
+    for sticker_id, item in new_stickers:
+        sticker = Stickers(board_id=board, **clean_new_sticker(item))
+        if sticker_id is not None and sticker_id not in taken:
+            sticker.id = sticker_id
+        sticker.update_spatial_bucket()
+        to_create.append(sticker)
+
+    to_delete = [sticker_id for sticker_id in stored if sticker_id not in patches]
+
+    revision = commit_sticker_changes(board, to_create, to_update, to_delete)
+
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(to_delete),
+        'unchanged': unchanged,
+        'revision': revision if revision is not None else board.revision,
+    }
+
+
+BATCH_OPERATIONS = ('create', 'patch', 'delete')
+# Статус корректной операции из отклонённого пакета (424 Failed Dependency)
+NOT_APPLIED_STATUS = 424
+
+
+def apply_sticker_operations(board, operations):
+    """
+    Применить пакет операций над стикерами доски атомарно.
+    operations — список {"op": "create"|"patch"|"delete", "id": ..., "data": {...}}.
+    Операции проверяются по тем же правилам, что и одиночные эндпоинты.
+    Если хотя бы одна операция некорректна, ничего не применяется.
+    Возвращает (ok, results), где results — результат по каждой операции.
+    """
+    if not isinstance(operations, list):
+        raise StickerValidationError('operations must be an array')
+
+    geometry_buffer.flush(board_id=board.id)
+    return _write_sticker_operations(board, operations)
+
+
+@atomic_retry
+def _write_sticker_operations(board, operations):
+    results = []
+    ok = True
+
+    def fail(index, op, message, status=400):
+        nonlocal ok
+        ok = False
+        results.append({'index': index, 'op': op, 'status': status, 'error': message})
+
+    referenced = set()
+    for operation in operations:
+        if isinstance(operation, dict) and operation.get('op') in ('patch', 'delete'):
+            try:
+                referenced.add(parse_sticker_id(operation.get('id')))
+            except StickerValidationError:
+                pass
+    stored = {
+        sticker.id: sticker
+        for sticker in Stickers.objects.filter(board_id=board, id__in=referenced)
+    }
+
+    to_create = []
+    to_update = {}
+    to_delete = set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            fail(index, None, 'Each operation must be an object')
+            continue
+
+        op = operation.get('op')
+        if op not in BATCH_OPERATIONS:
+            fail(index, op, 'op must be one of create, patch, delete')
+            continue
+
+        data = operation.get('data') or {}
+        if not isinstance(data, dict):
+            fail(index, op, 'data must be an object')
+            continue
+
+        try:
+            if op == 'create':
+                sticker = Stickers(board_id=board, **clean_new_sticker(data))
+                sticker.update_spatial_bucket()
+                to_create.append(sticker)
+                results.append({'index': index, 'op': op, 'status': 201, 'sticker': sticker})
+                continue
+
+            sticker_id = parse_sticker_id(operation.get('id'))
+            sticker = stored.get(sticker_id)
+            if sticker is None or sticker_id in to_delete:
+                fail(index, op, 'Sticker not found', status=404)
+                continue
+
+            if op == 'patch':
+                for name, value in clean_sticker_patch(data).items():
+                    setattr(sticker, name, value)
+                sticker.update_spatial_bucket()
+                to_update[sticker_id] = sticker
+                results.append({'index': index, 'op': op, 'status': 200, 'sticker': sticker})
+            else:
+                to_delete.add(sticker_id)
+                to_update.pop(sticker_id, None)
+                results.append({'index': index, 'op': op, 'status': 204, 'id': str(sticker_id)})
+        except StickerValidationError as e:
+            fail(index, op, str(e))
+
+    if ok:
+        commit_sticker_changes(board, to_create, list(to_update.values()), list(to_delete))
+    else:
+        # Пакет отклонён: корректные операции тоже не применены
+        for result in results:
+            if result['status'] < 400:
+                result.pop('sticker', None)
+                result.pop('id', None)
+                result['status'] = NOT_APPLIED_STATUS
+                result['error'] = 'Not applied: another operation in the batch failed'
+
+    return ok, results
+
+
+def copy_board_stickers(source_id, target_id, revision):
+    """
+    Скопировать все стикеры доски source_id в target_id одним INSERT ... SELECT
+    с новыми UUID, не загружая строки в Python. Копии получают ревизию revision,
+    полнотекстовый индекс строится для новой доски целиком (deferred_indexing).
+    Вызывается внутри транзакции; возвращает число скопированных стикеров.
+    """
+    quote = connection.ops.quote_name
+    opts = Stickers._meta
+    columns = [quote(opts.get_field(name).column) for name in COPY_FIELDS]
+    board_column = quote(opts.get_field('board_id').column)
+    sql = (
+        f'INSERT INTO {quote(opts.db_table)} ({quote(opts.pk.column)}, {board_column}, '
+        f'{quote(opts.get_field("revision").column)}, {", ".join(columns)}) '
+        f'SELECT {SQLITE_UUID4}, %s, %s, {", ".join(columns)} '
+        f'FROM {quote(opts.db_table)} WHERE {board_column} = %s'
+    )
+    board_field = opts.get_field('board_id')
+    with deferred_indexing(target_id), connection.cursor() as cursor:
+        cursor.execute(sql, [
+            board_field.get_db_prep_save(target_id, connection),
+            revision,
+            board_field.get_db_prep_save(source_id, connection),
+        ])
+        return cursor.rowcount
+
+
+def duplicate_board(source, owner, title, description='', is_template=False):
+    """
+    Новая доска owner'а с копией стикеров source (BoardsManager.create_board).
+    Отложенная геометрия source сначала записывается, чтобы попасть в копию.
+    """
+    geometry_buffer.flush(board_id=source.id)
+    return run_atomic(
+        Boards.objects.create_board,
+        title=title, owner=owner, description=description, source=source, is_template=is_template,
+    )
+
+
+@atomic_retry
+def prune_tombstones(older_than):
+    """
+    Удалить надгробия старше older_than (datetime).
+    Для затронутых досок запоминается pruned_revision: клиенты с более
+    старой ревизией получат полную доску вместо дельты.
+    Возвращает количество удалённых надгробий.
+    """
+    expired = StickerTombstone.objects.filter(deleted_at__lt=older_than)
+    horizons = expired.values('board_id').annotate(max_revision=Max('revision'))
+    for horizon in horizons:
+        Boards.objects.filter(
+            id=horizon['board_id'],
+            pruned_revision__lt=horizon['max_revision']
+        ).update(pruned_revision=horizon['max_revision'])
+    deleted, _ = expired.delete()
+    return deleted
@@ -0,0 +1,237 @@
+"""
+Снимки досок: сжатое состояние стикеров и дельты между снимками.
+
+Версия (BoardSnapshot) фиксирует доску на ревизии revision. Полная версия
+хранит все стикеры, дельта — стикеры, изменённые после предыдущей версии
+(по Stickers.revision), и id удалённых (по надгробиям). Каждая
+BOARD_SNAPSHOT_FULL_EVERY-я версия снова полная, чтобы цепочка дельт
+оставалась короткой.
+
+Версии пишутся при автосохранении, при восстановлении и после каждых
+BOARD_SNAPSHOT_EVERY изменений доски. Состояние доски можно собрать из
+последней версии и короткого хвоста изменений после неё, не читая все
+строки стикеров (load_board_state).
+
+Старые версии удаляет prune_snapshots (команда prune_sticker_tombstones);
+последняя полная версия до границы и всё после неё остаются, так что
+у каждой оставшейся дельты есть полная база.
+
+Данные версии — JSON, сжатый zlib: {"stickers": [строки]} для полной,
+{"upserted": [строки], "deleted": [id]} для дельты; строка — значения
+SNAPSHOT_FIELDS по порядку.
+"""
+import json
+import logging
+import uuid
+import zlib
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Length
+
+from backend.db import atomic_retry
+from boards.models import Boards
+from .models import BoardSnapshot, Stickers, StickerTombstone
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ('id', 'content', 'color', 'x', 'y', 'width', 'height', 'z_index')
+Z_INDEX_COLUMN = SNAPSHOT_FIELDS.index('z_index')
+
+
+def encode(payload):
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+
+
+def decode(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def sticker_rows(queryset):
+    """Строки стикеров в порядке SNAPSHOT_FIELDS, id строкой"""
+    return [[str(row[0]), *row[1:]] for row in queryset.values_list(*SNAPSHOT_FIELDS)]
+
+
+def latest_snapshot(board_id):
+    return BoardSnapshot.objects.filter(board_id=board_id).order_by('-revision').first()
+
+
+@atomic_retry
+def take_snapshot(board, reason):
+    """
+    Записать версию доски на её текущей ревизии.
+    Если версия на этой ревизии уже есть, возвращает её.
+    Отложенная геометрия (stickers.writebehind) ещё не имеет ревизии
+    и в версию не попадает.
+    """
+    revision = Boards.objects.filter(id=board.id).values_list('revision', 'pruned_revision').first()
+    if revision is None:
+        return None
+    revision, pruned_revision = revision
+
+    previous = latest_snapshot(board.id)
+    if previous is not None and previous.revision >= revision:
+        return previous
+
+    full = (
+        previous is None
+        or previous.chain + 1 >= settings.BOARD_SNAPSHOT_FULL_EVERY
+        # Надгробия после предыдущей версии уже вычищены — дельту не собрать
+        or previous.revision < pruned_revision
+    )
+    if full:
+        rows = sticker_rows(Stickers.objects.filter(board_id=board.id))
+        payload = {'stickers': rows}
+        chain = 0
+        count = len(rows)
+    else:
+        rows = sticker_rows(Stickers.objects.filter(board_id=board.id, revision__gt=previous.revision))
+        deleted = [
+            str(sticker_id) for sticker_id in StickerTombstone.objects.filter(
+                board_id=board.id, revision__gt=previous.revision
+            ).values_list('sticker_id', flat=True)
+        ]
+        payload = {'upserted': rows, 'deleted': deleted}
+        chain = previous.chain + 1
+        count = Stickers.objects.filter(board_id=board.id).count()
+
+    try:
+        with transaction.atomic():
+            return BoardSnapshot.objects.create(
+                board_id_id=board.id,
+                revision=revision,
+                kind=BoardSnapshot.KIND_FULL if full else BoardSnapshot.KIND_DELTA,
+                chain=chain,
+                reason=reason,
+                sticker_count=count,
+                data=encode(payload),
+            )
+    except IntegrityError:
+        # Версию на этой ревизии успел записать параллельный запрос
+        return latest_snapshot(board.id)
+
+
+def state_at(snapshot, board_id=None):
+    """
+    Состояние доски на версии snapshot: {id: строка}.
+    Берётся ближайшая полная версия и применяются дельты после неё.
+    """
+    board_id = board_id or snapshot.board_id_id
+    if snapshot.kind == BoardSnapshot.KIND_FULL:
+        chain = [snapshot]
+    else:
+        base = BoardSnapshot.objects.filter(
+            board_id=board_id, kind=BoardSnapshot.KIND_FULL, revision__lt=snapshot.revision
+        ).order_by('-revision').values_list('revision', flat=True).first()
+        chain = list(BoardSnapshot.objects.filter(
+            board_id=board_id, revision__gte=base, revision__lte=snapshot.revision
+        ).order_by('revision'))
+
+    state = {}
+    for version in chain:
+        payload = decode(version.data)
+        if version.kind == BoardSnapshot.KIND_FULL:
+            state = {row[0]: row for row in payload['stickers']}
+            continue
+        for row in payload['upserted']:
+            state[row[0]] = row
+        for sticker_id in payload['deleted']:
+            state.pop(sticker_id, None)
+    return state
+
+
+def load_board_state(board):
+    """
+    Текущие стикеры доски из последней версии и хвоста изменений после неё
+    (индекс по ревизии стикеров и надгробия). Возвращает список строк
+    в порядке SNAPSHOT_FIELDS, отсортированный по z_index, как и чтение из БД,
+    или None, если версий нет или хвост не собрать.
+    """
+    snapshot = latest_snapshot(board.id)
+    if snapshot is None or snapshot.revision < board.pruned_revision:
+        return None
+
+    state = state_at(snapshot, board.id)
+    if snapshot.revision < board.revision:
+        for row in sticker_rows(Stickers.objects.filter(board_id=board.id, revision__gt=snapshot.revision)):
+            state[row[0]] = row
+        for sticker_id in StickerTombstone.objects.filter(
+            board_id=board.id, revision__gt=snapshot.revision
+        ).values_list('sticker_id', flat=True):
+            state.pop(str(sticker_id), None)
+    return sorted(state.values(), key=lambda row: row[Z_INDEX_COLUMN])
+
+
+def rows_to_stickers(rows, board_id):
+    """Строки версии в несохраняемые объекты Stickers для сериализации ответов"""
+    stickers = []
+    for row in rows:
+        values = dict(zip(SNAPSHOT_FIELDS, row))
+        values['id'] = uuid.UUID(values['id'])
+        stickers.append(Stickers(board_id_id=board_id, **values))
+    return stickers
+
+
+def restore_snapshot(board, snapshot):
+    """
+    Вернуть доску к версии snapshot через apply_board_state: стикеры
+    сохраняют свои id, изменения получают новую ревизию и рассылаются
+    подписчикам. После восстановления пишется новая версия.
+    """
+    from .services import apply_board_state
+
+    items = [dict(zip(SNAPSHOT_FIELDS, row)) for row in state_at(snapshot, board.id).values()]
+    counts = apply_board_state(board, items)
+    version = take_snapshot(board, reason='restore')
+    counts['version'] = version.id if version is not None else None
+    return counts
+
+
+def snapshot_after_commit(board_id, revision):
+    """Запланировать версию после коммита, если ревизия кратна BOARD_SNAPSHOT_EVERY"""
+    every = settings.BOARD_SNAPSHOT_EVERY
+    if not every or not revision or revision % every:
+        return
+
+    def snapshot():
+        board = Boards(id=board_id)
+        try:
+            take_snapshot(board, reason='changes')
+        except Exception:
+            logger.exception('Failed to snapshot board %s at revision %s', board_id, revision)
+
+    transaction.on_commit(snapshot)
+
+
+def list_snapshots(board_id):
+    """Версии доски от новых к старым, без загрузки самих данных"""
+    return BoardSnapshot.objects.filter(board_id=board_id).defer('data').annotate(
+        size=Length('data')
+    ).order_by('-revision')
+
+
+def snapshot_to_dict(snapshot):
+    return {
+        'id': snapshot.id,
+        'revision': snapshot.revision,
+        'kind': snapshot.kind,
+        'reason': snapshot.reason,
+        'stickerCount': snapshot.sticker_count,
+        'size': snapshot.size,
+        'createdAt': snapshot.created_at.isoformat(),
+    }
+
+
+@atomic_retry
+def prune_snapshots(older_than):
+    """
+    Удалить версии, записанные до older_than (datetime). По каждой доске
+    остаётся последняя полная версия до этой границы и все версии после
+    неё: дельтам нужна их полная база. Возвращает количество удалённых версий.
+    """
+    base = BoardSnapshot.objects.filter(
+        board_id=OuterRef('board_id'), kind=BoardSnapshot.KIND_FULL, created_at__lt=older_than
+    ).order_by('-revision').values('revision')[:1]
+    deleted, _ = BoardSnapshot.objects.filter(revision__lt=Subquery(base)).delete()
+    return deleted
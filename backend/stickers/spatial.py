@@ -0,0 +1,70 @@
+"""
+Пространственный индекс стикеров: иерархическая сетка.
+
+Каждый стикер попадает в одну ячейку (level, tile_x, tile_y): уровень —
+минимальный, на котором сторона ячейки не меньше стороны стикера, ячейка —
+та, в которой лежит левый верхний угол. Поэтому стикер заходит не дальше
+соседней ячейки справа/снизу, и для вьюпорта на каждом уровне достаточно
+просмотреть диапазон ячеек, расширенный на одну влево и вверх.
+
+Индекс (board_id, spatial_level, tile_x, tile_y) ищет по диапазону только
+в последней используемой колонке: при tile_x BETWEEN условие на tile_y
+проверялось бы построчно по всей высоте доски. Поэтому столбцы ячеек
+перечисляются (tile_x IN (...)), и для каждого SQLite ищет диапазон tile_y —
+число прочитанных строк индекса зависит от вьюпорта, а не от размеров доски.
+"""
+from django.db.models import F, Q
+
+TILE_SIZE = 256
+MAX_LEVEL = 12
+# Больше столбцов на уровне перечислять не стоит: вьюпорт и так покрывает
+# большую часть доски, и диапазон по tile_x дешевле длинного IN
+MAX_TILE_COLUMNS = 64
+
+
+def tile_size(level):
+    return TILE_SIZE << level
+
+
+def bucket_for(x, y, width, height):
+    """Вернуть (level, tile_x, tile_y) для прямоугольника стикера"""
+    size = max(width, height, 1)
+    level = min(((size - 1) // TILE_SIZE).bit_length(), MAX_LEVEL)
+    tile = tile_size(level)
+    return level, x // tile, y // tile
+
+
+def viewport_q(board_id, x, y, width, height):
+    """
+    Q-фильтр стикеров доски, пересекающих прямоугольник вьюпорта.
+    Доска повторяется в каждой ветке OR, чтобы SQLite разложил запрос
+    на поиски по индексу (MULTI-INDEX OR). Последнее условие отсекает
+    кандидатов, которые только соседствуют с вьюпортом.
+    """
+    right = x + width
+    bottom = y + height
+
+    buckets = Q()
+    for level in range(MAX_LEVEL):
+        tile = tile_size(level)
+        first, last = x // tile - 1, (right - 1) // tile
+        if last - first < MAX_TILE_COLUMNS:
+            columns = Q(tile_x__in=range(first, last + 1))
+        else:
+            columns = Q(tile_x__range=(first, last))
+        buckets |= Q(
+            columns,
+            board_id=board_id,
+            spatial_level=level,
+            tile_y__range=(y // tile - 1, (bottom - 1) // tile),
+        )
+    # На последнем уровне стикер может быть больше ячейки — берём весь уровень
+    buckets |= Q(board_id=board_id, spatial_level=MAX_LEVEL)
+
+    return buckets & Q(
+        x__lt=right,
+        y__lt=bottom,
+    ) & Q(
+        x__gt=x - F('width'),
+        y__gt=y - F('height'),
+    )
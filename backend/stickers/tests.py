@@ -1,17 +1,35 @@
-from django.test import TestCase, Client
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.http import StreamingHttpResponse
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Stickers
-from boards.models import Boards
+from django.utils import timezone
+from backend.testing import token_headers
+from .documents import DocumentCache, document_cache
+from .models import BoardSnapshot, Stickers, StickerTombstone
+from .search import search_sql
+from .spatial import MAX_LEVEL, viewport_q
+from .writebehind import geometry_buffer
+from boards.models import Boards, Board_Users
+from auth_app.models import User
+import io
 import json
+import os
+import random
+import tempfile
 import uuid
+from datetime import timedelta
+from unittest import mock
 
 class StickersTestCase(TestCase):
     def setUp(self):
         # Create a test board
-        self.board = Boards.objects.create(
-            title="Test Board"
+        self.user = User.objects.create(username='stickers', password='x')
+        self.board = Boards.objects.create_board(
+            title="Test Board", owner=self.user
         )
-        self.client = Client()
+        self.client = Client(**token_headers(self.user))
 
     def test_create_sticker(self):
         """Test creating a new sticker"""
@@ -120,3 +138,1141 @@ class StickersTestCase(TestCase):
 
         self.assertEqual(response.status_code, 204)
         self.assertEqual(Stickers.objects.count(), 0)
+
+
+class StickersViewportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='viewport', password='x')
+        self.board = Boards.objects.create_board(title="Viewport Board", owner=self.user)
+        self.client = Client(**token_headers(self.user))
+
+    def get_viewport(self, x, y, width, height):
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+        return self.client.get(url, {'x': x, 'y': y, 'width': width, 'height': height})
+
+    def test_viewport_matches_bruteforce(self):
+        """Выборка по вьюпорту совпадает с полным перебором"""
+        rng = random.Random(42)
+        stickers = []
+        for _ in range(300):
+            stickers.append(Stickers.objects.create(
+                content='s',
+                color='#FFFF99',
+                x=rng.randint(-5000, 5000),
+                y=rng.randint(-5000, 5000),
+                width=rng.choice([50, 150, 300, 1200, 9000]),
+                height=rng.choice([50, 150, 300, 700]),
+                board_id=self.board
+            ))
+
+        for vx, vy, vw, vh in [(0, 0, 800, 600), (-3000, 1000, 1920, 1080), (4900, 4900, 100, 100)]:
+            expected = {
+                str(s.id) for s in stickers
+                if s.x < vx + vw and s.x + s.width > vx and s.y < vy + vh and s.y + s.height > vy
+            }
+            response = self.get_viewport(vx, vy, vw, vh)
+            self.assertEqual(response.status_code, 200)
+            returned = {element['id'] for element in response.json()['board']['elements']}
+            self.assertEqual(returned, expected)
+
+    def test_bucket_follows_geometry_changes(self):
+        """Ячейка индекса пересчитывается при PATCH координат"""
+        sticker = Stickers.objects.create(
+            content='moving', color='#FFFF99', x=0, y=0, width=100, height=100, board_id=self.board
+        )
+        self.client.patch(
+            reverse('sticker_detail', args=[sticker.id]),
+            json.dumps({'x': 10000, 'y': 10000}),
+            content_type='application/json'
+        )
+
+        elements = self.get_viewport(0, 0, 500, 500).json()['board']['elements']
+        self.assertEqual(elements, [])
+        elements = self.get_viewport(9900, 9900, 500, 500).json()['board']['elements']
+        self.assertEqual([element['id'] for element in elements], [str(sticker.id)])
+
+    def test_viewport_seeks_both_tile_coordinates(self):
+        """Диапазон tile_y — часть поиска по индексу, а не построчная проверка"""
+        stickers = Stickers.objects.filter(viewport_q(self.board.id, 10000, 10000, 1920, 1080))
+        sql, params = stickers.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            searches = [row[-1] for row in cursor.fetchall() if 'tile_x' in row[-1]]
+        self.assertEqual(len(searches), MAX_LEVEL)
+        for detail in searches:
+            self.assertIn('tile_x=? AND tile_y>? AND tile_y<?', detail)
+
+    def test_huge_viewport_matches_bruteforce(self):
+        """Вьюпорт шире MAX_TILE_COLUMNS ячеек — диапазон по tile_x"""
+        inside = Stickers.objects.create(content='s', x=30000, y=10, width=100, height=100, board_id=self.board)
+        Stickers.objects.create(content='s', x=30000, y=900, width=100, height=100, board_id=self.board)
+        elements = self.get_viewport(0, 0, 60000, 500).json()['board']['elements']
+        self.assertEqual([element['id'] for element in elements], [str(inside.id)])
+
+    def test_incomplete_viewport_rejected(self):
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+        response = self.client.get(url, {'x': 0, 'y': 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class StickersBatchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='batch', password='x')
+        self.board = Boards.objects.create_board(title="Batch Board", owner=self.user)
+        self.client = Client()
+        self.url = reverse('board_stickers_batch', args=[self.board.id])
+        self.headers = token_headers(self.user)
+
+    def create_sticker(self, **fields):
+        return Stickers.objects.create(
+            content=fields.get('content', 'sticker'), color='#FFFF99',
+            x=fields.get('x', 0), y=0, width=100, height=100, board_id=self.board
+        )
+
+    def post_batch(self, operations, headers=None):
+        return self.client.post(
+            self.url,
+            json.dumps({'operations': operations}),
+            content_type='application/json',
+            **(self.headers if headers is None else headers)
+        )
+
+    def test_mixed_operations(self):
+        """Создание, изменение и удаление в одном пакете"""
+        moved = self.create_sticker()
+        removed = self.create_sticker()
+
+        response = self.post_batch([
+            {'op': 'create', 'data': {'content': 'new', 'color': '#00FF00'}},
+            {'op': 'patch', 'id': str(moved.id), 'data': {'x': 300, 'color': '#0000FF'}},
+            {'op': 'delete', 'id': str(removed.id)},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [201, 200, 204])
+        self.assertEqual(results[1]['sticker']['x'], 300)
+
+        moved.refresh_from_db()
+        self.assertEqual((moved.x, moved.color), (300, '#0000FF'))
+        self.assertFalse(Stickers.objects.filter(id=removed.id).exists())
+        self.assertTrue(Stickers.objects.filter(id=results[0]['sticker']['id']).exists())
+
+    def test_invalid_operation_rejects_whole_batch(self):
+        """Ошибка в одной операции отменяет весь пакет"""
+        sticker = self.create_sticker()
+
+        response = self.post_batch([
+            {'op': 'patch', 'id': str(sticker.id), 'data': {'x': 50}},
+            {'op': 'patch', 'id': str(sticker.id), 'data': {'width': 0}},
+            {'op': 'delete', 'id': str(uuid.uuid4())},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertFalse(body['applied'])
+        self.assertEqual([result['status'] for result in body['results']], [424, 400, 404])
+        self.assertEqual(body['results'][1]['error'], 'Width must be a positive integer')
+
+        sticker.refresh_from_db()
+        self.assertEqual(sticker.x, 0)
+
+    def test_valid_create_in_rejected_batch_is_not_reported_as_created(self):
+        sticker = self.create_sticker()
+
+        response = self.post_batch([
+            {'op': 'create', 'data': {'content': 'new'}},
+            {'op': 'patch', 'id': str(sticker.id), 'data': {'content': 42}},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [424, 400])
+        self.assertNotIn('sticker', results[0])
+        self.assertEqual(results[1]['error'], 'Content must be a string')
+        self.assertEqual(Stickers.objects.filter(board_id=self.board).count(), 1)
+
+    def test_body_must_be_an_object(self):
+        response = self.client.post(self.url, json.dumps([]), content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Request body must be a JSON object')
+
+    def test_anonymous_batch_is_rejected(self):
+        sticker = self.create_sticker()
+
+        response = self.post_batch([{'op': 'delete', 'id': str(sticker.id)}], headers={})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'User ID required')
+        self.assertTrue(Stickers.objects.filter(id=sticker.id).exists())
+
+    def test_non_member_batch_is_rejected(self):
+        stranger = User.objects.create(username='stranger', password='x')
+
+        response = self.post_batch(
+            [{'op': 'create', 'data': {'content': 'new', 'color': '#00FF00'}}],
+            headers=token_headers(stranger),
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Stickers.objects.filter(board_id=self.board).exists())
+
+    def test_query_count_stays_bounded(self):
+        """Перемещение большого выделения — несколько запросов, а не два на стикер"""
+        stickers = [self.create_sticker(x=i) for i in range(200)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_batch([
+                {'op': 'patch', 'id': str(sticker.id), 'data': {'x': sticker.x + 10}}
+                for sticker in stickers
+            ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries), 15)
+
+
+class StickersConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='cached', password='x')
+        self.board = Boards.objects.create_board(title="Cached Board", owner=self.user)
+        self.client = Client(**token_headers(self.user))
+        self.url = reverse('board_stickers_list_create', args=[self.board.id])
+
+    def test_not_modified_without_loading_stickers(self):
+        """Совпавший If-None-Match — 304 и только запрос доски"""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_change_etag(self):
+        """Каждая запись стикера или доски меняет ETag"""
+        etags = [self.client.get(self.url)['ETag']]
+
+        response = self.client.post(self.url, json.dumps({'content': 'new'}), content_type='application/json')
+        sticker_url = reverse('sticker_detail', args=[response.json()['id']])
+        etags.append(self.client.get(self.url)['ETag'])
+
+        self.client.patch(sticker_url, json.dumps({'x': 10}), content_type='application/json')
+        etags.append(self.client.get(self.url)['ETag'])
+
+        self.client.delete(sticker_url)
+        etags.append(self.client.get(self.url)['ETag'])
+
+        user = User.objects.create(username='editor', password='x')
+        Board_Users.objects.create(user_id=user, board_id=self.board)
+        self.client.post(
+            reverse('board_detail_delete', args=[self.board.id]),
+            json.dumps({'title': 'Renamed'}),
+            content_type='application/json',
+            **token_headers(user)
+        )
+        etags.append(self.client.get(self.url)['ETag'])
+
+        self.assertEqual(len(set(etags)), len(etags))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewport(self):
+        full = self.client.get(self.url)['ETag']
+        viewport = self.client.get(self.url, {'x': 0, 'y': 0, 'width': 10, 'height': 10})['ETag']
+        self.assertNotEqual(full, viewport)
+
+
+class StickersDeltaSyncTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='delta', password='x')
+        self.board = Boards.objects.create_board(title="Delta Board", owner=self.user)
+        self.client = Client(**token_headers(self.user))
+        self.url = reverse('board_stickers_list_create', args=[self.board.id])
+
+    def create(self, content):
+        response = self.client.post(self.url, json.dumps({'content': content}), content_type='application/json')
+        return response.json()['id']
+
+    def get_board(self, **params):
+        return self.client.get(self.url, params).json()['board']
+
+    def test_since_returns_changes_and_tombstones(self):
+        untouched = self.create('untouched')
+        moved = self.create('moved')
+        removed = self.create('removed')
+        revision = self.get_board()['revision']
+
+        self.client.patch(reverse('sticker_detail', args=[moved]), json.dumps({'x': 5}),
+                          content_type='application/json')
+        self.client.delete(reverse('sticker_detail', args=[removed]))
+        added = self.create('added')
+
+        delta = self.get_board(since=revision)
+        self.assertFalse(delta['reset'])
+        self.assertEqual({element['id'] for element in delta['elements']}, {moved, added})
+        self.assertEqual(delta['deleted'], [removed])
+        self.assertNotIn(untouched, [element['id'] for element in delta['elements']])
+
+        # Отложенное перемещение попадает в дельту, пока не записано в БД
+        geometry_buffer.flush()
+        latest = self.get_board(since=self.get_board(since=delta['revision'])['revision'])
+        self.assertEqual((latest['elements'], latest['deleted']), ([], []))
+
+    def test_pruned_history_forces_reset(self):
+        kept = self.create('kept')
+        removed = self.create('removed')
+        self.client.delete(reverse('sticker_detail', args=[removed]))
+
+        call_command('prune_sticker_tombstones', days=0, stdout=io.StringIO())
+
+        self.assertEqual(StickerTombstone.objects.count(), 0)
+        delta = self.get_board(since=0)
+        self.assertTrue(delta['reset'])
+        self.assertEqual([element['id'] for element in delta['elements']], [kept])
+
+
+class StickersCompactFormatTestCase(TestCase):
+    def setUp(self):
+        self.board = Boards.objects.create(title="Compact Board")
+        self.client = Client()
+        self.url = reverse('board_stickers_list_create', args=[self.board.id])
+        self.sticker = Stickers.objects.create(
+            content='compact', color='#123456', x=1, y=2, width=30, height=40, z_index=5,
+            board_id=self.board
+        )
+
+    def test_compact_columns(self):
+        board = self.client.get(self.url, {'format': 'compact'}).json()['board']
+
+        self.assertEqual(board['format'], 'compact')
+        self.assertNotIn('elements', board)
+        self.assertEqual(board['stickers'], {
+            'ids': [str(self.sticker.id)],
+            'xs': [1],
+            'ys': [2],
+            'widths': [30],
+            'heights': [40],
+            'colors': ['#123456'],
+            'zIndexes': [5],
+            'contents': ['compact'],
+        })
+
+    def test_compact_via_accept_header(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/vnd.miro.compact+json')
+        compact_etag = response['ETag']
+
+        self.assertEqual(response.json()['board']['stickers']['ids'], [str(self.sticker.id)])
+        self.assertNotEqual(self.client.get(self.url)['ETag'], compact_etag)
+
+    def test_empty_board(self):
+        Stickers.objects.all().delete()
+        board = self.client.get(self.url, {'format': 'compact'}).json()['board']
+        self.assertEqual(board['stickers']['ids'], [])
+        self.assertEqual(board['stickers']['contents'], [])
+
+
+class StickersGeometryBufferTestCase(TestCase):
+    def setUp(self):
+        geometry_buffer.clear()
+        self.user = User.objects.create(username='drag', password='x')
+        self.board = Boards.objects.create_board(title="Drag Board", owner=self.user)
+        self.client = Client(**token_headers(self.user))
+        self.sticker = Stickers.objects.create(
+            content='drag', color='#FFFF99', x=0, y=0, width=100, height=100, board_id=self.board
+        )
+        self.url = reverse('sticker_detail', args=[self.sticker.id])
+
+    def tearDown(self):
+        geometry_buffer.clear()
+
+    def drag(self, **geometry):
+        return self.client.patch(self.url, json.dumps(geometry), content_type='application/json')
+
+    def test_only_members_can_change_stickers(self):
+        stranger = Client(**token_headers(User.objects.create(username='stranger', password='x')))
+        for client, status in ((Client(), 400), (stranger, 403)):
+            drag = client.patch(self.url, json.dumps({'x': 50}), content_type='application/json')
+            edit = client.patch(self.url, json.dumps({'content': 'mine'}), content_type='application/json')
+            delete = client.delete(self.url)
+            self.assertEqual((drag.status_code, edit.status_code, delete.status_code), (status,) * 3)
+
+        self.assertIsNone(geometry_buffer.get(self.sticker.id))
+        self.sticker.refresh_from_db()
+        self.assertEqual((self.sticker.x, self.sticker.content), (0, 'drag'))
+
+    def test_drag_patches_are_coalesced(self):
+        """Повторные PATCH координат не пишут в БД и сливаются в одну запись"""
+        with CaptureQueriesContext(connection) as queries:
+            for step in range(1, 21):
+                response = self.drag(x=step * 10, y=step * 5)
+
+        self.assertEqual(response.json()['x'], 200)
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries))
+        self.sticker.refresh_from_db()
+        self.assertEqual(self.sticker.x, 0)
+
+        self.drag(width=150)
+        self.assertEqual(geometry_buffer.flush(), 1)
+
+        self.sticker.refresh_from_db()
+        self.assertEqual((self.sticker.x, self.sticker.y, self.sticker.width), (200, 100, 150))
+        self.assertEqual(self.sticker.revision, Boards.objects.get(id=self.board.id).revision)
+
+    def test_reads_see_buffered_geometry(self):
+        board_url = reverse('board_stickers_list_create', args=[self.board.id])
+        etag = self.client.get(board_url)['ETag']
+
+        self.drag(x=5000, y=5000)
+
+        response = self.client.get(board_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['board']['elements'][0]['data']['x'], 5000)
+        compact = self.client.get(board_url, {'format': 'compact'}).json()['board']['stickers']
+        self.assertEqual(compact['xs'], [5000])
+        inside = self.client.get(board_url, {'x': 4900, 'y': 4900, 'width': 200, 'height': 200})
+        self.assertEqual(len(inside.json()['board']['elements']), 1)
+        outside = self.client.get(board_url, {'x': 0, 'y': 0, 'width': 200, 'height': 200})
+        self.assertEqual(outside.json()['board']['elements'], [])
+
+    def test_full_patch_writes_buffered_geometry_first(self):
+        self.drag(x=70)
+        response = self.client.patch(self.url, json.dumps({'content': 'renamed'}), content_type='application/json')
+
+        self.assertEqual(response.json()['x'], 70)
+        self.assertIsNone(geometry_buffer.get(self.sticker.id))
+        self.sticker.refresh_from_db()
+        self.assertEqual((self.sticker.x, self.sticker.content), (70, 'renamed'))
+
+    def test_delete_drops_buffered_geometry(self):
+        self.drag(x=70)
+        self.client.delete(self.url)
+
+        self.assertIsNone(geometry_buffer.get(self.sticker.id))
+        self.assertEqual(geometry_buffer.flush(), 0)
+
+    @override_settings(STICKER_GEOMETRY_FLUSH_INTERVAL=60)
+    def test_board_versions_are_forgotten_when_nothing_is_pending(self):
+        self.drag(x=10)
+        first = geometry_buffer.board_version(self.board.id)
+        geometry_buffer.flush()
+        self.assertNotIn(self.board.id, geometry_buffer._board_versions)
+
+        # Номера не повторяются и после сброса
+        self.drag(x=20)
+        self.assertGreater(geometry_buffer.board_version(self.board.id), first)
+        geometry_buffer.clear()
+        self.assertEqual(geometry_buffer._board_versions, {})
+
+        self.drag(x=30)
+        self.client.delete(self.url)
+        self.assertEqual(geometry_buffer._board_versions, {})
+
+
+@override_settings(DATABASE_LOCK_RETRIES=3, DATABASE_LOCK_RETRY_DELAY=0)
+class StickersLockRetryTestCase(TransactionTestCase):
+    """Повтор транзакции при "database is locked" (backend.db.atomic_retry)"""
+
+    def setUp(self):
+        self.board = Boards.objects.create(title="Locked Board")
+        self.url = reverse('board_stickers_list_create', args=[self.board.id])
+        self.data = {'content': 'Retry', 'color': '#123456', 'x': 0, 'y': 0}
+
+    def locked_then(self, failures):
+        bump_revision = Boards.objects.bump_revision
+        calls = {'count': 0}
+
+        def side_effect(board_id):
+            calls['count'] += 1
+            if calls['count'] <= failures:
+                raise OperationalError('database is locked')
+            return bump_revision(board_id)
+
+        return mock.patch.object(Boards.objects, 'bump_revision', side_effect=side_effect), calls
+
+    def test_create_retries_after_lock(self):
+        patcher, calls = self.locked_then(failures=2)
+        with patcher:
+            response = self.client.post(self.url, data=json.dumps(self.data), content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(calls['count'], 3)
+        self.assertEqual(Stickers.objects.filter(board_id=self.board).count(), 1)
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.revision, 1)
+
+    def test_create_returns_503_when_lock_persists(self):
+        patcher, calls = self.locked_then(failures=10)
+        with patcher:
+            response = self.client.post(self.url, data=json.dumps(self.data), content_type='application/json')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(calls['count'], 3)
+        self.assertFalse(Stickers.objects.filter(board_id=self.board).exists())
+
+    def test_other_operational_errors_are_not_retried(self):
+        bump = mock.patch.object(Boards.objects, 'bump_revision', side_effect=OperationalError('no such table: x'))
+        with bump as mocked:
+            response = self.client.post(self.url, data=json.dumps(self.data), content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(mocked.call_count, 1)
+
+
+class BoardSnapshotTestCase(TestCase):
+    """Версии досок: полные снимки, дельты, восстановление (stickers.snapshots)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='snapshots', password='x')
+        self.board = Boards.objects.create_board(title='Versions', owner=self.user)
+        self.headers = token_headers(self.user)
+        self.client = Client(**self.headers)
+
+    def autosave(self, stickers):
+        return self.client.post(
+            reverse('board_autosave', args=[self.board.id]),
+            json.dumps({'boardState': {'stickers': stickers}}),
+            content_type='application/json', **self.headers
+        )
+
+    def versions(self):
+        response = self.client.get(reverse('board_versions', args=[self.board.id]), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['versions']
+
+    def live_state(self):
+        return {
+            str(sticker.id): (sticker.content, sticker.x, sticker.y)
+            for sticker in Stickers.objects.filter(board_id=self.board)
+        }
+
+    def test_autosave_writes_full_then_delta_versions(self):
+        self.autosave([{'content': f'Note {i}', 'color': '#FFEB3B', 'x': i} for i in range(20)])
+        first = self.live_state()
+        ids = list(first)
+        self.autosave([{'id': sticker_id, 'content': 'Edited', 'x': 1} for sticker_id in ids[:10]])
+
+        versions = self.versions()
+        self.assertEqual([version['kind'] for version in versions], ['delta', 'full'])
+        self.assertEqual([version['stickerCount'] for version in versions], [10, 20])
+        self.assertLess(versions[0]['size'], versions[1]['size'])
+        self.assertEqual(versions[0]['reason'], 'autosave')
+
+    def test_restore_returns_board_to_version(self):
+        self.autosave([{'content': f'Note {i}', 'color': '#FFEB3B', 'x': i} for i in range(5)])
+        original = self.live_state()
+        version_id = self.versions()[0]['id']
+
+        ids = list(original)
+        self.autosave(
+            [{'id': sticker_id, 'content': 'Changed', 'x': 100} for sticker_id in ids[:2]]
+            + [{'content': 'Extra', 'color': '#FFFFFF'}]
+        )
+        self.assertNotEqual(self.live_state(), original)
+
+        response = self.client.post(
+            reverse('board_version_restore', args=[self.board.id, version_id]), **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['restoredFrom'], version_id)
+        self.assertEqual((body['created'], body['updated'], body['deleted']), (3, 2, 1))
+        self.assertEqual(self.live_state(), original)
+        self.assertEqual(self.versions()[0]['reason'], 'restore')
+
+    def test_restore_unknown_version(self):
+        response = self.client.post(
+            reverse('board_version_restore', args=[self.board.id, 999]), **self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(BOARD_SNAPSHOT_FULL_EVERY=3)
+    def test_delta_chain_is_bounded(self):
+        sticker = Stickers.objects.create(board_id=self.board, content='Chain', color='#FFFFFF')
+        for i in range(7):
+            self.autosave([{'id': str(sticker.id), 'content': f'Chain {i}'}])
+
+        kinds = [version['kind'] for version in reversed(self.versions())]
+        self.assertEqual(kinds, ['full', 'delta', 'delta', 'full', 'delta', 'delta', 'full'])
+
+    @override_settings(BOARD_SNAPSHOT_EVERY=5)
+    def test_snapshot_after_every_n_changes(self):
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+        for i in range(11):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, json.dumps({'content': f'N{i}', 'color': '#FFFFFF'}),
+                                 content_type='application/json')
+
+        versions = self.versions()
+        self.assertEqual([version['revision'] for version in versions], [10, 5])
+        self.assertEqual({version['reason'] for version in versions}, {'changes'})
+
+    @override_settings(BOARD_SNAPSHOT_READS=True)
+    def test_board_loads_from_snapshot_and_tail(self):
+        self.autosave([{'content': f'Note {i}', 'color': '#FFEB3B', 'x': i} for i in range(6)])
+        ids = list(self.live_state())
+
+        # Хвост после версии: изменение, удаление и новый стикер
+        self.client.patch(reverse('sticker_detail', args=[ids[0]]), json.dumps({'content': 'Tail'}),
+                          content_type='application/json')
+        self.client.delete(reverse('sticker_detail', args=[ids[1]]))
+        self.client.post(reverse('board_stickers_list_create', args=[self.board.id]),
+                         json.dumps({'content': 'New', 'color': '#FFFFFF'}), content_type='application/json')
+
+        response = self.client.get(reverse('board_stickers_list_create', args=[self.board.id]))
+        self.assertEqual(response.status_code, 200)
+        elements = {
+            element['id']: (element['content'], element['data']['x'], element['data']['y'])
+            for element in response.json()['board']['elements']
+        }
+        self.assertEqual(elements, self.live_state())
+
+    def test_snapshot_reads_keep_z_order(self):
+        self.autosave([
+            {'content': f'Note {i}', 'color': '#FFEB3B', 'z_index': 10 - i} for i in range(6)
+        ])
+        # Перестановка в хвосте после версии: верхний стикер уходит вниз
+        top = Stickers.objects.filter(board_id=self.board).order_by('-z_index').first()
+        self.client.patch(reverse('sticker_detail', args=[top.id]), json.dumps({'z_index': -1}),
+                          content_type='application/json', **self.headers)
+        url = reverse('board_stickers_list_create', args=[self.board.id])
+
+        def stacking():
+            document_cache.clear()
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return [element['id'] for element in response.json()['board']['elements']]
+
+        from_database = stacking()
+        with override_settings(BOARD_SNAPSHOT_READS=True):
+            self.assertEqual(stacking(), from_database)
+        self.assertEqual(
+            from_database,
+            [str(sticker_id) for sticker_id in Stickers.objects.filter(board_id=self.board)
+             .order_by('z_index').values_list('id', flat=True)],
+        )
+
+    @override_settings(BOARD_SNAPSHOT_FULL_EVERY=3)
+    def test_prune_keeps_latest_full_version_and_its_deltas(self):
+        sticker = Stickers.objects.create(board_id=self.board, content='Chain', color='#FFFFFF')
+        for i in range(5):
+            self.autosave([{'id': str(sticker.id), 'content': f'Chain {i}'}])
+        # full, delta, delta, full, delta — все старше окна хранения
+        BoardSnapshot.objects.update(created_at=timezone.now() - timedelta(days=60))
+        self.autosave([{'id': str(sticker.id), 'content': 'Fresh'}])
+
+        out = io.StringIO()
+        call_command('prune_sticker_tombstones', stdout=out)
+
+        self.assertIn('Pruned 3 board snapshots', out.getvalue())
+        kinds = [version['kind'] for version in reversed(self.versions())]
+        self.assertEqual(kinds, ['full', 'delta', 'delta'])
+        with override_settings(BOARD_SNAPSHOT_READS=True):
+            document_cache.clear()
+            response = self.client.get(reverse('board_stickers_list_create', args=[self.board.id]))
+        self.assertEqual([element['content'] for element in response.json()['board']['elements']], ['Fresh'])
+
+    def test_prune_keeps_only_version_of_board(self):
+        self.autosave([{'content': 'Only', 'color': '#FFFFFF'}])
+        BoardSnapshot.objects.update(created_at=timezone.now() - timedelta(days=60))
+
+        call_command('prune_sticker_tombstones', snapshot_days=0, stdout=io.StringIO())
+
+        self.assertEqual(len(self.versions()), 1)
+
+
+class StickersDocumentCacheTestCase(TestCase):
+    """Кеш готовых ответов списка стикеров (stickers.documents)"""
+
+    def setUp(self):
+        document_cache.clear()
+        self.user = User.objects.create(username='documents', password='x')
+        self.board = Boards.objects.create_board(title='Cached', owner=self.user)
+        self.client = Client(**token_headers(self.user))
+        Stickers.objects.create(board_id=self.board, content='One', color='#FFFFFF')
+        self.url = reverse('board_stickers_list_create', args=[self.board.id])
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Content-Type'], 'application/json')
+        # Только чтение доски для ревизии, стикеры не запрашиваются
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(document_cache.stats()['hits'], 1)
+
+    def test_formats_are_cached_separately(self):
+        full = self.client.get(self.url)
+        compact = self.client.get(self.url + '?format=compact')
+        self.assertNotEqual(full.content, compact.content)
+        self.assertEqual(self.client.get(self.url + '?format=compact').content, compact.content)
+
+    def test_sticker_write_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, json.dumps({'content': 'Two', 'color': '#000000'}),
+                             content_type='application/json')
+        self.assertEqual(document_cache.stats()['entries'], 0)
+
+        contents = [element['content'] for element in self.client.get(self.url).json()['board']['elements']]
+        self.assertEqual(sorted(contents), ['One', 'Two'])
+
+    def test_board_update_invalidates(self):
+        self.client.get(self.url)
+        self.client.post(
+            reverse('board_detail_delete', args=[self.board.id]),
+            json.dumps({'title': 'Renamed'}), content_type='application/json',
+            **token_headers(self.user)
+        )
+        self.assertEqual(self.client.get(self.url).json()['board']['title'], 'Renamed')
+
+    @override_settings(STICKER_GEOMETRY_FLUSH_INTERVAL=60)
+    def test_pending_geometry_is_not_cached(self):
+        sticker = Stickers.objects.get(board_id=self.board)
+        self.client.patch(reverse('sticker_detail', args=[sticker.id]), json.dumps({'x': 42}),
+                          content_type='application/json')
+        try:
+            [element] = self.client.get(self.url).json()['board']['elements']
+            self.assertEqual(element['data']['x'], 42)
+            self.assertEqual(document_cache.stats()['entries'], 0)
+        finally:
+            geometry_buffer.clear()
+
+    def test_older_revision_does_not_evict_newer(self):
+        cache = DocumentCache(max_bytes=100)
+        cache.set('a', 2, 'full', b'new')
+        cache.set('a', 2, 'compact', b'NEW')
+        # Медленный запрос закончил чтение ревизии 1 позже
+        cache.set('a', 1, 'full', b'old')
+
+        self.assertEqual(cache.get('a', 2, 'full'), b'new')
+        self.assertEqual(cache.get('a', 2, 'compact'), b'NEW')
+        self.assertIsNone(cache.get('a', 1, 'full'))
+
+    def test_lru_eviction_is_bounded_by_bytes(self):
+        cache = DocumentCache(max_bytes=10)
+        cache.set('a', 1, 'full', b'aaaa')
+        cache.set('b', 1, 'full', b'bbbb')
+        cache.get('a', 1, 'full')
+        cache.set('c', 1, 'full', b'cccc')
+
+        self.assertIsNone(cache.get('b', 1, 'full'))
+        self.assertEqual(cache.get('a', 1, 'full'), b'aaaa')
+        self.assertLessEqual(cache.stats()['bytes'], 10)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        # Новая ревизия доски вытесняет старую
+        cache.set('a', 2, 'full', b'AA')
+        self.assertIsNone(cache.get('a', 1, 'full'))
+
+        cache.set('huge', 1, 'full', b'x' * 11)
+        self.assertIsNone(cache.get('huge', 1, 'full'))
+
+
+@override_settings(STICKER_STREAM_CHUNK_SIZE=3)
+class StickersStreamingTestCase(TestCase):
+    """Потоковая выдача стикеров доски (?stream=json|ndjson)"""
+
+    def setUp(self):
+        document_cache.clear()
+        self.user = User.objects.create(username='streaming', password='x')
+        self.board = Boards.objects.create_board(title='Streamed', owner=self.user)
+        self.client = Client(**token_headers(self.user))
+        Stickers.objects.bulk_create([
+            Stickers(board_id=self.board, content=f'Sticker {i}', color='#FFFFFF', x=i * 10, y=i)
+            for i in range(8)
+        ])
+        self.url = reverse('board_stickers_list_create', args=[self.board.id])
+
+    def test_streamed_json_matches_regular_response(self):
+        regular = self.client.get(self.url)
+        streamed = self.client.get(self.url + '?stream=json')
+
+        self.assertIsInstance(streamed, StreamingHttpResponse)
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        body = b''.join(streamed.streaming_content)
+        self.assertEqual(json.loads(body), regular.json())
+
+    def test_empty_board_streams_valid_json(self):
+        Stickers.objects.filter(board_id=self.board).delete()
+        response = self.client.get(self.url + '?stream=1')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['board']['elements'], [])
+
+    def test_ndjson_lines(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        header = json.loads(lines[0])
+        self.assertEqual(header['board']['id'], str(self.board.id))
+        self.assertNotIn('elements', header['board'])
+        contents = sorted(json.loads(line)['content'] for line in lines[1:])
+        self.assertEqual(contents, sorted(f'Sticker {i}' for i in range(8)))
+
+    def test_ndjson_since_carries_deleted_in_header(self):
+        revision = Boards.objects.get(id=self.board.id).revision
+        with self.captureOnCommitCallbacks(execute=True):
+            sticker = Stickers.objects.filter(board_id=self.board).first()
+            self.client.delete(reverse('sticker_detail', args=[sticker.id]))
+
+        response = self.client.get(self.url + f'?since={revision}&stream=ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['board']['deleted'], [str(sticker.id)])
+        self.assertEqual(len(lines), 1)
+
+    @override_settings(STICKER_GEOMETRY_FLUSH_INTERVAL=60)
+    def test_stream_flushes_pending_geometry(self):
+        sticker = Stickers.objects.filter(board_id=self.board).first()
+        self.client.patch(reverse('sticker_detail', args=[sticker.id]), json.dumps({'x': 999}),
+                          content_type='application/json')
+        try:
+            response = self.client.get(self.url + '?stream=json')
+            elements = json.loads(b''.join(response.streaming_content))['board']['elements']
+        finally:
+            geometry_buffer.clear()
+        self.assertEqual({e['id']: e['data']['x'] for e in elements}[str(sticker.id)], 999)
+        self.assertEqual(Stickers.objects.get(id=sticker.id).x, 999)
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url + '?stream=ndjson')
+        b''.join(response.streaming_content)
+        again = self.client.get(self.url + '?stream=ndjson', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_invalid_stream_mode(self):
+        self.assertEqual(self.client.get(self.url + '?stream=xml').status_code, 400)
+
+
+class StickerSearchTestCase(TestCase):
+    """Полнотекстовый поиск по стикерам (stickers.search)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='searcher', password='x')
+        self.other = User.objects.create(username='stranger', password='x')
+        self.board = Boards.objects.create_board(title='Planning', owner=self.user)
+        self.foreign = Boards.objects.create_board(title='Foreign', owner=self.other)
+        self.sticker = Stickers.objects.create(
+            board_id=self.board, content='Обсудить бюджет проекта', color='#FFFFFF', x=10, y=20
+        )
+        Stickers.objects.create(board_id=self.foreign, content='Бюджет соседей', color='#FFFFFF')
+
+    def search(self, q, user=None, **params):
+        user = user or self.user
+        return self.client.get(reverse('search'), {'q': q, **params}, **token_headers(user))
+
+    def result_ids(self, q, user=None):
+        response = self.search(q, user)
+        self.assertEqual(response.status_code, 200)
+        return [result['id'] for result in response.json()['results']]
+
+    def test_user_without_boards_gets_no_results(self):
+        lonely = User.objects.create(username='lonely', password='x')
+        response = self.search('бюджет', lonely)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_only_member_boards_are_searched(self):
+        response = self.search('бюджет')
+        [result] = response.json()['results']
+        self.assertEqual(result['id'], str(self.sticker.id))
+        self.assertEqual(result['boardId'], str(self.board.id))
+        self.assertEqual(result['boardTitle'], 'Planning')
+        self.assertEqual((result['x'], result['y']), (10, 20))
+
+        Board_Users.objects.create(user_id=self.user, board_id=self.foreign)
+        self.assertEqual(len(self.result_ids('бюджет')), 2)
+
+    def test_match_does_not_grow_with_memberships(self):
+        for i in range(50):
+            Boards.objects.create_board(title=f'Extra {i}', owner=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.result_ids('бюджет'), [str(self.sticker.id)])
+        [sql] = [q['sql'] for q in queries if 'MATCH' in q['sql']]
+        self.assertNotIn(str(self.board.id.hex), sql)
+
+        # Индекс FTS5 отдаёт совпадения уже по rank, доски проверяются списком IN
+        with connection.cursor() as db:
+            db.execute('EXPLAIN QUERY PLAN ' + search_sql(), ['content : ("бюджет"*)', self.user.id.hex, 10])
+            plan = ' '.join(row[-1] for row in db.fetchall())
+        self.assertIn('SCAN stickers_search VIRTUAL TABLE', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_prefix_and_case_insensitive(self):
+        self.assertEqual(self.result_ids('БЮДЖ'), [str(self.sticker.id)])
+        self.assertEqual(self.result_ids('обсуд проект'), [str(self.sticker.id)])
+        self.assertEqual(self.result_ids('обсудить отпуск'), [])
+
+    def test_index_follows_writes(self):
+        url = reverse('sticker_detail', args=[self.sticker.id])
+        self.client.patch(url, json.dumps({'content': 'Купить молоко'}), content_type='application/json',
+                          **token_headers(self.user))
+        self.assertEqual(self.result_ids('бюджет'), [])
+        self.assertEqual(self.result_ids('молоко'), [str(self.sticker.id)])
+
+        Stickers.objects.bulk_create([Stickers(board_id=self.board, content='Молоко и хлеб', color='#FFFFFF')])
+        self.assertEqual(len(self.result_ids('молоко')), 2)
+
+        self.client.delete(url, **token_headers(self.user))
+        self.assertEqual(len(self.result_ids('молоко')), 1)
+
+    def test_board_delete_removes_stickers_from_index(self):
+        self.board.delete()
+        Board_Users.objects.create(user_id=self.user, board_id=self.foreign)
+        self.assertEqual(len(self.result_ids('бюджет')), 1)
+
+    def test_results_are_ranked(self):
+        best = Stickers.objects.create(board_id=self.board, content='Бюджет', color='#FFFFFF')
+        self.assertEqual(self.result_ids('бюджет'), [str(best.id), str(self.sticker.id)])
+
+    @override_settings(STICKER_GEOMETRY_FLUSH_INTERVAL=60)
+    def test_pending_geometry_is_applied(self):
+        self.client.patch(reverse('sticker_detail', args=[self.sticker.id]), json.dumps({'x': 500}),
+                          content_type='application/json', **token_headers(self.user))
+        try:
+            [result] = self.search('бюджет').json()['results']
+        finally:
+            geometry_buffer.clear()
+        self.assertEqual(result['x'], 500)
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self.result_ids('"бюджет (*'), [str(self.sticker.id)])
+        self.assertEqual(self.result_ids('content: NEAR(бюджет)'), [])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.search('').status_code, 400)
+        self.assertEqual(self.search('?!').status_code, 400)
+        self.assertEqual(self.search('бюджет', limit=0).status_code, 400)
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'бюджет'}).status_code, 400)
+
+
+@override_settings(STICKER_STREAM_CHUNK_SIZE=3, BOARD_IMPORT_BATCH_SIZE=4)
+class BoardTransferTestCase(TestCase):
+    """Экспорт и импорт доски в NDJSON (stickers.transfer)"""
+
+    def setUp(self):
+        self.owner = User.objects.create(username='exporter', password='x')
+        self.member = User.objects.create(username='viewer', password='x')
+        self.board = Boards.objects.create_board(title='Backup', owner=self.owner, description='All of it')
+        Board_Users.objects.create(user_id=self.member, board_id=self.board)
+        Stickers.objects.bulk_create([
+            Stickers(board_id=self.board, content=f'Item {i}', color='#00FF00', x=i * 100, y=i, width=80, height=60)
+            for i in range(10)
+        ])
+
+    def export(self, user=None):
+        response = self.client.get(
+            reverse('board_export', args=[self.board.id]), **token_headers((user or self.owner))
+        )
+        return response
+
+    def import_body(self, body, user=None):
+        return self.client.post(
+            reverse('board_import'), body, content_type='application/x-ndjson',
+            **token_headers((user or self.owner))
+        )
+
+    def sticker_state(self, board):
+        return sorted(
+            Stickers.objects.filter(board_id=board).values_list('content', 'color', 'x', 'y', 'width', 'height')
+        )
+
+    def test_export_streams_ndjson(self):
+        response = self.export()
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(records[0]['type'], 'board')
+        self.assertEqual(records[0]['title'], 'Backup')
+        members = {r['username']: r['role'] for r in records if r['type'] == 'member'}
+        self.assertEqual(members, {'exporter': 'owner', 'viewer': 'member'})
+        self.assertEqual(len([r for r in records if r['type'] == 'sticker']), 10)
+
+    def test_export_requires_membership(self):
+        stranger = User.objects.create(username='stranger', password='x')
+        self.assertEqual(self.export(stranger).status_code, 403)
+
+    def test_import_round_trip(self):
+        body = b''.join(self.export().streaming_content)
+        response = self.import_body(body, user=self.member)
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()['report']
+        self.assertEqual(report['stickers'], 10)
+        board = Boards.objects.get(id=response.json()['board']['id'])
+        self.assertNotEqual(board.id, self.board.id)
+        self.assertEqual(board.description, 'All of it')
+        self.assertEqual(self.sticker_state(board), self.sticker_state(self.board))
+        # Импорт через API: владелец — автор запроса, участники из выгрузки не добавляются
+        self.assertEqual(
+            list(Board_Users.objects.filter(board_id=board).values_list('user_id__username', 'role')),
+            [('viewer', 'owner')]
+        )
+        # Ячейки пространственного индекса посчитаны, как при обычном сохранении
+        sticker = Stickers.objects.filter(board_id=board).get(content='Item 7')
+        spatial = (sticker.spatial_level, sticker.tile_x, sticker.tile_y)
+        sticker.save()
+        self.assertEqual((sticker.spatial_level, sticker.tile_x, sticker.tile_y), spatial)
+
+    def test_imported_stickers_are_searchable(self):
+        body = b''.join(self.export().streaming_content)
+        board_id = self.import_body(body, user=self.member).json()['board']['id']
+
+        response = self.client.get(reverse('search'), {'q': 'item'}, **token_headers(self.member))
+        self.assertEqual({r['boardId'] for r in response.json()['results']}, {board_id, str(self.board.id)})
+        self.assertEqual(len(response.json()['results']), 20)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM stickers_search_deferred')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_invalid_sticker_rolls_back_partial_import(self):
+        lines = b''.join(self.export().streaming_content).splitlines()
+        lines.append(json.dumps({'type': 'sticker', 'id': str(uuid.uuid4()), 'content': 'Bad', 'color': 'red'}).encode())
+        boards_before = Boards.objects.count()
+
+        response = self.import_body(b'\n'.join(lines))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Line', response.json()['error'])
+        self.assertEqual(Boards.objects.count(), boards_before)
+        self.assertEqual(Stickers.objects.count(), 10)
+
+    def test_import_rejects_stream_without_board(self):
+        response = self.import_body(json.dumps({'type': 'sticker', 'content': 'x'}))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.import_body('not json').status_code, 400)
+
+    def test_management_commands_keep_ids_and_members(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'board.ndjson')
+        call_command('export_board', str(self.board.id), output=path, stderr=io.StringIO())
+        state = self.sticker_state(self.board)
+        board_id = self.board.id
+        self.board.delete()
+
+        out = io.StringIO()
+        call_command('import_board', path, keep_ids=True, stdout=out)
+
+        self.assertIn('10 stickers, 2 members', out.getvalue())
+        board = Boards.objects.get(id=board_id)
+        self.assertEqual(self.sticker_state(board), state)
+        self.assertEqual(
+            dict(Board_Users.objects.filter(board_id=board).values_list('user_id__username', 'role')),
+            {'exporter': 'owner', 'viewer': 'member'}
+        )
+
+
+class StickerOrderingTestCase(TestCase):
+    """Перемещение стикеров по оси z (stickers.ordering)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='layers', password='x')
+        self.board = Boards.objects.create_board(title='Layers', owner=self.user)
+        self.client = Client(**token_headers(self.user))
+        self.stickers = [
+            Stickers.objects.create(board_id=self.board, content=f'layer {i}', z_index=i * 1024)
+            for i in range(1, 6)
+        ]
+
+    def move(self, sticker, position, target=None):
+        data = {'position': position}
+        if target is not None:
+            data['target'] = str(target.id)
+        return self.client.post(
+            reverse('sticker_order', args=[sticker.id]), json.dumps(data), content_type='application/json'
+        )
+
+    def order(self):
+        return list(Stickers.objects.filter(board_id=self.board).order_by('z_index', 'id'))
+
+    def sticker_updates(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('UPDATE "stickers_stickers"')]
+
+    def test_front_and_back_rewrite_one_row(self):
+        first, last = self.stickers[0], self.stickers[-1]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.move(first, 'front')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['z_index'], last.z_index + 1024)
+        self.assertEqual(len(self.sticker_updates(queries)), 1)
+        self.assertEqual(self.order()[-1].id, first.id)
+
+        self.move(last, 'back')
+        self.assertEqual(self.order()[0].id, last.id)
+
+    def test_already_in_place_is_not_written(self):
+        revision = Boards.objects.get(id=self.board.id).revision
+        self.move(self.stickers[-1], 'front')
+        self.move(self.stickers[2], 'above', self.stickers[1])
+        self.assertEqual(Boards.objects.get(id=self.board.id).revision, revision)
+
+    def test_above_and_below_take_the_middle_of_the_gap(self):
+        moved, target = self.stickers[4], self.stickers[1]
+        self.assertEqual(self.move(moved, 'above', target).json()['z_index'], (2048 + 3072) // 2)
+        self.assertEqual(self.move(moved, 'below', target).json()['z_index'], (1024 + 2048) // 2)
+        self.assertEqual([s.id for s in self.order()][:3], [self.stickers[0].id, moved.id, target.id])
+
+    def test_exhausted_gap_renumbers_the_board(self):
+        Stickers.objects.filter(board_id=self.board).update(z_index=0)
+        moved, target = self.stickers[0], self.stickers[3]
+        # Равные z_index перенумерация сохраняет в порядке вставки
+        before = [s.id for s in self.stickers]
+
+        response = self.move(moved, 'above', target)
+        self.assertEqual(response.status_code, 200)
+
+        after = self.order()
+        expected = [sticker_id for sticker_id in before if sticker_id != moved.id]
+        expected.insert(expected.index(target.id) + 1, moved.id)
+        self.assertEqual([s.id for s in after], expected)
+        self.assertEqual(len({s.z_index for s in after}), len(after))
+        revision = Boards.objects.get(id=self.board.id).revision
+        self.assertTrue(all(s.revision == revision for s in after))
+
+    def test_repeated_inserts_into_one_place_keep_order(self):
+        bottom, top = self.stickers[0], self.stickers[1]
+        for sticker in self.stickers[2:]:
+            for _ in range(6):
+                self.move(sticker, 'above', bottom)
+                self.move(sticker, 'below', top)
+        order = [s.id for s in self.order()]
+        self.assertEqual(order.index(bottom.id), 0)
+        self.assertEqual(order.index(top.id), 4)
+
+    def test_front_uses_board_order_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.move(self.stickers[0], 'front')
+        [sql] = [q['sql'] for q in queries if 'ORDER BY 1 DESC LIMIT 1' in q['sql']]
+        with connection.cursor() as db:
+            db.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(row[-1] for row in db.fetchall())
+        self.assertIn('stickers_board_z_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_invalid_requests(self):
+        sticker = self.stickers[0]
+        self.assertEqual(self.move(sticker, 'top').status_code, 400)
+        self.assertEqual(self.move(sticker, 'above').status_code, 400)
+        self.assertEqual(self.move(sticker, 'above', sticker).status_code, 400)
+        other = Stickers.objects.create(board_id=Boards.objects.create(title='Other'), content='x')
+        self.assertEqual(self.move(sticker, 'above', other).status_code, 404)
+
+    def test_only_members_can_reorder(self):
+        sticker = self.stickers[0]
+        stranger = User.objects.create(username='stranger', password='x')
+        url = reverse('sticker_order', args=[sticker.id])
+        body = json.dumps({'position': 'front'})
+
+        anonymous = Client().post(url, body, content_type='application/json')
+        foreign = Client(**token_headers(stranger)).post(url, body, content_type='application/json')
+
+        self.assertEqual((anonymous.status_code, foreign.status_code), (400, 403))
+        sticker.refresh_from_db()
+        self.assertEqual(sticker.z_index, 1024)
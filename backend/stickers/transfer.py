@@ -0,0 +1,220 @@
+"""
+Экспорт и импорт доски целиком в NDJSON.
+
+Поток — по записи JSON на строку, первая запись — доска:
+    {"type": "board", "format": 1, "id": ..., "title": ..., "description": ...}
+    {"type": "member", "username": ..., "role": "owner"}
+    {"type": "sticker", "id": ..., "content": ..., "color": ..., "x": ..., ...}
+
+Экспорт читает стикеры через .iterator(chunk_size) и кодирует их пачками,
+так что память не растёт с размером доски. Импорт читает поток построчно,
+копит по batch_size стикеров и пишет каждую пачку в отдельной транзакции;
+при ошибке недоимпортированная доска удаляется.
+
+Пачка пишется одним executemany из готовых кортежей, а не bulk_create:
+компиляция INSERT с подготовкой каждого значения в ORM обходится в разы
+дороже самой вставки. По той же причине полнотекстовый индекс строится
+для всей доски в конце (stickers.search.deferred_indexing), а не
+триггером на каждую строку.
+"""
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+from backend.db import atomic_retry, run_atomic
+from backend.responses import dumps
+from boards.models import Boards, Board_Users
+from auth_app.models import User
+from .models import Stickers
+from .search import deferred_indexing
+from .services import normalize_sticker_item
+from .spatial import bucket_for
+from .validation import STICKER_FIELDS, StickerValidationError, clean_new_sticker
+from .writebehind import geometry_buffer
+
+EXPORT_FORMAT = 1
+EXPORT_STICKER_FIELDS = ('id', *STICKER_FIELDS)
+
+# Колонки вставки импорта, в порядке кортежей _sticker_row
+IMPORT_COLUMNS = ('id', 'board_id', 'revision', *STICKER_FIELDS, 'spatial_level', 'tile_x', 'tile_y')
+
+
+class BoardImportError(ValueError):
+    """Некорректный поток импорта; текст ошибки отдаётся клиенту"""
+
+
+def export_board(board, chunk_size=None):
+    """Строки NDJSON (bytes) с доской, участниками и стикерами"""
+    chunk_size = chunk_size or settings.STICKER_STREAM_CHUNK_SIZE
+    # Отложенная геометрия должна попасть в выгрузку
+    geometry_buffer.flush(board_id=board.id)
+
+    yield dumps({
+        'type': 'board',
+        'format': EXPORT_FORMAT,
+        'id': board.id,
+        'title': board.title,
+        'description': board.description,
+        'createdAt': board.created_at,
+    }) + b'\n'
+
+    members = Board_Users.objects.filter(board_id=board).values_list('user_id__username', 'role')
+    for username, role in members.iterator(chunk_size=chunk_size):
+        yield dumps({'type': 'member', 'username': username, 'role': role}) + b'\n'
+
+    stickers = Stickers.objects.filter(board_id=board).values_list(*EXPORT_STICKER_FIELDS)
+    batch = []
+    for row in stickers.iterator(chunk_size=chunk_size):
+        batch.append(dumps({'type': 'sticker', **dict(zip(EXPORT_STICKER_FIELDS, row))}))
+        if len(batch) >= chunk_size:
+            yield b'\n'.join(batch) + b'\n'
+            batch = []
+    if batch:
+        yield b'\n'.join(batch) + b'\n'
+
+
+def read_records(lines):
+    """Записи потока: строки (str или bytes) -> (номер строки, dict)"""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise BoardImportError(f'Line {number}: invalid JSON')
+        if not isinstance(record, dict):
+            raise BoardImportError(f'Line {number}: record must be an object')
+        yield number, record
+
+
+def import_board(lines, owner=None, keep_ids=False, members=True, batch_size=None):
+    """
+    Создать доску из потока export_board.
+    owner — пользователь, который станет владельцем (иначе владелец из потока);
+    members — восстановить участников по username (неизвестные пропускаются);
+    keep_ids — сохранить id доски и стикеров, иначе выдать новые.
+    Возвращает (доска, отчёт со счётчиками и скоростью).
+    """
+    batch_size = batch_size or settings.BOARD_IMPORT_BATCH_SIZE
+    started = time.perf_counter()
+    records = read_records(lines)
+
+    number, header = next(records, (0, None))
+    if header is None or header.get('type') != 'board':
+        raise BoardImportError('Stream must start with a board record')
+    if header.get('format') != EXPORT_FORMAT:
+        raise BoardImportError(f'Unsupported export format: {header.get("format")}')
+
+    board = run_atomic(_create_board, header, keep_ids)
+    try:
+        with deferred_indexing(board.id):
+            count, roles = _import_records(records, board, keep_ids, batch_size)
+        member_count = run_atomic(_add_members, board, owner, roles if members else {})
+    except Exception:
+        board.delete()
+        raise
+
+    elapsed = time.perf_counter() - started
+    return board, {
+        'boardId': board.id,
+        'stickers': count,
+        'members': member_count,
+        'seconds': round(elapsed, 3),
+        'rowsPerSecond': round(count / elapsed) if elapsed else count,
+    }
+
+
+def _create_board(header, keep_ids):
+    board_id = uuid.uuid4()
+    if keep_ids:
+        try:
+            board_id = uuid.UUID(str(header.get('id')))
+        except ValueError:
+            raise BoardImportError('Invalid board ID')
+        if Boards.objects.filter(id=board_id).exists():
+            raise BoardImportError('Board already exists')
+
+    title = header.get('title')
+    if not isinstance(title, str) or not title:
+        raise BoardImportError('Board title is required')
+    return Boards.objects.create(
+        id=board_id, title=title, description=header.get('description') or '', revision=1
+    )
+
+
+def _import_records(records, board, keep_ids, batch_size):
+    """Записать стикеры потока пачками; вернуть их число и роли участников по username"""
+    insert_sql = _insert_sql()
+    board_value = Stickers._meta.get_field('board_id').get_db_prep_save(board.id, connection)
+    roles = {}
+    rows = []
+    count = 0
+    for number, record in records:
+        kind = record.get('type')
+        if kind == 'sticker':
+            rows.append(_sticker_row(number, record, board_value, keep_ids))
+            if len(rows) >= batch_size:
+                _insert_rows(insert_sql, rows)
+                count += len(rows)
+                rows = []
+        elif kind == 'member':
+            roles[record.get('username')] = record.get('role')
+        else:
+            raise BoardImportError(f'Line {number}: unknown record type {kind!r}')
+    if rows:
+        _insert_rows(insert_sql, rows)
+        count += len(rows)
+    return count, roles
+
+
+def _insert_sql():
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(Stickers._meta.get_field(name).column) for name in IMPORT_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(IMPORT_COLUMNS))
+    return f'INSERT INTO {quote(Stickers._meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+
+def _sticker_row(number, record, board_value, keep_ids):
+    """Кортеж значений IMPORT_COLUMNS: те же проверки, что у POST стикера, и ячейка индекса"""
+    try:
+        fields = clean_new_sticker(normalize_sticker_item(record))
+        sticker_id = uuid.UUID(str(record['id'])) if keep_ids else uuid.uuid4()
+    except (StickerValidationError, KeyError, ValueError) as e:
+        raise BoardImportError(f'Line {number}: {e}')
+    bucket = bucket_for(fields['x'], fields['y'], fields['width'], fields['height'])
+    # Стикеры импорта получают ревизию 1 — первую ревизию новой доски
+    return (
+        Stickers._meta.pk.get_db_prep_save(sticker_id, connection), board_value, 1,
+        *(fields[name] for name in STICKER_FIELDS), *bucket,
+    )
+
+
+@atomic_retry
+def _insert_rows(insert_sql, rows):
+    # Вставка по возрастанию ключа меньше перестраивает B-дерево первичного индекса
+    rows.sort()
+    with connection.cursor() as cursor:
+        cursor.executemany(insert_sql, rows)
+
+
+def _add_members(board, owner, roles):
+    """Участники доски: owner (если задан) — владелец, остальные по username из потока"""
+    users = {user.username: user for user in User.objects.filter(username__in=list(roles))}
+    memberships = {}
+    if owner is not None:
+        memberships[owner.id] = Board_Users(user_id=owner, board_id=board, role=Board_Users.ROLE_OWNER)
+    for username, role in roles.items():
+        user = users.get(username)
+        if user is None or user.id in memberships:
+            continue
+        if owner is not None or role not in (Board_Users.ROLE_OWNER, Board_Users.ROLE_MEMBER):
+            role = Board_Users.ROLE_MEMBER
+        memberships[user.id] = Board_Users(user_id=user, board_id=board, role=role)
+    if not memberships:
+        raise BoardImportError('Board has no known owner: pass an owner')
+    Board_Users.objects.bulk_create(memberships.values())
+    return len(memberships)
@@ -0,0 +1,94 @@
+import re
+
+HEX_COLOR_RE = re.compile(r'^#([A-Fa-f0-9]{6})$')
+MAX_CONTENT_LENGTH = 100
+
+# Поля стикера, которые клиент может передавать
+STICKER_FIELDS = ('content', 'color', 'x', 'y', 'width', 'height', 'z_index')
+
+
+class StickerValidationError(ValueError):
+    """Некорректные данные стикера; текст ошибки отдаётся клиенту"""
+
+
+def clean_new_sticker(data):
+    """
+    Проверить данные нового стикера (правила POST /boards/{boardId}/stickers).
+    Возвращает словарь со всеми полями стикера с подставленными значениями по умолчанию.
+    """
+    content = data.get('content', '')
+    color = data.get('color', '#FFFF99')  # Default to yellow if not provided
+
+    if not content:
+        raise StickerValidationError('Content is required')
+
+    if not isinstance(content, str):
+        raise StickerValidationError('Content must be a string')
+
+    if len(content) > MAX_CONTENT_LENGTH:
+        raise StickerValidationError('Content exceeds maximum length of 100 characters')
+
+    if not isinstance(color, str) or not HEX_COLOR_RE.match(color):
+        raise StickerValidationError('Color must be in hex format (e.g., #FF0000)')
+
+    try:
+        width = int(data.get('width', 100))
+        height = int(data.get('height', 100))
+        x = int(data.get('x', 0))
+        y = int(data.get('y', 0))
+        z_index = int(data.get('z_index', 0))
+    except (ValueError, TypeError):
+        raise StickerValidationError('Width, height, x, y, and z_index must be integers')
+
+    if width <= 0 or height <= 0:
+        raise StickerValidationError('Width and height must be positive integers')
+
+    return {
+        'content': content,
+        'color': color,
+        'x': x,
+        'y': y,
+        'width': width,
+        'height': height,
+        'z_index': z_index,
+    }
+
+
+def clean_sticker_patch(data):
+    """
+    Проверить частичное изменение стикера (правила PATCH /stickers/{stickerId}).
+    Возвращает словарь только с переданными полями.
+    """
+    cleaned = {}
+
+    content = data.get('content')
+    if content is not None:
+        if not isinstance(content, str):
+            raise StickerValidationError('Content must be a string')
+        if len(content) > MAX_CONTENT_LENGTH:
+            raise StickerValidationError('Content exceeds maximum length of 100 characters')
+        cleaned['content'] = content
+
+    color = data.get('color')
+    if color is not None:
+        if not isinstance(color, str) or not HEX_COLOR_RE.match(color):
+            raise StickerValidationError('Color must be in hex format (e.g., #FF0000)')
+        cleaned['color'] = color
+
+    try:
+        numbers = {
+            name: int(data[name])
+            for name in ('width', 'height', 'x', 'y', 'z_index')
+            if data.get(name) is not None
+        }
+    except (ValueError, TypeError):
+        raise StickerValidationError('Width, height, x, y, and z_index must be integers')
+
+    if numbers.get('width', 1) <= 0:
+        raise StickerValidationError('Width must be a positive integer')
+
+    if numbers.get('height', 1) <= 0:
+        raise StickerValidationError('Height must be a positive integer')
+
+    cleaned.update(numbers)
+    return cleaned
@@ -1,58 +1,404 @@
-from django.http import JsonResponse
+import hashlib
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 import json
-import re
-from .models import Stickers
-from boards.models import Boards
+from .documents import document_cache
+from .models import Stickers, StickerTombstone
+from .services import (
+    apply_sticker_operations, buffer_sticker_geometry, create_sticker, delete_sticker,
+    sticker_to_dict, update_sticker,
+)
+from .ordering import move_sticker, parse_order
+from .search import SearchQueryError, parse_limit, search_stickers
+from .snapshots import load_board_state, rows_to_stickers
+from .spatial import viewport_q
+from .transfer import BoardImportError, export_board, import_board
+from .writebehind import GEOMETRY_FIELDS, geometry_buffer
+from .validation import StickerValidationError, clean_new_sticker, clean_sticker_patch
+from backend.db import DatabaseBusy, busy_response
+from backend.responses import JsonResponse, dumps
+from boards.models import Boards, Board_Users
+from boards.views import board_access_error, get_request_user, get_user_id_from_request
+from auth_app.models import User
+
+
+VIEWPORT_PARAMS = ('x', 'y', 'width', 'height')
+
+
+def sticker_to_element(sticker):
+    """Стикер в формате элемента доски, ожидаемом фронтендом"""
+    return {
+        'id': str(sticker.id),
+        'type': 'sticker',
+        'content': sticker.content,
+        'style': {
+            'backgroundColor': sticker.color,
+            'left': f'{sticker.x}px',
+            'top': f'{sticker.y}px',
+            'width': f'{sticker.width}px',
+            'height': f'{sticker.height}px',
+            'zIndex': sticker.z_index
+        },
+        'data': {
+            'color': sticker.color,
+            'x': sticker.x,
+            'y': sticker.y,
+            'width': sticker.width,
+            'height': sticker.height,
+            'zIndex': sticker.z_index
+        }
+    }
+
+
+COMPACT_FORMAT = 'compact'
+COMPACT_CONTENT_TYPE = 'application/vnd.miro.compact+json'
+
+# Колонки компактного формата: ключ ответа -> поле модели
+COMPACT_COLUMNS = (
+    ('ids', 'id'),
+    ('xs', 'x'),
+    ('ys', 'y'),
+    ('widths', 'width'),
+    ('heights', 'height'),
+    ('colors', 'color'),
+    ('zIndexes', 'z_index'),
+    ('contents', 'content'),
+)
+
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+STREAM_MODES = ('json', 'ndjson')
+
+
+def stream_mode(request):
+    """
+    Потоковая выдача: ?stream=json|ndjson (?stream=1 — json)
+    или Accept: application/x-ndjson. None — обычный ответ.
+    """
+    mode = request.GET.get('stream')
+    if mode is None:
+        return 'ndjson' if NDJSON_CONTENT_TYPE in request.headers.get('Accept', '') else None
+    if mode in ('1', 'true'):
+        return 'json'
+    if mode not in STREAM_MODES:
+        raise ValueError('stream must be json or ndjson')
+    return mode
+
+
+def response_format(request):
+    """Формат списка стикеров: ?format=compact или Accept с компактным типом"""
+    if request.GET.get('format') == COMPACT_FORMAT:
+        return COMPACT_FORMAT
+    if COMPACT_CONTENT_TYPE in request.headers.get('Accept', ''):
+        return COMPACT_FORMAT
+    return 'full'
+
+
+def stickers_to_columns(stickers):
+    """
+    Стикеры в виде параллельных массивов по полям, без CSS-строк.
+    Queryset читается кортежами через values_list, не создавая объекты моделей.
+    """
+    fields = [field for _, field in COMPACT_COLUMNS]
+    if isinstance(stickers, list):
+        rows = [tuple(getattr(sticker, field) for field in fields) for sticker in stickers]
+    else:
+        rows = stickers.values_list(*fields)
+    return rows_to_columns(rows)
+
+
+def overlay_pending_geometry(stickers, pending, viewport=None):
+    """
+    Наложить отложенную геометрию (stickers.writebehind) на выборку стикеров.
+    Отложенные стикеры, которых нет в выборке, догружаются: по вьюпорту —
+    только пересекающие его, иначе все (для ?since= они считаются изменёнными).
+    Возвращает список стикеров.
+    """
+    stickers = list(stickers)
+    seen = {sticker.id for sticker in stickers}
+    missing = [
+        sticker_id for sticker_id, geometry in pending.items()
+        if sticker_id not in seen and (viewport is None or geometry.intersects(*viewport))
+    ]
+    if missing:
+        stickers.extend(Stickers.objects.filter(id__in=missing))
+
+    for sticker in stickers:
+        geometry = pending.get(sticker.id)
+        if geometry is not None:
+            geometry.apply_to(sticker)
+
+    if viewport is not None:
+        x, y, width, height = viewport
+        stickers = [
+            sticker for sticker in stickers
+            if sticker.x < x + width and sticker.x + sticker.width > x
+            and sticker.y < y + height and sticker.y + sticker.height > y
+        ]
+    return stickers
+
+
+def rows_to_columns(rows):
+    """Транспонировать строки (в порядке COMPACT_COLUMNS) в колонки"""
+    columns = [list(column) for column in zip(*rows)] or [[] for _ in COMPACT_COLUMNS]
+    columns[0] = [str(sticker_id) for sticker_id in columns[0]]
+    return {name: column for (name, _), column in zip(COMPACT_COLUMNS, columns)}
+
+
+def board_etag(board, request, fmt):
+    """
+    ETag списка стикеров: ревизия доски плюс хеш query параметров и формата,
+    так как вьюпорт и формат меняют содержимое ответа.
+    """
+    tag = str(board.revision)
+    query = request.GET.urlencode()
+    if fmt != 'full':
+        query += '&' + fmt
+    if query:
+        tag += '-' + hashlib.md5(query.encode()).hexdigest()[:12]
+    # Отложенная геометрия ещё не подняла ревизию, но уже видна в ответе
+    pending_version = geometry_buffer.board_version(board.id)
+    if pending_version is not None:
+        tag += f'.{pending_version}'
+    return quote_etag(tag)
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def parse_since(request):
+    """Прочитать необязательную ревизию ?since= для дельта-синхронизации"""
+    since = request.GET.get('since')
+    if since is None:
+        return None
+    try:
+        since = int(since)
+    except ValueError:
+        raise ValueError('since must be a non-negative integer')
+    if since < 0:
+        raise ValueError('since must be a non-negative integer')
+    return since
+
+
+def parse_viewport(request):
+    """
+    Прочитать необязательный прямоугольник вьюпорта из query параметров.
+    Возвращает (x, y, width, height), None если вьюпорт не передан,
+    или бросает ValueError при неполных/некорректных параметрах.
+    """
+    values = [request.GET.get(name) for name in VIEWPORT_PARAMS]
+    if all(value is None for value in values):
+        return None
+    if any(value is None for value in values):
+        raise ValueError('Viewport requires x, y, width and height')
+
+    try:
+        x, y, width, height = (int(value) for value in values)
+    except ValueError:
+        raise ValueError('Viewport x, y, width and height must be integers')
+
+    if width <= 0 or height <= 0:
+        raise ValueError('Viewport width and height must be positive integers')
+
+    return x, y, width, height
+
+
+def stream_chunks(board_data, stickers, mode):
+    """
+    Закодированные куски ответа: стикеры читаются через .iterator(chunk_size)
+    и кодируются пачками, так что в памяти не больше одной пачки.
+    json — тот же документ, что и обычный ответ; ndjson — строка с доской,
+    затем по строке на элемент.
+    """
+    chunk_size = settings.STICKER_STREAM_CHUNK_SIZE
+
+    if mode == 'ndjson':
+        yield dumps({'board': board_data}) + b'\n'
+    else:
+        # elements — последний ключ: документ режется перед закрывающими скобками
+        yield dumps({'board': {**board_data, 'elements': []}})[:-len(b']}}')]
+
+    batch = []
+    first = True
+    for sticker in stickers.iterator(chunk_size=chunk_size):
+        batch.append(sticker_to_element(sticker))
+        if len(batch) >= chunk_size:
+            yield encode_batch(batch, mode, first)
+            batch = []
+            first = False
+    if batch:
+        yield encode_batch(batch, mode, first)
+
+    if mode != 'ndjson':
+        yield b']}}'
+
+
+def encode_batch(elements, mode, first):
+    if mode == 'ndjson':
+        return b'\n'.join(dumps(element) for element in elements) + b'\n'
+    # Массив без скобок — элементы через запятую, как в обычном ответе
+    body = dumps(elements)[1:-1]
+    return body if first else b',' + body
+
+
+async def aiter_chunks(chunks):
+    """Асинхронная обёртка для ASGI: иначе Django соберёт весь поток в память"""
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def stream_response(request, chunks, content_type):
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_chunks(chunks)
+    return StreamingHttpResponse(chunks, content_type=content_type)
+
+
+def streaming_response(request, board_data, stickers, mode):
+    content_type = NDJSON_CONTENT_TYPE if mode == 'ndjson' else 'application/json'
+    return stream_response(request, stream_chunks(board_data, stickers, mode), content_type)
+
+
+def stickers_response(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Accept'
+    return response
+
+
+def board_editor_error(request, board):
+    """
+    Проверить, что автор запроса может менять стикеры доски (Board_Users.EDITOR_ROLES).
+    Возвращает JsonResponse с ошибкой или None.
+    """
+    user_id = get_user_id_from_request(request)
+    if not user_id:
+        return JsonResponse({'error': 'User ID required'}, status=400)
+    return board_access_error(user_id, board, roles=Board_Users.EDITOR_ROLES)
 
 
 def board_stickers(request, board_id):
     """
     Обрабатывает GET и POST запросы для /boards/{boardId}/stickers
     GET: Получить все стикеры доски с информацией о доске
+         ?x=&y=&width=&height= — только стикеры, пересекающие вьюпорт
+         ?since=<revision> — только изменённые после ревизии стикеры и id удалённых
+         ?format=compact (или Accept: application/vnd.miro.compact+json) —
+         параллельные массивы по полям вместо элементов
+         ?stream=json|ndjson (или Accept: application/x-ndjson) — потоковая
+         выдача элементов пачками, память не растёт с размером доски
     POST: Добавить стикер
     """
     if request.method == 'GET':
         try:
+            try:
+                viewport = parse_viewport(request)
+                since = parse_since(request)
+                stream = stream_mode(request)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+            if since is not None and viewport is not None:
+                return JsonResponse({'error': 'since cannot be combined with a viewport'}, status=400)
+
+            geometry_buffer.flush_due()
+
             board = get_object_or_404(Boards, id=board_id)
 
-            stickers = Stickers.objects.filter(board_id=board_id)
-
-            # Преобразуем стикеры в формат, ожидаемый фронтендом
-            elements = []
-            for sticker in stickers:
-                elements.append({
-                    'id': str(sticker.id),
-                    'type': 'sticker',
-                    'content': sticker.content,
-                    'style': {
-                        'backgroundColor': sticker.color,
-                        'left': f'{sticker.x}px',
-                        'top': f'{sticker.y}px',
-                        'width': f'{sticker.width}px',
-                        'height': f'{sticker.height}px',
-                        'zIndex': sticker.z_index
-                    },
-                    'data': {
-                        'color': sticker.color,
-                        'x': sticker.x,
-                        'y': sticker.y,
-                        'width': sticker.width,
-                        'height': sticker.height,
-                        'zIndex': sticker.z_index
-                    }
-                })
+            fmt = response_format(request)
+            if fmt == COMPACT_FORMAT:
+                # Колонки не выдать по строкам; компактный ответ и так невелик
+                stream = None
+            if stream is not None:
+                # Поток читает стикеры прямо из БД — отложенная геометрия должна быть там
+                if geometry_buffer.flush(board_id=board.id):
+                    board.refresh_from_db(fields=['revision'])
+                if stream == 'ndjson':
+                    fmt = stream
+
+            # Доска не менялась — отвечаем 304, не загружая стикеры
+            etag = board_etag(board, request, fmt)
+            if etag_matches(request, etag):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                response['Vary'] = 'Accept'
+                return response
+
+            # Полная доска без отложенной геометрии — отдаём готовые байты, если они есть
+            cacheable = (
+                since is None and viewport is None and stream is None
+                and geometry_buffer.board_version(board.id) is None
+            )
+            body = document_cache.get(board.id, board.revision, fmt) if cacheable else None
+            if body is not None:
+                return stickers_response(HttpResponse(body, content_type='application/json'), etag)
+
+            board_data = {
+                'id': str(board.id),
+                'title': board.title,
+                'description': board.description,
+                'revision': board.revision,
+            }
+
+            if since is not None and since >= board.pruned_revision:
+                # Только изменения после ревизии since и надгробия удалённых
+                stickers = Stickers.objects.filter(board_id=board_id, revision__gt=since)
+                board_data['since'] = since
+                board_data['reset'] = False
+                board_data['deleted'] = [
+                    str(sticker_id) for sticker_id in StickerTombstone.objects.filter(
+                        board_id=board_id, revision__gt=since
+                    ).values_list('sticker_id', flat=True)
+                ]
+            elif viewport is not None:
+                stickers = Stickers.objects.filter(viewport_q(board.id, *viewport))
+            else:
+                # В порядке отрисовки, по индексу stickers_board_z_idx
+                stickers = Stickers.objects.filter(board_id=board_id).order_by('z_index')
+                if settings.BOARD_SNAPSHOT_READS and stream is None:
+                    # Последняя версия доски и хвост изменений после неё
+                    rows = load_board_state(board)
+                    if rows is not None:
+                        stickers = rows_to_stickers(rows, board.id)
+                if since is not None:
+                    # Надгробия за этот период уже вычищены — клиент заменяет доску целиком
+                    board_data['since'] = since
+                    board_data['reset'] = True
+                    board_data['deleted'] = []
+
+            if stream is not None:
+                return stickers_response(streaming_response(request, board_data, stickers, stream), etag)
+
+            pending = geometry_buffer.pending_for_board(board.id)
+            if pending:
+                stickers = overlay_pending_geometry(stickers, pending, viewport)
+
+            if fmt == COMPACT_FORMAT:
+                board_data['format'] = COMPACT_FORMAT
+                board_data['stickers'] = stickers_to_columns(stickers)
+            else:
+                # Преобразуем стикеры в формат, ожидаемый фронтендом
+                board_data['elements'] = [sticker_to_element(sticker) for sticker in stickers]
 
             # Возвращаем данные в формате, ожидаемом фронтендом
-            return JsonResponse({
-                'board': {
-                    'id': str(board.id),
-                    'title': board.title,
-                    'description': board.description,
-                    'elements': elements
-                }
-            }, status=200)
+            response = JsonResponse({'board': board_data}, status=200)
+            if cacheable:
+                document_cache.set(board.id, board.revision, fmt, response.content)
+            return stickers_response(response, etag)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
@@ -60,60 +406,20 @@ def board_stickers(request, board_id):
         try:
             data = json.loads(request.body)
 
-            content = data.get('content', '')
-            color = data.get('color', '#FFFF99')  # Default to yellow if not provided
-            width = data.get('width', 100)
-            height = data.get('height', 100)
-            x = data.get('x', 0)
-            y = data.get('y', 0)
-            z_index = data.get('z_index', 0)
-
-            if not content:
-                return JsonResponse({'error': 'Content is required'}, status=400)
-
-            if len(content) > 100:
-                return JsonResponse({'error': 'Content exceeds maximum length of 100 characters'}, status=400)
-
-            if not re.match(r'^#([A-Fa-f0-9]{6})$', color):
-                return JsonResponse({'error': 'Color must be in hex format (e.g., #FF0000)'}, status=400)
-
             try:
-                width = int(width)
-                height = int(height)
-                x = int(x)
-                y = int(y)
-                z_index = int(z_index)
-
-                if width <= 0 or height <= 0:
-                    return JsonResponse({'error': 'Width and height must be positive integers'}, status=400)
-            except ValueError:
-                return JsonResponse({'error': 'Width, height, x, y, and z_index must be integers'}, status=400)
+                fields = clean_new_sticker(data)
+            except StickerValidationError as e:
+                return JsonResponse({'error': str(e)}, status=400)
 
             board = get_object_or_404(Boards, id=board_id)
 
-            sticker = Stickers.objects.create(
-                content=content,
-                color=color,
-                width=width,
-                height=height,
-                x=x,
-                y=y,
-                z_index=z_index,
-                board_id=board
-            )
+            sticker = create_sticker(board, fields)
 
-            return JsonResponse({
-                'id': str(sticker.id),
-                'content': sticker.content,
-                'color': sticker.color,
-                'x': sticker.x,
-                'y': sticker.y,
-                'width': sticker.width,
-                'height': sticker.height,
-                'z_index': sticker.z_index
-            }, status=201)
+            return JsonResponse(sticker_to_dict(sticker), status=201)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
@@ -123,82 +429,230 @@ def sticker_detail(request, sticker_id):
     Обрабатывает PATCH and DELETE запросы для /stickers/{stickerId}
     PATCH: Изменить стикер (размер, цвет, текст, позиция)
     DELETE: Удалить стикер
+    Только для участников доски стикера.
     """
     if request.method == 'PATCH':
         try:
             data = json.loads(request.body)
 
-            content = data.get('content')
-            color = data.get('color')
-            width = data.get('width')
-            height = data.get('height')
-            x = data.get('x')
-            y = data.get('y')
-            z_index = data.get('z_index')
-
-            sticker = get_object_or_404(Stickers, id=sticker_id)
-
-            if content is not None:
-                if len(content) > 100:
-                    return JsonResponse({'error': 'Content exceeds maximum length of 100 characters'}, status=400)
-                sticker.content = content
-
-            # Validate color if provided
-            if color is not None:
-                if not re.match(r'^#([A-Fa-f0-9]{6})$', color):
-                    return JsonResponse({'error': 'Color must be in hex format (e.g., #FF0000)'}, status=400)
-                sticker.color = color
-
-            if width is not None or height is not None or x is not None or y is not None or z_index is not None:
-                try:
-                    if width is not None:
-                        width = int(width)
-                        if width <= 0:
-                            return JsonResponse({'error': 'Width must be a positive integer'}, status=400)
-                        sticker.width = width
-
-                    if height is not None:
-                        height = int(height)
-                        if height <= 0:
-                            return JsonResponse({'error': 'Height must be a positive integer'}, status=400)
-                        sticker.height = height
-
-                    if x is not None:
-                        sticker.x = int(x)
-
-                    if y is not None:
-                        sticker.y = int(y)
-
-                    if z_index is not None:
-                        sticker.z_index = int(z_index)
-
-                except ValueError:
-                    return JsonResponse({'error': 'Width, height, x, y, and z_index must be integers'}, status=400)
-
-            sticker.save()
-
-            return JsonResponse({
-                'id': str(sticker.id),
-                'content': sticker.content,
-                'color': sticker.color,
-                'x': sticker.x,
-                'y': sticker.y,
-                'width': sticker.width,
-                'height': sticker.height,
-                'z_index': sticker.z_index
-            }, status=200)
+            try:
+                fields = clean_sticker_patch(data)
+            except StickerValidationError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+            sticker = get_object_or_404(Stickers.objects.select_related('board_id'), id=sticker_id)
+            error = board_editor_error(request, sticker.board_id)
+            if error is not None:
+                return error
+
+            # Только координаты/размеры — откладываем запись (перетаскивание)
+            if fields and set(fields) <= set(GEOMETRY_FIELDS) and geometry_buffer.enabled():
+                return JsonResponse(sticker_to_dict(buffer_sticker_geometry(sticker, fields)), status=200)
+
+            # Отложенная геометрия стикера записывается до полного сохранения
+            if geometry_buffer.flush(sticker_id=sticker.id):
+                sticker.refresh_from_db()
+
+            update_sticker(sticker, fields)
+
+            return JsonResponse(sticker_to_dict(sticker), status=200)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
     elif request.method == 'DELETE':
         try:
-            sticker = get_object_or_404(Stickers, id=sticker_id)
-            sticker.delete()
+            sticker = get_object_or_404(Stickers.objects.select_related('board_id'), id=sticker_id)
+            error = board_editor_error(request, sticker.board_id)
+            if error is not None:
+                return error
+
+            delete_sticker(sticker)
 
             return JsonResponse({'message': 'Sticker deleted successfully'}, status=204)
         except Stickers.DoesNotExist:
             return JsonResponse({'error': 'Sticker not found'}, status=404)
+        except DatabaseBusy:
+            return busy_response()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+
+def sticker_order(request, sticker_id):
+    """
+    Обрабатывает POST запросы для /stickers/{stickerId}/order
+    {"position": "front"} или "back" — поверх всех / под всеми стикерами доски
+    {"position": "above", "target": "..."} или "below" — сразу над / под стикером target
+    Меняется только z_index перемещаемого стикера (см. stickers.ordering).
+    Только для участников доски стикера.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+
+        try:
+            position, target_id = parse_order(data)
+        except StickerValidationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        sticker = get_object_or_404(Stickers.objects.select_related('board_id'), id=sticker_id)
+        error = board_editor_error(request, sticker.board_id)
+        if error is not None:
+            return error
+
+        try:
+            sticker = move_sticker(sticker, position, target_id)
+        except Stickers.DoesNotExist:
+            return JsonResponse({'error': 'Target sticker not found'}, status=404)
+        except StickerValidationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse(sticker_to_dict(sticker), status=200)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except DatabaseBusy:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def board_stickers_batch(request, board_id):
+    """
+    Обрабатывает POST запросы для /boards/{boardId}/stickers/batch
+    {
+        "operations": [
+            {"op": "create", "data": {...}},
+            {"op": "patch", "id": "...", "data": {...}},
+            {"op": "delete", "id": "..."}
+        ]
+    }
+    Операции применяются атомарно: либо все, либо ни одной.
+    Если пакет отклонён, корректные операции получают статус 424.
+    Только для участников доски.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+
+        board = get_object_or_404(Boards, id=board_id)
+        error = board_editor_error(request, board)
+        if error is not None:
+            return error
+
+        try:
+            applied, results = apply_sticker_operations(board, data.get('operations'))
+        except StickerValidationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        for result in results:
+            sticker = result.pop('sticker', None)
+            if sticker is not None and applied:
+                result['sticker'] = sticker_to_dict(sticker)
+
+        return JsonResponse({'applied': applied, 'results': results}, status=200 if applied else 400)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except DatabaseBusy:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def sticker_search(request):
+    """
+    Обрабатывает GET /search?q=
+    Полнотекстовый поиск по стикерам досок, где состоит пользователь.
+    ?limit= — число результатов
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        user_id = get_user_id_from_request(request)
+        if not user_id:
+            return JsonResponse({'error': 'User ID required'}, status=400)
+
+        query = request.GET.get('q', '')
+        try:
+            stickers = search_stickers(user_id, query, limit=parse_limit(request.GET.get('limit')))
+        except SearchQueryError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        results = []
+        for sticker in stickers:
+            result = sticker_to_dict(sticker)
+            result['boardId'] = str(sticker.board_id_id)
+            result['boardTitle'] = sticker.board_title
+            # bm25 отрицательный: чем меньше, тем лучше; наружу — чем больше, тем лучше
+            result['score'] = -sticker.score
+            results.append(result)
+
+        return JsonResponse({'query': query, 'results': results}, status=200)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def board_export(request, board_id):
+    """
+    Обрабатывает GET /boards/{boardId}/export
+    Потоковая выгрузка доски, участников и стикеров в NDJSON (stickers.transfer)
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        user_id = get_user_id_from_request(request)
+        if not user_id:
+            return JsonResponse({'error': 'User ID required'}, status=400)
+
+        board = get_object_or_404(Boards, id=board_id)
+        error = board_access_error(user_id, board)
+        if error is not None:
+            return error
+
+        response = stream_response(request, export_board(board), NDJSON_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="board-{board.id}.ndjson"'
+        return response
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def board_import(request):
+    """
+    Обрабатывает POST /boards/import
+    Создаёт доску из NDJSON-выгрузки; владелец — автор запроса.
+    Тело читается построчно, стикеры пишутся пачками.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        # Пользователь только из токена, заголовка или query: тело — поток выгрузки
+        user_id = get_user_id_from_request(request, read_body=False)
+        if not user_id:
+            return JsonResponse({'error': 'User ID required'}, status=400)
+
+        try:
+            user = get_request_user(request, user_id)
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'User not found'}, status=404)
+
+        try:
+            board, report = import_board(request, owner=user, members=False)
+        except BoardImportError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse({'board': {'id': board.id, 'title': board.title}, 'report': report}, status=201)
+    except DatabaseBusy:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
@@ -0,0 +1,235 @@
+"""
+Буфер отложенной записи координат и размеров стикеров.
+
+Во время перетаскивания клиент шлёт PATCH {x, y} на каждое движение.
+Такие PATCH не пишут в БД сразу: последние значения по каждому стикеру
+копятся в памяти процесса и сбрасываются пачкой (bulk_update, одна
+ревизия на доску) раз в STICKER_GEOMETRY_FLUSH_INTERVAL секунд и при
+завершении процесса. Чтения board_stickers накладывают буфер поверх
+данных из БД.
+
+Буфер свой у каждого процесса: наложение видят только чтения в том же
+процессе, другие воркеры отдают данные из БД, пока буфер не сброшен.
+Поэтому отложенное перемещение видно лишь на воркере, принявшем PATCH,
+не дольше STICKER_GEOMETRY_FLUSH_INTERVAL секунд.
+
+Фоновый поток сброса запускается из backend/wsgi.py и backend/asgi.py.
+Без него (тесты, management-команды) просроченный буфер сбрасывается
+на следующем запросе, который пишет в буфер или читает доску.
+"""
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connections
+
+from backend.db import atomic_retry
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY_FIELDS = ('x', 'y', 'width', 'height')
+
+
+@dataclass
+class PendingGeometry:
+    sticker_id: object
+    board_id: object
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def intersects(self, x, y, width, height):
+        return (
+            self.x < x + width and self.x + self.width > x
+            and self.y < y + height and self.y + self.height > y
+        )
+
+    def apply_to(self, sticker):
+        for name in GEOMETRY_FIELDS:
+            setattr(sticker, name, getattr(self, name))
+
+
+class GeometryBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Сериализует запись в БД: сброс буфера и сброс одного стикера
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        # Доска -> номер последнего изменения буфера по ней (см. board_version).
+        # Номера берутся из общего счётчика и не повторяются, поэтому запись
+        # доски удаляется, как только по ней ничего не ждёт записи
+        self._board_versions = {}
+        self._sequence = 0
+        self._oldest = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def interval(self):
+        return settings.STICKER_GEOMETRY_FLUSH_INTERVAL
+
+    def enabled(self):
+        return self.interval > 0
+
+    def add(self, sticker_id, board_id, geometry):
+        """Запомнить последнюю геометрию стикера; вернуть PendingGeometry"""
+        pending = PendingGeometry(sticker_id, board_id, **geometry)
+        with self._lock:
+            self._pending[sticker_id] = pending
+            self._sequence += 1
+            self._board_versions[board_id] = self._sequence
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+        return pending
+
+    def get(self, sticker_id):
+        with self._lock:
+            return self._pending.get(sticker_id)
+
+    def pending_for_board(self, board_id):
+        with self._lock:
+            return {
+                sticker_id: pending
+                for sticker_id, pending in self._pending.items()
+                if pending.board_id == board_id
+            }
+
+    def board_version(self, board_id):
+        """Номер последнего изменения буфера по доске или None, если по доске ничего не ждёт записи"""
+        with self._lock:
+            if not any(pending.board_id == board_id for pending in self._pending.values()):
+                return None
+            return self._board_versions.get(board_id)
+
+    def clear(self):
+        """Забыть все отложенные записи, не сохраняя их"""
+        with self._flush_lock, self._lock:
+            self._pending.clear()
+            self._board_versions.clear()
+            self._oldest = None
+
+    def discard(self, sticker_id):
+        with self._flush_lock, self._lock:
+            pending = self._pending.pop(sticker_id, None)
+            if pending is not None:
+                self._forget_idle_boards({pending.board_id})
+
+    def _forget_idle_boards(self, board_ids):
+        """Убрать номера досок, по которым ничего не ждёт записи; вызывается под _lock"""
+        busy = {pending.board_id for pending in self._pending.values()}
+        for board_id in board_ids - busy:
+            self._board_versions.pop(board_id, None)
+
+    def flush_due(self):
+        """Сбросить буфер, если самая старая запись ждёт дольше интервала"""
+        with self._lock:
+            due = self._oldest is not None and time.monotonic() - self._oldest >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self, board_id=None, sticker_id=None):
+        """
+        Записать отложенную геометрию в БД: всю, по одной доске или по одному стикеру.
+        Возвращает количество записанных стикеров.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if sticker_id is not None:
+                    taken = [self._pending.pop(sticker_id)] if sticker_id in self._pending else []
+                elif board_id is not None:
+                    taken = [
+                        self._pending.pop(key) for key, pending in list(self._pending.items())
+                        if pending.board_id == board_id
+                    ]
+                else:
+                    taken = list(self._pending.values())
+                    self._pending.clear()
+                if not self._pending:
+                    self._oldest = None
+
+            if not taken:
+                return 0
+
+            try:
+                write_geometry(taken)
+            except Exception:
+                logger.exception('Failed to flush sticker geometry, requeueing %d stickers', len(taken))
+                with self._lock:
+                    for pending in taken:
+                        # Более свежие значения, пришедшие во время записи, не затираем
+                        self._pending.setdefault(pending.sticker_id, pending)
+                    if self._oldest is None:
+                        self._oldest = time.monotonic()
+                raise
+            with self._lock:
+                self._forget_idle_boards({pending.board_id for pending in taken})
+            return len(taken)
+
+    def start(self):
+        """Запустить фоновый сброс и сброс при завершении процесса"""
+        if self._thread is not None or not self.enabled():
+            return
+        self._thread = threading.Thread(target=self._run, name='sticker-geometry-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush_due()
+            except Exception:
+                # Уже залогировано, записи вернулись в буфер
+                pass
+            finally:
+                connections.close_all()
+
+
+@atomic_retry
+def write_geometry(entries):
+    """Записать геометрию пачкой: одна ревизия и одно событие на доску"""
+    from boards.broker import broker
+    from boards.models import Boards
+    from .models import Stickers
+    from .services import board_changed
+
+    by_board = {}
+    for pending in entries:
+        by_board.setdefault(pending.board_id, []).append(pending)
+
+    for board_id, board_entries in by_board.items():
+        revision = Boards.objects.bump_revision(board_id)
+        stickers = []
+        for pending in board_entries:
+            sticker = Stickers(id=pending.sticker_id, board_id_id=board_id, revision=revision)
+            pending.apply_to(sticker)
+            sticker.update_spatial_bucket()
+            stickers.append(sticker)
+        Stickers.objects.bulk_update(
+            stickers,
+            GEOMETRY_FIELDS + ('spatial_level', 'tile_x', 'tile_y', 'revision'),
+            batch_size=500
+        )
+        broker.publish_on_commit(str(board_id), {
+            'type': 'stickers.moved',
+            'boardId': str(board_id),
+            'revision': revision,
+            'stickers': [
+                {'id': str(pending.sticker_id), **{name: getattr(pending, name) for name in GEOMETRY_FIELDS}}
+                for pending in board_entries
+            ],
+        })
+        board_changed(board_id, revision)
+
+
+geometry_buffer = GeometryBuffer()
@@ -33,6 +33,7 @@ interface Board {
 
 interface LoaderData {
   boards: Board[];
+  nextCursor?: string | null;
 }
 
 export function BoardsList() {
@@ -41,11 +42,14 @@ export function BoardsList() {
   const [search, setSearch] = useState('');
   const [debouncedSearch] = useDebouncedValue(search, 300);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(loaderData.nextCursor ?? null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  // Фильтрация досок по поиску
+  // Фильтрация досок по поиску — только среди уже загруженных страниц
   const filteredBoards = boards.filter(board =>
     board.title.toLowerCase().includes(debouncedSearch.toLowerCase())
   );
+  const partialSearch = Boolean(debouncedSearch && nextCursor);
 
   const handleCreateBoard = async () => {
     try {
@@ -70,6 +74,21 @@ export function BoardsList() {
     }
   };
 
+  // Следующая страница досок по курсору из X-Next-Cursor
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await api.get('/api/boards', { params: { cursor: nextCursor } });
+      setBoards(current => [...current, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] ?? null);
+    } catch (error) {
+      console.error('Ошибка при загрузке досок:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (boardId: string) => {
     try {
       await api.delete(`/api/boards/${boardId}`);
@@ -112,7 +131,7 @@ export function BoardsList() {
               Мои доски
             </Title>
             <Text c="dimmed">
-              Всего досок: {boards.length}
+              {nextCursor ? `Показано досок: ${boards.length}` : `Всего досок: ${boards.length}`}
             </Text>
           </div>
 
@@ -145,6 +164,13 @@ export function BoardsList() {
           />
         </Paper>
 
+        {partialSearch && (
+          <Text size="sm" c="dimmed">
+            Поиск идёт по загруженным доскам ({boards.length}). Чтобы искать среди остальных,
+            нажмите «Показать ещё».
+          </Text>
+        )}
+
         {/* Список досок */}
         {loading && filteredBoards.length === 0 ? (
           <Center h={200}>
@@ -155,7 +181,9 @@ export function BoardsList() {
             <Stack align="center" gap="md">
               <IconLayoutBoard size={48} color="gray" />
               <Text size="lg" c="dimmed">
-                {search ? 'Доски не найдены' : 'У вас пока нет досок'}
+                {search
+                  ? (partialSearch ? 'Среди загруженных досок не найдено' : 'Доски не найдены')
+                  : 'У вас пока нет досок'}
               </Text>
               {!search && (
                 <Button
@@ -180,6 +208,14 @@ export function BoardsList() {
             ))}
           </SimpleGrid>
         )}
+
+        {nextCursor && (
+          <Center>
+            <Button variant="light" onClick={handleLoadMore} loading={loadingMore}>
+              Показать ещё
+            </Button>
+          </Center>
+        )}
       </Stack>
     </Container>
   );
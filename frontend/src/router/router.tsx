@@ -19,6 +19,7 @@ interface LoaderData {
     title: string;
     updatedAt: string;
   }>;
+  nextCursor?: string | null;
   board?: {
     id: string;
     title: string;
@@ -63,8 +64,9 @@ const loadBoards = async (): Promise<LoaderData> => {
 
   console.log('Boards response:', response.data); // Для отладки
 
-  // Сервер возвращает массив досок напрямую, а не в обертке boards
-  return { boards: response.data };
+  // Сервер возвращает массив досок напрямую, а не в обертке boards;
+  // курсор следующей страницы приходит в заголовке X-Next-Cursor
+  return { boards: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
 };
 
 // const loadBoard = async ({ params }: { params: any }): Promise<LoaderData> => {